@@ -143,11 +143,71 @@ CORS_ALLOW_CREDENTIALS = True
 # Глобальный секрет для вебхуков о зачислении (product_user_subscribed, payment_accepted)
 # Секреты для lesson_task_* хранятся per-course в БД: Admin → Core → Секреты вебхуков курсов
 WEBHOOK_SECRET_ENROLLMENT = os.getenv('WEBHOOK_SECRET_ENROLLMENT', '')
+# Per-course секреты кэшируются в памяти процесса; TTL ограничивает устаревание в других процессах
+WEBHOOK_SECRET_CACHE_TTL = int(os.getenv('WEBHOOK_SECRET_CACHE_TTL', '300'))
+# Размер LRU identity map (email/UUID ZenClass → pk ученика, курса, задания) в каждом процессе
+WEBHOOK_IDENTITY_CACHE_SIZE = int(os.getenv('WEBHOOK_IDENTITY_CACHE_SIZE', '10000'))
+# Как часто (сек) воркер сверяет поколение identity map в БД — удаления в админке из других процессов
+WEBHOOK_IDENTITY_SYNC_SECONDS = float(os.getenv('WEBHOOK_IDENTITY_SYNC_SECONDS', '2'))
+# Сколько последних webhook_id помнит каждый процесс, чтобы отвечать на ретраи без БД (0 — выключено)
+WEBHOOK_RECENT_IDS_SIZE = int(os.getenv('WEBHOOK_RECENT_IDS_SIZE', '20000'))
+
+# Очередь вебхуков (WebhookLog со статусом pending), разбирает `manage.py process_webhooks`.
+# При глубине очереди >= WEBHOOK_QUEUE_MAX_DEPTH view отвечает 503 + Retry-After (0 — без ограничения)
+WEBHOOK_QUEUE_MAX_DEPTH = int(os.getenv('WEBHOOK_QUEUE_MAX_DEPTH', '5000'))
+WEBHOOK_QUEUE_RETRY_AFTER = int(os.getenv('WEBHOOK_QUEUE_RETRY_AFTER', '30'))
+WEBHOOK_WORKER_CONCURRENCY = int(os.getenv('WEBHOOK_WORKER_CONCURRENCY', '2'))
+# Сколько дней обработанные вебхуки хранят payload как JSON (дальше — `compact_webhook_log`)
+WEBHOOK_LOG_HOT_DAYS = int(os.getenv('WEBHOOK_LOG_HOT_DAYS', '30'))
 
 # ===========================================
 # Telegram
 # ===========================================
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
+# Адрес Bot API; для нагрузочных прогонов — локальная имитация `manage.py fake_telegram`
+TELEGRAM_API_BASE_URL = os.getenv('TELEGRAM_API_BASE_URL', 'https://api.telegram.org')
+# initData Mini App старше MAX_AGE секунд отклоняется (0 — без ограничения);
+# проверенные строки initData кэшируются в памяти процесса на CACHE_TTL секунд
+TELEGRAM_INIT_DATA_MAX_AGE = int(os.getenv('TELEGRAM_INIT_DATA_MAX_AGE', '86400'))
+TELEGRAM_INIT_DATA_CACHE_TTL = int(os.getenv('TELEGRAM_INIT_DATA_CACHE_TTL', '300'))
+
+# Общий HTTP-клиент Bot API на процесс: keep-alive пул соединений (HTTP/2, если установлен h2)
+TELEGRAM_HTTP_MAX_CONNECTIONS = int(os.getenv('TELEGRAM_HTTP_MAX_CONNECTIONS', '20'))
+TELEGRAM_HTTP_MAX_KEEPALIVE = int(os.getenv('TELEGRAM_HTTP_MAX_KEEPALIVE', '10'))
+TELEGRAM_HTTP_TIMEOUT = float(os.getenv('TELEGRAM_HTTP_TIMEOUT', '10'))
+TELEGRAM_HTTP_CONNECT_TIMEOUT = float(os.getenv('TELEGRAM_HTTP_CONNECT_TIMEOUT', '5'))
+# Circuit breaker Bot API: после N неудач подряд (сеть, 5xx, ответ дольше SLOW секунд)
+# вызовы отклоняются сразу, через RESET секунд — пробный вызов
+TELEGRAM_BREAKER_FAILURES = int(os.getenv('TELEGRAM_BREAKER_FAILURES', '5'))
+TELEGRAM_BREAKER_SLOW_SECONDS = float(os.getenv('TELEGRAM_BREAKER_SLOW_SECONDS', '5'))
+TELEGRAM_BREAKER_RESET_SECONDS = float(os.getenv('TELEGRAM_BREAKER_RESET_SECONDS', '30'))
+# Как часто воркеры сохраняют состояние breaker для /health/ веб-процесса (WorkerStatus)
+WORKER_STATUS_PUBLISH_SECONDS = float(os.getenv('WORKER_STATUS_PUBLISH_SECONDS', '10'))
+
+# Напоминания о занятиях (`manage.py run_scheduler`, журнал ReminderLog против дублей):
+# за сколько минут до начала напоминать и сколько минут после начала ещё догонять после простоя
+LESSON_REMINDER_BEFORE_MINUTES = int(os.getenv('LESSON_REMINDER_BEFORE_MINUTES', '15'))
+LESSON_REMINDER_GRACE_MINUTES = int(os.getenv('LESSON_REMINDER_GRACE_MINUTES', '5'))
+# Напоминание о дедлайне за N часов; по умолчанию выключено (0) — новый вид сообщений включается явно
+DEADLINE_REMINDER_BEFORE_HOURS = int(os.getenv('DEADLINE_REMINDER_BEFORE_HOURS', '0'))
+# Резидентный планировщик `manage.py run_scheduler`: порт health-эндпоинта внутри контейнера
+SCHEDULER_HEALTH_PORT = int(os.getenv('SCHEDULER_HEALTH_PORT', '8081'))
+
+# Массовые рассылки (core.services.fanout): лимиты Bot API ~30 сообщ/с на бота и ~1 сообщ/с в чат
+TELEGRAM_RATE_LIMIT = float(os.getenv('TELEGRAM_RATE_LIMIT', '25'))
+TELEGRAM_PER_CHAT_INTERVAL = float(os.getenv('TELEGRAM_PER_CHAT_INTERVAL', '1'))
+TELEGRAM_FANOUT_CONCURRENCY = int(os.getenv('TELEGRAM_FANOUT_CONCURRENCY', '10'))
+# Рассылки по курсу (`manage.py send_broadcasts`): рассылку без пульса воркера дольше LEASE подхватит другой
+BROADCAST_LEASE_SECONDS = int(os.getenv('BROADCAST_LEASE_SECONDS', '300'))
+
+# Outbox уведомлений (OutgoingNotification), отправляет `manage.py dispatch_notifications`.
+# Ретраи с экспоненциальной паузой: base * 2^(n-1) сек, не больше max; после max_attempts — FAILED
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', '8'))
+NOTIFICATION_RETRY_BASE_SECONDS = int(os.getenv('NOTIFICATION_RETRY_BASE_SECONDS', '30'))
+NOTIFICATION_RETRY_MAX_SECONDS = int(os.getenv('NOTIFICATION_RETRY_MAX_SECONDS', '3600'))
+NOTIFICATION_LEASE_SECONDS = int(os.getenv('NOTIFICATION_LEASE_SECONDS', '120'))
+# Окно склейки уведомлений об оценках: все оценки ученика за окно уходят одной сводкой (0 — без ожидания)
+GRADE_NOTIFICATION_WINDOW_SECONDS = int(os.getenv('GRADE_NOTIFICATION_WINDOW_SECONDS', '60'))
 
 # ===========================================
 # Google Sheets (одноразовый импорт)
@@ -183,5 +243,9 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False,
         },
+        # httpx пишет каждый запрос в INFO вместе с URL, а в URL Bot API — токен бота
+        'httpx': {
+            'level': 'WARNING',
+        },
     },
 }
@@ -1,5 +1,17 @@
+import json
+
+from django import forms
 from django.contrib import admin
-from .models import Student, Course, Enrollment, Task, Grade, ScheduleEvent, Deadline, CourseWebhookSecret, WebhookLog
+from django.contrib.admin import helpers
+from django.db.models import Count, Q
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from .models import (
+    Student, Course, Enrollment, Task, Grade, ScheduleEvent, Deadline, CourseWebhookSecret, WebhookLog,
+    OutgoingNotification, ReminderLog, Broadcast, BroadcastRecipient,
+)
 
 
 @admin.register(Student)
@@ -32,11 +44,21 @@ class DeadlineInline(admin.TabularInline):
     ordering = ['due_date']
 
 
+class BroadcastForm(forms.Form):
+    text = forms.CharField(
+        label='Текст сообщения',
+        widget=forms.Textarea(attrs={'rows': 8, 'cols': 80}),
+        max_length=4096,
+        help_text='Отправляется как есть, без HTML-разметки. До 4096 символов (лимит Telegram).',
+    )
+
+
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
     list_display = ['name', 'zenclass_id', 'has_secret', 'schedule_count', 'deadline_count', 'created_at']
     search_fields = ['name', 'zenclass_id']
     inlines = [WebhookSecretInline, ScheduleEventInline, DeadlineInline]
+    actions = ['broadcast']
 
     fieldsets = (
         (None, {
@@ -63,6 +85,37 @@ class CourseAdmin(admin.ModelAdmin):
     def deadline_count(self, obj):
         return obj.deadlines.count()
 
+    @admin.action(description='Рассылка ученикам в Telegram')
+    def broadcast(self, request, queryset):
+        """
+        Промежуточная форма с текстом; по подтверждению создаёт рассылку на каждый курс.
+        Отправляет воркер send_broadcasts — запрос админки не ждёт Telegram.
+        """
+        form = BroadcastForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            for course in queryset:
+                Broadcast.objects.create(
+                    course=course, text=form.cleaned_data['text'], created_by=request.user.get_username(),
+                )
+            self.message_user(request, format_html(
+                'Рассылок поставлено в очередь: {}. <a href="{}">Ход отправки</a>',
+                queryset.count(), reverse('admin:core_broadcast_changelist'),
+            ))
+            return None
+
+        courses = queryset.annotate(recipients=Count('enrollments', filter=Q(
+            enrollments__status=Enrollment.Status.ACTIVE,
+            enrollments__student__telegram_id__isnull=False,
+        )))
+        return TemplateResponse(request, 'admin/core/course/broadcast.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Рассылка ученикам',
+            'opts': self.model._meta,
+            'courses': courses,
+            'form': form,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
+
 
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
@@ -108,7 +161,114 @@ class CourseWebhookSecretAdmin(admin.ModelAdmin):
 
 @admin.register(WebhookLog)
 class WebhookLogAdmin(admin.ModelAdmin):
-    list_display = ['webhook_id', 'event_name', 'processed_at']
-    list_filter = ['event_name']
+    list_display = ['webhook_id', 'event_name', 'status', 'attempts', 'processed_at', 'handled_at']
+    list_filter = ['status', 'event_name']
     search_fields = ['webhook_id']
-    readonly_fields = ['webhook_id', 'event_name', 'payload', 'processed_at']
+    readonly_fields = [
+        'webhook_id', 'event_name', 'payload_display', 'timestamp',
+        'status', 'attempts', 'last_error', 'processed_at', 'handled_at',
+    ]
+    exclude = ['payload']
+    actions = ['requeue']
+
+    @admin.display(description='Payload')
+    def payload_display(self, obj):
+        payload = obj.get_payload()
+        if payload is None:
+            return '— (удалён при компактизации)'
+        return json.dumps(payload, ensure_ascii=False, indent=2)
+
+    @admin.action(description='Повторить обработку')
+    def requeue(self, request, queryset):
+        queryset = queryset.exclude(status=WebhookLog.Status.PENDING)
+        # Payload удалён компактизацией (--drop) — повторять нечего
+        compacted = Q(payload__isnull=True, payload_compressed__isnull=True)
+        skipped = queryset.filter(compacted).count()
+        updated = queryset.exclude(compacted).update(
+            status=WebhookLog.Status.PENDING,
+            last_error='',
+        )
+        message = f'Поставлено в очередь: {updated}'
+        if skipped:
+            message += f'; пропущено без payload (удалён при компактизации): {skipped}'
+        self.message_user(request, message)
+
+
+@admin.register(OutgoingNotification)
+class OutgoingNotificationAdmin(admin.ModelAdmin):
+    list_display = ['telegram_id', 'kind', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['telegram_id']
+    readonly_fields = [
+        'telegram_id', 'kind', 'text', 'payload', 'status', 'attempts', 'next_attempt_at', 'last_error',
+        'created_at', 'sent_at',
+    ]
+    actions = ['requeue']
+
+    @admin.action(description='Отправить повторно')
+    def requeue(self, request, queryset):
+        now = timezone.now()
+        # SENDING с живой арендой (next_attempt_at = конец аренды) сейчас отправляет
+        # dispatch_notifications — сброс в PENDING привёл бы к повторной отправке
+        in_flight = Q(status=OutgoingNotification.Status.SENDING, next_attempt_at__gte=now)
+        queryset = queryset.exclude(status=OutgoingNotification.Status.SENT)
+        skipped = queryset.filter(in_flight).count()
+        updated = queryset.exclude(in_flight).update(
+            status=OutgoingNotification.Status.PENDING,
+            next_attempt_at=now,
+            attempts=0,
+        )
+        message = f'Поставлено в очередь: {updated}'
+        if skipped:
+            message += f'; пропущено отправляемых сейчас: {skipped}'
+        self.message_user(request, message)
+
+
+@admin.register(ReminderLog)
+class ReminderLogAdmin(admin.ModelAdmin):
+    list_display = ['event', 'deadline', 'student', 'kind', 'sent_at']
+    list_filter = ['kind', 'sent_at']
+    search_fields = ['student__email', 'event__title', 'deadline__title']
+    raw_id_fields = ['event', 'deadline', 'student']
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ['course', 'short_text', 'status', 'progress', 'throughput', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status']
+    search_fields = ['course__name', 'text']
+    list_select_related = ['course']
+    readonly_fields = [
+        'course', 'text', 'status', 'created_by', 'created_at', 'started_at', 'finished_at', 'heartbeat_at',
+        'total', 'sent', 'failed',
+    ]
+
+    def has_add_permission(self, request):
+        # Создаётся действием «Рассылка ученикам в Telegram» в списке курсов
+        return False
+
+    @admin.display(description='Текст')
+    def short_text(self, obj):
+        return obj.text[:60]
+
+    @admin.display(description='Прогресс')
+    def progress(self, obj):
+        if not obj.total:
+            return '—'
+        done = obj.sent + obj.failed
+        return f'{done}/{obj.total} ({done * 100 // obj.total}%), ошибок {obj.failed}'
+
+    @admin.display(description='Сообщ/с')
+    def throughput(self, obj):
+        if not obj.started_at or not obj.sent:
+            return '—'
+        elapsed = ((obj.finished_at or timezone.now()) - obj.started_at).total_seconds()
+        return f'{obj.sent / elapsed:.1f}' if elapsed > 0 else '—'
+
+
+@admin.register(BroadcastRecipient)
+class BroadcastRecipientAdmin(admin.ModelAdmin):
+    list_display = ['student', 'broadcast', 'telegram_id', 'status', 'sent_at', 'last_error']
+    list_filter = ['status']
+    search_fields = ['student__email', 'student__name']
+    raw_id_fields = ['broadcast', 'student']
@@ -0,0 +1,214 @@
+"""
+Команды Telegram-бота.
+
+Ответ на апдейт возвращается прямо в теле ответа на webhook
+({"method": "sendMessage", ...}) — Telegram сам выполнит вызов, а gunicorn-воркер
+не ждёт исходящего запроса к api.telegram.org. Если команда отвечает несколькими
+сообщениями, первое уходит inline, остальные — через outbox (воркер dispatch_notifications).
+
+Новая команда — функция с декоратором @command('name'), возвращающая список BotReply.
+"""
+import logging
+from datetime import datetime
+from typing import Callable, NamedTuple
+
+from django.utils import timezone
+
+from .services.notifications import NotificationOutbox
+from .services.snapshots import SnapshotService, deadline_key
+
+logger = logging.getLogger(__name__)
+
+WEB_APP_URL = 'https://kruzhoktrack.ru'
+
+
+class BotReply(NamedTuple):
+    text: str
+    reply_markup: dict | None = None
+    parse_mode: str | None = None
+
+
+COMMANDS: dict[str, Callable[[dict], list[BotReply]]] = {}
+
+
+def command(name: str):
+    """Регистрирует обработчик команды /name."""
+    def register(handler):
+        COMMANDS[name] = handler
+        return handler
+    return register
+
+
+def _open_app_markup() -> dict:
+    return {
+        "inline_keyboard": [[{
+            "text": "📚 Открыть Кружок",
+            "web_app": {"url": WEB_APP_URL},
+        }]]
+    }
+
+
+@command('start')
+def start(message: dict) -> list[BotReply]:
+    first_name = message.get('from', {}).get('first_name', 'друг')
+    # Без parse_mode: first_name пользователя может содержать «<» и сломать HTML
+    welcome = (
+        f"Привет, {first_name}! 👋🏻\n\n"
+        f"Здесь ты можешь отслеживать оценки, расписание занятий и дедлайны по своим курсам.\n\n"
+        f"Открой приложение — всё уже там 👇"
+    )
+    return [BotReply(welcome, _open_app_markup())]
+
+
+@command('help')
+def help_(message: dict) -> list[BotReply]:
+    return [BotReply(
+        "Я присылаю уведомления об оценках, занятиях и дедлайнах.\n\n"
+        "/start — открыть приложение\n"
+        "/grades — последние оценки\n"
+        "/schedule — ближайшие занятия\n"
+        "/deadlines — несданные дедлайны\n"
+        "/help — эта справка",
+        _open_app_markup(),
+    )]
+
+
+# ===========================================
+# Оценки, расписание, дедлайны — из срезов SnapshotService
+# ===========================================
+# Ответ собирается из одной-двух строк StudentSnapshot / CourseSnapshot, без
+# подсчётов по оценкам; тексты без parse_mode — названия приходят из ZenClass.
+
+SCHEDULE_LIMIT = 5
+DEADLINES_LIMIT = 10
+
+
+def _local(iso: str) -> datetime:
+    return timezone.localtime(datetime.fromisoformat(iso))
+
+
+def _snapshot_or_reply(message: dict):
+    """Срез ученика по отправителю или ответ «Telegram не привязан»."""
+    telegram_id = message.get('from', {}).get('id')
+    snapshot = SnapshotService.for_telegram_id(telegram_id) if telegram_id else None
+    if snapshot is None:
+        return None, [BotReply(
+            "Не нашёл тебя среди учеников 🤔\n\n"
+            "Открой приложение и войди по email, указанному в ZenClass, — после этого команды заработают.",
+            _open_app_markup(),
+        )]
+    return snapshot, None
+
+
+@command('grades')
+def grades(message: dict) -> list[BotReply]:
+    snapshot, reply = _snapshot_or_reply(message)
+    if reply:
+        return reply
+    if not snapshot.accepted_total:
+        return [BotReply("Проверенных работ пока нет.", _open_app_markup())]
+
+    lines = [
+        f"✅ Принято заданий: {snapshot.accepted_total}",
+        f"🎯 Средний результат: {snapshot.average_percent}%",
+        "",
+        "Последние оценки:",
+    ]
+    for course_name, task_name, value, max_score, checked_at, _task_id in snapshot.recent_grades:
+        score = f"{value}/{max_score}" if value is not None else "принято"
+        when = f" ({_local(checked_at):%d.%m})" if checked_at else ""
+        lines.append(f"📝 {task_name} — {score}{when}\n    {course_name}")
+    return [BotReply("\n".join(lines), _open_app_markup())]
+
+
+@command('schedule')
+def schedule(message: dict) -> list[BotReply]:
+    snapshot, reply = _snapshot_or_reply(message)
+    if reply:
+        return reply
+
+    now = timezone.now()
+    events = sorted(
+        (_local(iso), title, course.name)
+        for course in SnapshotService.courses_for(snapshot)
+        for iso, title in course.schedule
+    )
+    events = [event for event in events if event[0] >= now][:SCHEDULE_LIMIT]
+    if not events:
+        return [BotReply("Ближайших занятий нет.", _open_app_markup())]
+
+    lines = ["📅 Ближайшие занятия:"]
+    for moment, title, course_name in events:
+        lines.append(f"• {moment:%d.%m %H:%M} — {title} ({course_name})")
+    return [BotReply("\n".join(lines), _open_app_markup())]
+
+
+@command('deadlines')
+def deadlines(message: dict) -> list[BotReply]:
+    snapshot, reply = _snapshot_or_reply(message)
+    if reply:
+        return reply
+
+    now = timezone.now()
+    done = set(snapshot.done_deadline_keys)
+    items = []
+    for course in SnapshotService.courses_for(snapshot):
+        for iso, title, submitted in course.deadlines:
+            due_date = datetime.fromisoformat(iso)
+            # Сдано — если принято задание с этой датой в названии (как в api_deadlines)
+            if submitted or due_date < now or deadline_key(course.pk, due_date) in done:
+                continue
+            items.append((timezone.localtime(due_date), title, course.name))
+    items.sort()
+    if not items:
+        return [BotReply("Несданных дедлайнов нет 🎉", _open_app_markup())]
+
+    lines = ["⏰ Дедлайны:"]
+    for due_date, title, course_name in items[:DEADLINES_LIMIT]:
+        lines.append(f"• до {due_date:%d.%m %H:%M} — {title} ({course_name})")
+    if len(items) > DEADLINES_LIMIT:
+        lines.append(f"…и ещё {len(items) - DEADLINES_LIMIT}")
+    return [BotReply("\n".join(lines), _open_app_markup())]
+
+
+def parse_command(text: str) -> str | None:
+    """'/start payload' или '/start@kruzhok_bot' → 'start'."""
+    if not text.startswith('/'):
+        return None
+    return text.split(maxsplit=1)[0][1:].split('@', 1)[0].lower() or None
+
+
+def _send_message_method(chat_id: int, reply: BotReply) -> dict:
+    body = {"method": "sendMessage", "chat_id": chat_id, "text": reply.text}
+    if reply.parse_mode:
+        body["parse_mode"] = reply.parse_mode
+    if reply.reply_markup:
+        body["reply_markup"] = reply.reply_markup
+    return body
+
+
+def handle_update(update: dict) -> dict | None:
+    """
+    Обрабатывает апдейт Telegram. Возвращает тело ответа webhook с вызовом sendMessage
+    или None, если отвечать нечего.
+    """
+    message = update.get('message') or {}
+    chat_id = message.get('chat', {}).get('id')
+    name = parse_command(message.get('text', ''))
+    if not chat_id or not name:
+        return None
+
+    handler = COMMANDS.get(name)
+    if handler is None:
+        return None
+
+    replies = handler(message)
+    if not replies:
+        return None
+
+    first, *rest = replies
+    for reply in rest:
+        # Outbox шлёт с parse_mode=HTML и без клавиатуры — дополнительные сообщения только текстом
+        NotificationOutbox.enqueue(chat_id, reply.text)
+
+    return _send_message_method(chat_id, first)
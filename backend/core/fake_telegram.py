@@ -0,0 +1,139 @@
+"""
+Локальная замена Telegram Bot API для нагрузочных прогонов и отладки уведомлений.
+
+WSGI-приложение отвечает на POST /bot<token>/sendMessage как настоящий Bot API,
+но с настраиваемой задержкой, долей ошибок 500 и ответами 429 с retry_after
+(случайными и/или при превышении лимита сообщений в секунду).
+GET /stats — счётчики и время прихода сообщений, POST /reset — сброс.
+
+Запуск отдельным процессом: `python manage.py fake_telegram`; приложение указывается
+в TELEGRAM_API_BASE_URL. bench_notifications поднимает его у себя в потоке.
+"""
+import json
+import random
+import threading
+import time
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+
+class FakeTelegramAPI:
+    """WSGI-приложение: имитация sendMessage."""
+
+    def __init__(self, latency_ms: float = 50, jitter_ms: float = 20, error_rate: float = 0.0,
+                 flood_rate: float = 0.0, retry_after: int = 1, max_rps: float = 0, seed: int | None = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.max_rps = max_rps
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = {'requests': 0, 'ok': 0, 'errors': 0, 'rate_limited': 0}
+            # (время прихода, chat_id) успешно «доставленных» сообщений
+            self.arrivals: list[tuple[float, int]] = []
+            self._window_start = time.monotonic()
+            self._window_count = 0
+            self._message_id = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counts, 'arrivals': list(self.arrivals)}
+
+    def _over_limit(self) -> bool:
+        """Глобальный лимит max_rps в окне 1 с (как flood control Telegram)."""
+        if not self.max_rps:
+            return False
+        now = time.monotonic()
+        if now - self._window_start >= 1:
+            self._window_start, self._window_count = now, 0
+        self._window_count += 1
+        return self._window_count > self.max_rps
+
+    def _send_message(self, body: dict) -> tuple[str, dict]:
+        delay = max(0.0, self._random.gauss(self.latency_ms, self.jitter_ms)) / 1000 if self.latency_ms else 0
+        if delay:
+            time.sleep(delay)
+
+        with self._lock:
+            self.counts['requests'] += 1
+            roll = self._random.random()
+            if self._over_limit() or roll < self.flood_rate:
+                self.counts['rate_limited'] += 1
+                return '429 Too Many Requests', {
+                    'ok': False,
+                    'error_code': 429,
+                    'description': f'Too Many Requests: retry after {self.retry_after}',
+                    'parameters': {'retry_after': self.retry_after},
+                }
+            if roll < self.flood_rate + self.error_rate:
+                self.counts['errors'] += 1
+                return '500 Internal Server Error', {
+                    'ok': False, 'error_code': 500, 'description': 'Internal Server Error',
+                }
+            if 'chat_id' not in body or not body.get('text'):
+                self.counts['errors'] += 1
+                return '400 Bad Request', {
+                    'ok': False, 'error_code': 400, 'description': 'Bad Request: message text is empty',
+                }
+
+            self.counts['ok'] += 1
+            self._message_id += 1
+            self.arrivals.append((time.time(), body['chat_id']))
+            return '200 OK', {
+                'ok': True,
+                'result': {
+                    'message_id': self._message_id,
+                    'chat': {'id': body['chat_id'], 'type': 'private'},
+                    'date': int(time.time()),
+                    'text': body['text'],
+                },
+            }
+
+    def __call__(self, environ, start_response):
+        method = environ['REQUEST_METHOD']
+        path = environ.get('PATH_INFO', '')
+
+        if method == 'GET' and path == '/stats':
+            status, payload = '200 OK', self.stats()
+        elif method == 'POST' and path == '/reset':
+            self.reset()
+            status, payload = '200 OK', {'ok': True}
+        elif method == 'POST' and path.startswith('/bot') and path.endswith('/sendMessage'):
+            try:
+                length = int(environ.get('CONTENT_LENGTH') or 0)
+                body = json.loads(environ['wsgi.input'].read(length) or b'{}')
+            except ValueError:
+                body = {}
+            status, payload = self._send_message(body)
+        else:
+            status, payload = '404 Not Found', {'ok': False, 'error_code': 404, 'description': 'Not Found'}
+
+        data = json.dumps(payload).encode()
+        start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(data)))])
+        return [data]
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def make_fake_server(app: FakeTelegramAPI, host: str = '127.0.0.1', port: int = 0) -> ThreadingWSGIServer:
+    """Многопоточный WSGI-сервер (port=0 — свободный порт, см. server.server_port)."""
+    return make_server(host, port, app, server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+
+
+def start_in_thread(app: FakeTelegramAPI, host: str = '127.0.0.1', port: int = 0) -> ThreadingWSGIServer:
+    server = make_fake_server(app, host, port)
+    threading.Thread(target=server.serve_forever, name='fake-telegram', daemon=True).start()
+    return server
@@ -0,0 +1,85 @@
+"""
+Извлечение оценки из вебхука ZenClass.
+
+ZenClass не передаёт оценку отдельным полем: автопроверка кладёт "5/7" в task_result,
+а куратор пишет балл в комментарии ("44/54", "Оценка: 5", "Балл 4. Молодец").
+Здесь — единый упорядоченный набор правил; первое сработавшее правило определяет
+результат и возвращается вместе с ним (для логов и отладки).
+
+Модуль не зависит от Django — его можно гонять в пуле процессов и бенчмарках.
+
+Защита от «тяжёлых» комментариев:
+- все регулярки скомпилированы один раз, квантификаторы ограничены ({1,6}, {0,3}),
+  поэтому поиск линейный и без катастрофического бэктрекинга;
+- длинный комментарий просматривается только в начале и в конце
+  (SCAN_HEAD + SCAN_TAIL символов) — именно там куратор пишет балл.
+"""
+import re
+from typing import NamedTuple
+
+SCAN_HEAD = 1000
+SCAN_TAIL = 500
+
+# Число длиннее 6 цифр — не оценка (номер телефона, id), его не режем на куски
+_NUMBER = r'(?<![0-9])([0-9]{1,6})(?![0-9])'
+_FRACTION = _NUMBER + r'[ \t]{0,3}/[ \t]{0,3}' + _NUMBER
+
+
+class GradeResult(NamedTuple):
+    score: int | None
+    max_score: int | None
+    rule: str
+
+
+# (название, источник, регулярка) — порядок важен: первое совпадение побеждает
+RULES = [
+    # Автопроверка тестов: task_result = "5/7"
+    ('task_result_fraction', 'task_result', re.compile(r'^\s{0,10}' + _FRACTION + r'\s{0,10}$')),
+    # Куратор пишет "44/54" — берём и балл, и максимум (даты вида 12/05/2024 не считаем)
+    ('comment_fraction', 'comment', re.compile(r'(?<!/)' + _FRACTION + r'(?!/)')),
+    # "Оценка: 5", "оценка - 4"
+    ('comment_keyword_grade', 'comment', re.compile(r'оценк[аи][ \t:–—-]{0,5}' + _NUMBER, re.IGNORECASE)),
+    # "Балл 4", "Баллы: 12", "Итого баллов: 30"
+    ('comment_keyword_points', 'comment', re.compile(r'балл(?:ов|а|ы)?[ \t:–—-]{0,5}' + _NUMBER, re.IGNORECASE)),
+    # Последний шанс: первое число в комментарии
+    ('comment_first_number', 'comment', re.compile(_NUMBER)),
+]
+
+NO_SCORE = GradeResult(None, None, 'none')
+
+
+def _scan_window(text: str) -> str:
+    """Обрезает длинный текст до начала и конца — балл пишут там."""
+    if len(text) <= SCAN_HEAD + SCAN_TAIL:
+        return text
+    return text[:SCAN_HEAD] + '\n' + text[-SCAN_TAIL:]
+
+
+def extract_grade(comment: str | None = None, task_result=None) -> GradeResult:
+    """
+    Возвращает (score, max_score, rule) по комментарию куратора и task_result.
+    Если ни одно правило не сработало — (None, None, 'none'): работа принята как «зачёт».
+    """
+    sources = {
+        'task_result': _scan_window(str(task_result)) if task_result else '',
+        'comment': _scan_window(comment) if comment else '',
+    }
+
+    for name, source, pattern in RULES:
+        text = sources[source]
+        if not text:
+            continue
+        match = pattern.search(text)
+        if match is None:
+            continue
+        groups = match.groups()
+        score = int(groups[0])
+        max_score = int(groups[1]) if len(groups) > 1 else None
+        return GradeResult(score, max_score, name)
+
+    return NO_SCORE
+
+
+def extract_many(rows) -> list[tuple[int, GradeResult]]:
+    """Пакетный разбор для пула процессов: [(id, comment, task_result)] → [(id, GradeResult)]."""
+    return [(row_id, extract_grade(comment, task_result)) for row_id, comment, task_result in rows]
@@ -0,0 +1,56 @@
+"""
+Корпус комментариев кураторов для проверки и бенчмарка core.grading.
+
+CORPUS — формы комментариев, которые встречаются в ZenClass, с ожидаемым результатом:
+(comment, task_result, score, max_score, rule).
+HOSTILE — заведомо «тяжёлые» входы: на каждом extract_grade обязан отработать быстро.
+
+Проверяется тестами core (GradingCorpusTests), скорость меряет `python manage.py bench_grading`.
+"""
+
+CORPUS = [
+    # Автопроверка тестов
+    ('', '5/7', 5, 7, 'task_result_fraction'),
+    ('', ' 12 / 20 ', 12, 20, 'task_result_fraction'),
+    ('Молодец, 3/5', '4/5', 4, 5, 'task_result_fraction'),
+    ('', 'ok', None, None, 'none'),
+    ('44/54', 'ok', 44, 54, 'comment_fraction'),
+    # Дробь в комментарии
+    ('5/5', None, 5, 5, 'comment_fraction'),
+    ('Отлично! 5/5', None, 5, 5, 'comment_fraction'),
+    ('Хорошая работа, но есть ошибки в датах. Итого 38 / 54', None, 38, 54, 'comment_fraction'),
+    ('Оценка 4/5, доработай вывод', None, 4, 5, 'comment_fraction'),
+    ('Первая часть 20/30\nВторая часть не засчитана', None, 20, 30, 'comment_fraction'),
+    # Ключевые слова
+    ('Оценка: 5', None, 5, None, 'comment_keyword_grade'),
+    ('оценка - 4', None, 4, None, 'comment_keyword_grade'),
+    ('Задание 3. Оценка: 5', None, 5, None, 'comment_keyword_grade'),
+    ('ОЦЕНКА 3', None, 3, None, 'comment_keyword_grade'),
+    ('Балл 4. Молодец', None, 4, None, 'comment_keyword_points'),
+    ('Баллы: 12', None, 12, None, 'comment_keyword_points'),
+    ('Итого баллов: 30, эссе засчитано', None, 30, None, 'comment_keyword_points'),
+    # Первое число
+    ('5', None, 5, None, 'comment_first_number'),
+    ('4 — аргументы слабые', None, 4, None, 'comment_first_number'),
+    ('Хорошо! 8', None, 8, None, 'comment_first_number'),
+    ('Сдано 12/05/2024, 7', None, 12, None, 'comment_first_number'),
+    # Без оценки — «зачёт»
+    ('', None, None, None, 'none'),
+    ('Зачёт', None, None, None, 'none'),
+    ('Отлично, всё верно!', None, None, None, 'none'),
+    ('Позвони мне 89161234567', None, None, None, 'none'),
+    # Длинный комментарий: балл в конце за пределами головы окна
+    ('Разбор ошибок. ' * 200 + 'Итого 40/54', None, 40, 54, 'comment_fraction'),
+]
+
+HOSTILE = [
+    '1' * 1_000_000,
+    ' ' * 1_000_000 + '5',
+    '1/' * 200_000,
+    '1 /' * 200_000,
+    '/1' * 200_000,
+    'оценка' * 100_000,
+    'балл' + ' ' * 100_000 + '5',
+    '1234567 ' * 100_000,
+    ('а' * 50 + '1') * 20_000,
+]
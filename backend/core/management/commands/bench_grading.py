@@ -0,0 +1,42 @@
+"""
+Бенчмарк извлечения оценок (core.grading): сколько комментариев корпуса
+core.grading_corpus.CORPUS в секунду разбирает один процесс.
+
+Правильность правил на корпусе и устойчивость к ReDoS проверяют тесты
+(`python manage.py test core`, GradingCorpusTests).
+
+Использование:
+    python manage.py bench_grading
+    python manage.py bench_grading --iterations 100000
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.grading import extract_grade
+from core.grading_corpus import CORPUS, HOSTILE
+
+
+class Command(BaseCommand):
+    help = 'Меряет скорость извлечения оценок на корпусе комментариев'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10000, help='Разборов для замера скорости')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        started = time.perf_counter()
+        for i in range(iterations):
+            comment, task_result, *_ = CORPUS[i % len(CORPUS)]
+            extract_grade(comment, task_result)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Корпус: {iterations / elapsed:,.0f} комментариев/с ({elapsed / iterations * 1e6:.1f} мкс на разбор)'
+        )
+
+        worst = 0.0
+        for text in HOSTILE:
+            started = time.perf_counter()
+            extract_grade(text, text)
+            worst = max(worst, time.perf_counter() - started)
+        self.stdout.write(f'Тяжёлые входы: {len(HOSTILE)}, худший {worst * 1000:.2f} мс')
@@ -0,0 +1,277 @@
+"""
+Бенчмарк пропускной способности Telegram-уведомлений на локальной имитации Bot API.
+
+Сценарии:
+- grades — уведомления об оценках: enqueue_grade (как process_task_accepted) →
+  разбор outbox через NotificationOutbox.dispatch_due (как dispatch_notifications,
+  но только уведомления бенчмарка);
+  задержка — от постановки в очередь до отправки (created_at → sent_at);
+- reminders — напоминание о занятии всем ученикам курса: LessonReminders.send_due
+  (TelegramFanout с лимитами); задержка — от старта рассылки до прихода сообщения.
+
+Сообщения уходят в FakeTelegramAPI (core/fake_telegram.py): по умолчанию она
+поднимается в этом процессе, --api-url — уже запущенная `manage.py fake_telegram`.
+Настоящий Bot API не вызывается.
+
+ВНИМАНИЕ: бенчмарк пишет в текущую БД (ученики bench-notify-*@bench.invalid и курс
+«Бенчмарк: уведомления»). По окончании данные удаляются, если не указан --keep.
+У учеников бенчмарка chat_id из SYNTHETIC_TELEGRAM_IDS: dispatch_notifications и
+напоминания их уведомления не забирают, а бенчмарк разбирает только их. Пока в БД
+есть живые воркеры (WorkerStatus), бенчмарк не запускается.
+
+Использование:
+    python manage.py bench_notifications --students 500 --grades-per-student 3
+    python manage.py bench_notifications --scenario reminders --max-rps 30 --latency-ms 200
+    python manage.py bench_notifications --error-rate 0.05 --flood-rate 0.02 --workers 4   # PostgreSQL
+    python manage.py bench_notifications --api-url http://127.0.0.1:8765
+"""
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.fake_telegram import FakeTelegramAPI, start_in_thread
+from core.models import SYNTHETIC_TELEGRAM_IDS, Course, Enrollment, OutgoingNotification, ScheduleEvent, Student
+from core.services.health import live_workers
+from core.services.notifications import NotificationOutbox
+from core.services.reminders import LessonReminders
+from core.services.telegram import get_http_client, telegram_breaker
+
+BENCH_EMAIL_PREFIX = 'bench-notify-'
+BENCH_EMAIL_DOMAIN = 'bench.invalid'
+BENCH_COURSE_NAME = 'Бенчмарк: уведомления'
+# Заведомо несуществующие chat_id: только эти уведомления бенчмарк отправляет и удаляет
+BENCH_TELEGRAM_IDS = SYNTHETIC_TELEGRAM_IDS
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк отправки уведомлений об оценках и напоминаний на локальной имитации Bot API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', choices=['grades', 'reminders', 'all'], default='all')
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--grades-per-student', type=int, default=3)
+        parser.add_argument('--window', type=int, default=0, help='Окно склейки оценок, сек (GRADE_NOTIFICATION_WINDOW_SECONDS)')
+        parser.add_argument('--workers', type=int, default=1, help='Параллельных dispatch_due (>1 — только PostgreSQL)')
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--retry-base', type=int, default=1, help='NOTIFICATION_RETRY_BASE_SECONDS на время прогона')
+        parser.add_argument('--timeout', type=float, default=300.0, help='Предел ожидания разбора outbox, сек')
+        parser.add_argument('--api-url', default='', help='Уже запущенная fake_telegram (иначе — в этом процессе)')
+        parser.add_argument('--latency-ms', type=float, default=50)
+        parser.add_argument('--jitter-ms', type=float, default=20)
+        parser.add_argument('--error-rate', type=float, default=0.0)
+        parser.add_argument('--flood-rate', type=float, default=0.0)
+        parser.add_argument('--retry-after', type=int, default=1)
+        parser.add_argument('--max-rps', type=float, default=0)
+        parser.add_argument('--keep', action='store_true', help='Не удалять созданные данные')
+
+    def handle(self, *args, **options):
+        if options['workers'] > 1 and connection.vendor != 'postgresql':
+            raise CommandError('--workers > 1 требует PostgreSQL (SELECT ... SKIP LOCKED)')
+        workers = list(live_workers().values_list('name', flat=True))
+        if workers:
+            raise CommandError(
+                f'С этой БД работают воркеры: {", ".join(workers)}. Остановите их или запустите '
+                f'бенчмарк на отдельной БД'
+            )
+
+        server = None
+        api_url = options['api_url'].rstrip('/')
+        if not api_url:
+            server = start_in_thread(FakeTelegramAPI(
+                latency_ms=options['latency_ms'],
+                jitter_ms=options['jitter_ms'],
+                error_rate=options['error_rate'],
+                flood_rate=options['flood_rate'],
+                retry_after=options['retry_after'],
+                max_rps=options['max_rps'],
+            ))
+            api_url = f'http://127.0.0.1:{server.server_port}'
+        self.api_url = api_url
+        self.stdout.write(f'Fake Bot API: {api_url}')
+
+        overrides = override_settings(
+            TELEGRAM_API_BASE_URL=api_url,
+            TELEGRAM_BOT_TOKEN=settings.TELEGRAM_BOT_TOKEN or 'bench',
+            GRADE_NOTIFICATION_WINDOW_SECONDS=options['window'],
+            NOTIFICATION_RETRY_BASE_SECONDS=options['retry_base'],
+        )
+        try:
+            with overrides:
+                students = self._create_students(options['students'])
+                if options['scenario'] in ('grades', 'all'):
+                    self._bench_grades(students, options)
+                if options['scenario'] in ('reminders', 'all'):
+                    self._bench_reminders(students)
+        finally:
+            if not options['keep']:
+                self._cleanup()
+            if server:
+                server.shutdown()
+
+    # ===========================================
+    # Данные
+    # ===========================================
+
+    def _create_students(self, count: int) -> list[Student]:
+        self._cleanup(quiet=True)
+        return Student.objects.bulk_create([
+            Student(
+                email=f'{BENCH_EMAIL_PREFIX}{i}@{BENCH_EMAIL_DOMAIN}',
+                name=f'Бенчмарк {i}',
+                telegram_id=BENCH_TELEGRAM_IDS[0] + i,
+            )
+            for i in range(count)
+        ])
+
+    def _bench_notifications(self):
+        return OutgoingNotification.objects.filter(
+            telegram_id__gte=BENCH_TELEGRAM_IDS[0],
+            telegram_id__lt=BENCH_TELEGRAM_IDS[1],
+        )
+
+    def _cleanup(self, quiet: bool = False):
+        deleted, _ = Student.objects.filter(
+            email__startswith=BENCH_EMAIL_PREFIX, email__endswith=f'@{BENCH_EMAIL_DOMAIN}',
+        ).delete()
+        Course.objects.filter(name=BENCH_COURSE_NAME).delete()
+        self._bench_notifications().delete()
+        if not quiet:
+            self.stdout.write(f'\nДанные бенчмарка удалены (объектов: {deleted}).')
+
+    # ===========================================
+    # Fake Bot API
+    # ===========================================
+
+    def _fake_reset(self):
+        get_http_client().post(f'{self.api_url}/reset')
+
+    def _fake_stats(self) -> dict:
+        return get_http_client().get(f'{self.api_url}/stats').json()
+
+    # ===========================================
+    # Сценарии
+    # ===========================================
+
+    def _bench_grades(self, students: list[Student], options: dict):
+        per_student = options['grades_per_student']
+        self._fake_reset()
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            for task_number in range(1, per_student + 1):
+                for student in students:
+                    NotificationOutbox.enqueue_grade(
+                        student.telegram_id, BENCH_COURSE_NAME, f'Задание {task_number}', task_number, 10,
+                    )
+        enqueue_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        self._drain_outbox(options['workers'], options['batch_size'], options['timeout'])
+        elapsed = time.perf_counter() - started
+
+        rows = self._bench_notifications()
+        latencies_ms = [
+            (sent_at - created_at).total_seconds() * 1000
+            for created_at, sent_at in rows.filter(sent_at__isnull=False).values_list('created_at', 'sent_at')
+        ]
+        statuses = Counter(rows.values_list('status', flat=True))
+        stats = self._fake_stats()
+        notifications = len(latencies_ms)
+
+        self.stdout.write(f'\nОценки ({len(students)} учеников × {per_student}, окно {options["window"]} с):')
+        self.stdout.write(f'  постановка в outbox: {len(students) * per_student} за {enqueue_elapsed:.2f} с')
+        self.stdout.write(
+            f'  отправлено уведомлений: {notifications} за {elapsed:.2f} с → {notifications / elapsed:.0f}/с'
+        )
+        self.stdout.write(
+            f'  сообщений Telegram: {stats["ok"]} → {stats["ok"] / elapsed:.1f} сообщ/с '
+            f'(в среднем {notifications / stats["ok"] if stats["ok"] else 0:.1f} оценки в сообщении)'
+        )
+        self.stdout.write(self._latency_line('постановка → отправка', latencies_ms))
+        self.stdout.write(f'  статусы outbox: {dict(statuses)}')
+        self._write_fake_stats(stats)
+
+        rows.delete()
+
+    def _drain_outbox(self, workers: int, batch_size: int, timeout: float):
+        """
+        Разбирает outbox, пока не отправлены все уведомления бенчмарка (или не вышло время).
+        Забираются только уведомления бенчмарка: очередь настоящих учеников не уходит в fake API.
+        """
+        deadline = time.monotonic() + timeout
+        active = [OutgoingNotification.Status.PENDING, OutgoingNotification.Status.SENDING]
+
+        def work():
+            close_old_connections()
+            try:
+                while time.monotonic() < deadline:
+                    sent, failed = NotificationOutbox.dispatch_due(batch_size, BENCH_TELEGRAM_IDS)
+                    if sent or failed:
+                        continue
+                    if not self._bench_notifications().filter(status__in=active).exists():
+                        return
+                    time.sleep(0.1)
+            finally:
+                connection.close()
+
+        if workers == 1:
+            work()
+            return
+        threads = [threading.Thread(target=work, name=f'bench-dispatch-{i}') for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _bench_reminders(self, students: list[Student]):
+        course = Course.objects.create(name=BENCH_COURSE_NAME, zenclass_id=uuid.uuid4())
+        Enrollment.objects.bulk_create([
+            Enrollment(student=student, course=course, status=Enrollment.Status.ACTIVE) for student in students
+        ])
+        event = ScheduleEvent.objects.create(
+            course=course, title='Бенчмарк: занятие', scheduled_at=timezone.now() + timedelta(minutes=5),
+        )
+        self._fake_reset()
+
+        started_at = time.time()
+        report = LessonReminders.send_due(ids=[event.id], telegram_ids=BENCH_TELEGRAM_IDS)
+        stats = self._fake_stats()
+        latencies_ms = [(arrived - started_at) * 1000 for arrived, _ in stats['arrivals']]
+
+        self.stdout.write(f'\nНапоминание о занятии ({len(students)} получателей, TelegramFanout):')
+        self.stdout.write(f'  {report}')
+        self.stdout.write(self._latency_line('старт рассылки → доставка', latencies_ms))
+        self._write_fake_stats(stats)
+
+    # ===========================================
+    # Отчёт
+    # ===========================================
+
+    @staticmethod
+    def _latency_line(label: str, latencies_ms: list[float]) -> str:
+        return (
+            f'  {label}, мс: p50={percentile(latencies_ms, 50):.0f} p95={percentile(latencies_ms, 95):.0f} '
+            f'p99={percentile(latencies_ms, 99):.0f} max={max(latencies_ms, default=0):.0f}'
+        )
+
+    def _write_fake_stats(self, stats: dict):
+        self.stdout.write(
+            f'  Bot API: запросов {stats["requests"]}, 200 {stats["ok"]}, 429 {stats["rate_limited"]}, '
+            f'ошибок {stats["errors"]}; circuit breaker: {telegram_breaker.snapshot()["state"]}'
+        )
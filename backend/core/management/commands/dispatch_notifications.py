@@ -0,0 +1,74 @@
+"""
+Воркер outbox Telegram-уведомлений (OutgoingNotification).
+
+Использование:
+    python manage.py dispatch_notifications          # постоянный воркер
+    python manage.py dispatch_notifications --once   # отправить готовые и выйти
+"""
+import logging
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.services.health import BreakerPublisher
+from core.services.notifications import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Отправляет Telegram-уведомления из outbox с ретраями и экспоненциальной паузой'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help='Пауза (сек), когда отправлять нечего',
+        )
+        parser.add_argument('--once', action='store_true', help='Отправить готовые уведомления и выйти')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        poll_interval = options['poll_interval']
+        once = options['once']
+
+        self.stop = threading.Event()
+        publisher = None
+        if not once:
+            signal.signal(signal.SIGTERM, self._shutdown)
+            signal.signal(signal.SIGINT, self._shutdown)
+            # Состояние breaker Bot API этого процесса — для /health/ веб-процесса
+            publisher = BreakerPublisher('dispatch_notifications').start()
+
+        total_sent = total_failed = 0
+
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    sent, failed = NotificationOutbox.dispatch_due(batch_size)
+                except Exception as e:
+                    logger.error(f"Ошибка воркера уведомлений: {e}")
+                    sent = failed = 0
+
+                total_sent += sent
+                total_failed += failed
+
+                if sent or failed:
+                    continue
+                if once:
+                    break
+                self.stop.wait(poll_interval)
+        finally:
+            if publisher:
+                publisher.stop()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Отправлено: {total_sent}, неудачных попыток: {total_failed}'
+        ))
+
+    def _shutdown(self, signum, frame):
+        logger.info(f"Получен сигнал {signum}, завершаем воркер уведомлений")
+        self.stop.set()
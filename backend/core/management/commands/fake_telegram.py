@@ -0,0 +1,54 @@
+"""
+Локальная замена Telegram Bot API (sendMessage) для нагрузочных прогонов.
+
+Уведомления пойдут в неё, если указать TELEGRAM_API_BASE_URL:
+    TELEGRAM_API_BASE_URL=http://127.0.0.1:8765 python manage.py dispatch_notifications
+
+Использование:
+    python manage.py fake_telegram
+    python manage.py fake_telegram --latency-ms 300 --error-rate 0.05 --flood-rate 0.02 --retry-after 3
+    python manage.py fake_telegram --max-rps 30          # 429, как flood control Telegram
+"""
+from django.core.management.base import BaseCommand
+
+from core.fake_telegram import FakeTelegramAPI, make_fake_server
+
+
+class Command(BaseCommand):
+    help = 'Запускает локальную имитацию Telegram Bot API (sendMessage) с задержками, 500 и 429'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency-ms', type=float, default=50, help='Средняя задержка ответа')
+        parser.add_argument('--jitter-ms', type=float, default=20, help='Разброс задержки (σ)')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 500')
+        parser.add_argument('--flood-rate', type=float, default=0.0, help='Доля ответов 429')
+        parser.add_argument('--retry-after', type=int, default=1, help='retry_after в ответах 429, сек')
+        parser.add_argument('--max-rps', type=float, default=0, help='Лимит сообщений в секунду (0 — без лимита)')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        app = FakeTelegramAPI(
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            error_rate=options['error_rate'],
+            flood_rate=options['flood_rate'],
+            retry_after=options['retry_after'],
+            max_rps=options['max_rps'],
+            seed=options['seed'],
+        )
+        server = make_fake_server(app, options['host'], options['port'])
+        self.stdout.write(
+            f'Fake Telegram Bot API: http://{options["host"]}:{server.server_port} '
+            f'(GET /stats, POST /reset). Ctrl+C — остановить.'
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        stats = app.stats()
+        stats.pop('arrivals')
+        self.stdout.write(self.style.SUCCESS(f'Остановлен: {stats}'))
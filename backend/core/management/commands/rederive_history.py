@@ -0,0 +1,250 @@
+"""
+Пересчёт исторических данных после изменения правил разбора.
+
+Что пересчитывается:
+- Grade.value — из teacher_comment правилами core.grading (только принятые работы);
+- Task.max_score — самый частый максимум из комментариев вида "44/54" по заданию;
+- Task.task_type — Task.detect_task_type по названию.
+
+После записи пачки пересчитываются срезы бота (StudentSnapshot, CourseSnapshot)
+затронутых учеников и курсов — bulk_update идёт в обход сигналов.
+
+Оценки читаются keyset-пачками по id (в памяти одна пачка), разбор идёт в пуле
+процессов, изменения пишутся bulk_update по пачке в отдельной транзакции.
+
+Осторожность:
+- значение никогда не затирается на None (комментарий «Зачёт» не удаляет балл);
+- балл меняется, только если он был получен из комментария прежним парсером
+  (либо был пуст): баллы автопроверки (task_result) и ручные правки из админки
+  не трогаем. --force снимает это ограничение.
+
+Прогресс сохраняется в checkpoint-файл после каждой пачки; --resume продолжает
+с места остановки.
+
+Использование:
+    python manage.py rederive_history --dry-run               # только статистика изменений
+    python manage.py rederive_history --workers 4 --chunk-size 5000
+    python manage.py rederive_history --resume                # продолжить прерванный запуск
+"""
+import json
+import multiprocessing
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.grading import extract_many
+from core.models import Course, Grade, Student, Task
+from core.services.snapshots import SnapshotService
+
+DEFAULT_CHECKPOINT = '/tmp/rederive_history.json'
+
+_LEGACY_FRACTION = re.compile(r'(\d+)\s*/\s*\d+')
+_LEGACY_NUMBER = re.compile(r'(\d+)')
+
+
+def _legacy_score(comment: str) -> int | None:
+    """Парсер до core.grading: по нему определяем, что балл был взят из комментария."""
+    if not comment:
+        return None
+    match = _LEGACY_FRACTION.search(comment) or _LEGACY_NUMBER.search(comment)
+    return int(match.group(1)) if match else None
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает Grade.value, Task.max_score и Task.task_type по текущим правилам разбора'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Ничего не писать, только показать изменения')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--force', action='store_true', help='Перезаписывать и баллы не из комментария')
+        parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help='Файл прогресса')
+        parser.add_argument('--resume', action='store_true', help='Продолжить с сохранённого прогресса')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.force = options['force']
+        self.checkpoint_path = options['checkpoint']
+        chunk_size = options['chunk_size']
+        workers = max(1, options['workers'])
+
+        state = self._load_checkpoint() if options['resume'] else self._new_state()
+        if self.dry_run:
+            self.stdout.write(self.style.WARNING('[DRY RUN] Изменения не сохраняются'))
+
+        started = time.perf_counter()
+        # Воркеры не трогают БД; spawn — чтобы дочерние процессы не унаследовали соединение
+        connection.close()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            if state['phase'] == 'grades':
+                self._rederive_grades(pool, workers, chunk_size, state)
+                state['phase'] = 'tasks'
+                state['last_id'] = 0
+                self._save_checkpoint(state)
+
+        self._rederive_tasks(chunk_size, state)
+        state['phase'] = 'done'
+        self._save_checkpoint(state)
+
+        self._report(state, time.perf_counter() - started)
+        if not self.dry_run and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    # ===========================================
+    # Оценки
+    # ===========================================
+
+    def _rederive_grades(self, pool, workers: int, chunk_size: int, state: dict):
+        stats = state['grades']
+        max_votes = state['max_votes']
+        queryset = Grade.objects.filter(status=Grade.Status.ACCEPTED).order_by('id')
+
+        while True:
+            rows = list(
+                queryset.filter(id__gt=state['last_id'])
+                .values_list('id', 'task_id', 'value', 'teacher_comment', 'student_id')[:chunk_size]
+            )
+            if not rows:
+                break
+
+            current = {row_id: rest for row_id, *rest in rows}
+            parts = [
+                [(row_id, comment, None) for row_id, _, _, comment, _ in rows[i::workers]]
+                for i in range(workers)
+            ]
+
+            changed = []
+            changed_students = set()
+            for results in pool.map(extract_many, parts):
+                for row_id, result in results:
+                    task_id, value, comment, student_id = current[row_id]
+                    stats['scanned'] += 1
+                    stats['rules'][result.rule] = stats['rules'].get(result.rule, 0) + 1
+
+                    if result.max_score:
+                        votes = max_votes.setdefault(str(task_id), {})
+                        votes[str(result.max_score)] = votes.get(str(result.max_score), 0) + 1
+
+                    if result.score is None or result.score == value:
+                        continue
+                    if not self.force and value is not None and value != _legacy_score(comment):
+                        # Балл не из комментария (автопроверка или ручная правка)
+                        stats['kept'] += 1
+                        continue
+
+                    changed.append(Grade(pk=row_id, value=result.score))
+                    changed_students.add(student_id)
+                    if len(stats['samples']) < 10:
+                        stats['samples'].append(f'#{row_id}: {value} → {result.score} ({comment[:50]!r})')
+
+            stats['changed'] += len(changed)
+            if changed and not self.dry_run:
+                with transaction.atomic():
+                    Grade.objects.bulk_update(changed, ['value'], batch_size=1000)
+                    # bulk_update идёт в обход сигналов — версию данных (ETag API) и срезы бота меняем сами
+                    Student.bump_data_version(*changed_students)
+                    SnapshotService.refresh_students(changed_students)
+
+            state['last_id'] = rows[-1][0]
+            self._save_checkpoint(state)
+            self.stdout.write(f'  оценки: до id={state["last_id"]}, просмотрено {stats["scanned"]}, изменений {stats["changed"]}')
+
+    # ===========================================
+    # Задания
+    # ===========================================
+
+    def _rederive_tasks(self, chunk_size: int, state: dict):
+        stats = state['tasks']
+        max_votes = state['max_votes']
+        last_id = 0
+
+        while True:
+            tasks = list(
+                Task.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .only('id', 'course_id', 'name', 'task_type', 'max_score')[:chunk_size]
+            )
+            if not tasks:
+                break
+            last_id = tasks[-1].id
+
+            changed = {}
+            max_changed = set()
+            for task in tasks:
+                task_type = Task.detect_task_type(task.name)
+                if task_type != task.task_type:
+                    task.task_type = task_type
+                    stats['task_type'] += 1
+                    changed[task.id] = task
+
+                votes = max_votes.get(str(task.id))
+                if votes:
+                    max_score = int(Counter(votes).most_common(1)[0][0])
+                    if max_score != task.max_score:
+                        task.max_score = max_score
+                        stats['max_score'] += 1
+                        changed[task.id] = task
+                        max_changed.add(task.id)
+
+            if changed and not self.dry_run:
+                with transaction.atomic():
+                    Task.objects.bulk_update(list(changed.values()), ['task_type', 'max_score'], batch_size=1000)
+                    course_ids = {task.course_id for task in changed.values()}
+                    Course.bump_data_version(*course_ids)
+                    # Проценты в срезах учеников зависят от max_score заданий
+                    if max_changed:
+                        SnapshotService.refresh_task_students(max_changed)
+                    for course_id in course_ids:
+                        SnapshotService.refresh_course(course_id)
+
+    # ===========================================
+    # Прогресс и отчёт
+    # ===========================================
+
+    @staticmethod
+    def _new_state() -> dict:
+        return {
+            'phase': 'grades',
+            'last_id': 0,
+            'grades': {'scanned': 0, 'changed': 0, 'kept': 0, 'rules': {}, 'samples': []},
+            'tasks': {'task_type': 0, 'max_score': 0},
+            # task_id → {max_score: сколько комментариев его указали}
+            'max_votes': defaultdict(dict),
+        }
+
+    def _load_checkpoint(self) -> dict:
+        try:
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            raise CommandError(f'Checkpoint не найден: {self.checkpoint_path}')
+        self.stdout.write(f'Продолжаем с фазы {state["phase"]}, id > {state["last_id"]}')
+        return state
+
+    def _save_checkpoint(self, state: dict):
+        if self.dry_run:
+            return
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _report(self, state: dict, elapsed: float):
+        grades = state['grades']
+        tasks = state['tasks']
+        prefix = '[DRY RUN] Было бы изменено' if self.dry_run else 'Изменено'
+
+        self.stdout.write(f'\nОценок просмотрено: {grades["scanned"]} за {elapsed:.1f} с')
+        self.stdout.write(f'Сработавшие правила: {grades["rules"]}')
+        for sample in grades['samples']:
+            self.stdout.write(f'  {sample}')
+        self.stdout.write(f'Оставлено без изменений (балл не из комментария): {grades["kept"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}: оценок {grades["changed"]}, max_score заданий {tasks["max_score"]}, '
+            f'типов заданий {tasks["task_type"]}'
+        ))
@@ -0,0 +1,51 @@
+"""
+Пересчёт срезов StudentSnapshot / CourseSnapshot, из которых отвечает бот (/grades, /schedule, /deadlines).
+
+Обычно срезы обновляются сами (вебхуки, сигналы моделей, rederive_history). Запускать
+после массовых правок в обход save() из shell и один раз после деплоя, чтобы первые
+ответы бота не строили срез на лету.
+
+Использование:
+    python manage.py refresh_snapshots                       # все ученики с Telegram и все курсы
+    python manage.py refresh_snapshots --all-students        # включая учеников без Telegram
+    python manage.py refresh_snapshots --email student@example.com
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import Course, Student
+from core.services.snapshots import SnapshotService
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает срезы учеников и курсов для команд бота'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all-students', action='store_true', help='Не только ученики с привязанным Telegram')
+        parser.add_argument('--email', action='append', default=[], help='Только указанные ученики (можно несколько)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        students = Student.objects.order_by('id')
+        if options['email']:
+            students = students.filter(email__in=[email.lower().strip() for email in options['email']])
+        elif not options['all_students']:
+            students = students.filter(telegram_id__isnull=False)
+
+        student_count = 0
+        for student_id in students.values_list('id', flat=True).iterator():
+            SnapshotService.refresh_student(student_id)
+            student_count += 1
+
+        course_count = 0
+        if not options['email']:
+            for course_id in Course.objects.order_by('id').values_list('id', flat=True):
+                SnapshotService.refresh_course(course_id)
+                course_count += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Срезы обновлены: учеников {student_count}, курсов {course_count} '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,235 @@
+"""
+Резидентный планировщик напоминаний (вместо cron + `docker exec` на каждый запуск).
+
+Держит в памяти очередь с приоритетом (heapq) из ближайших занятий и дедлайнов
+и отправляет напоминание ровно в срок: за LESSON_REMINDER_BEFORE_MINUTES до занятия,
+за DEADLINE_REMINDER_BEFORE_HOURS до дедлайна (если напоминания о дедлайнах включены).
+
+- Изменения подхватываются инкрементально: раз в --reload-interval секунд читаются
+  только записи с updated_at новее прошлой загрузки; раз в --resync-interval очередь
+  пересобирается целиком (удалённые записи, сдвиг горизонта).
+- В момент срабатывания данные перепроверяются в БД (claim в журнале ReminderLog):
+  перенесённое или удалённое занятие не отправится, повтор невозможен.
+- Раз в --sweep-interval — страховочный проход по всем неотправленным (простой, новые подписки).
+- SIGTERM/SIGINT — мягкая остановка; GET http://127.0.0.1:SCHEDULER_HEALTH_PORT/ — состояние.
+
+Использование:
+    python manage.py run_scheduler
+    python manage.py run_scheduler --health-port 0      # без health-эндпоинта
+"""
+import heapq
+import json
+import logging
+import signal
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from core.models import Deadline, ScheduleEvent
+from core.services.health import BreakerPublisher
+from core.services.reminders import DeadlineReminders, LessonReminders
+from core.services.telegram import telegram_breaker
+
+logger = logging.getLogger(__name__)
+
+# (ledger, модель, поле времени)
+SOURCES = {
+    'lesson': (LessonReminders, ScheduleEvent, 'scheduled_at'),
+    'deadline': (DeadlineReminders, Deadline, 'due_date'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Резидентный планировщик напоминаний о занятиях и дедлайнах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reload-interval', type=float, default=15.0, help='Инкрементальная загрузка, сек')
+        parser.add_argument('--resync-interval', type=float, default=600.0, help='Полная пересборка очереди, сек')
+        parser.add_argument('--sweep-interval', type=float, default=60.0, help='Страховочный проход, сек')
+        parser.add_argument('--horizon-hours', type=float, default=48.0, help='На сколько вперёд держать задачи')
+        parser.add_argument('--health-port', type=int, default=settings.SCHEDULER_HEALTH_PORT)
+
+    def handle(self, *args, **options):
+        self.reload_interval = options['reload_interval']
+        self.resync_interval = options['resync_interval']
+        self.sweep_interval = options['sweep_interval']
+        self.horizon = timedelta(hours=options['horizon_hours'])
+
+        self.stop = threading.Event()
+        signal.signal(signal.SIGTERM, self._shutdown)
+        signal.signal(signal.SIGINT, self._shutdown)
+
+        # heap: (fire_ts, kind, object_id); актуальное время задачи — в self.jobs,
+        # устаревшие записи heap (объект перенесли) пропускаются при извлечении
+        self.heap: list[tuple[float, str, int]] = []
+        self.jobs: dict[tuple[str, int], float] = {}
+        # Уже сработавшие задачи: повторная загрузка того же объекта их не перепланирует
+        self.fired: dict[tuple[str, int], float] = {}
+        self.loaded_until = None
+        self.state = {'started_at': time.time(), 'last_tick': time.time(), 'fired': 0, 'sent': 0, 'errors': 0}
+
+        health_server = self._start_health_server(options['health_port'])
+        # Состояние breaker Bot API этого процесса — для /health/ веб-процесса
+        publisher = BreakerPublisher('run_scheduler').start()
+        self.stdout.write(f'Планировщик запущен (health: {options["health_port"] or "выкл"})')
+
+        next_resync = next_reload = next_sweep = 0.0
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                now_ts = time.time()
+                self.state['last_tick'] = now_ts
+                try:
+                    if now_ts >= next_resync:
+                        self._resync()
+                        next_resync = now_ts + self.resync_interval
+                        next_reload = now_ts + self.reload_interval
+                    elif now_ts >= next_reload:
+                        self._reload()
+                        next_reload = now_ts + self.reload_interval
+                    if now_ts >= next_sweep:
+                        self._sweep()
+                        next_sweep = now_ts + self.sweep_interval
+                    self._fire_due()
+                except Exception as e:
+                    # БД недоступна и т.п. — не падаем, пробуем на следующем тике
+                    self.state['errors'] += 1
+                    logger.exception(f"Ошибка планировщика: {e}")
+                    connection.close()
+
+                wake_at = min(next_reload, next_sweep, next_resync)
+                if self.heap:
+                    wake_at = min(wake_at, self.heap[0][0])
+                self.stop.wait(max(0.0, wake_at - time.time()))
+        finally:
+            publisher.stop()
+            if health_server:
+                health_server.shutdown()
+            connection.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Планировщик остановлен: задач {self.state["fired"]}, отправлено {self.state["sent"]}'
+        ))
+
+    # ===========================================
+    # Очередь задач
+    # ===========================================
+
+    def _schedule(self, kind: str, object_id: int, moment) -> bool:
+        """Ставит (или переносит) задачу. False — такая задача уже стоит или сработала."""
+        ledger = SOURCES[kind][0]
+        fire_ts = ledger.fire_at(moment).timestamp()
+        if self.jobs.get((kind, object_id)) == fire_ts or self.fired.get((kind, object_id)) == fire_ts:
+            return False
+        self.jobs[(kind, object_id)] = fire_ts
+        heapq.heappush(self.heap, (fire_ts, kind, object_id))
+        return True
+
+    def _load(self, updated_after=None) -> int:
+        now = timezone.now()
+        loaded = 0
+        for kind, (ledger, model, time_field) in SOURCES.items():
+            if not ledger.enabled():
+                continue
+            queryset = model.objects.filter(**{
+                f'{time_field}__gte': now - ledger.grace(),
+                f'{time_field}__lte': now + ledger.before() + self.horizon,
+            })
+            if updated_after is not None:
+                queryset = queryset.filter(updated_at__gt=updated_after)
+            for object_id, moment in queryset.values_list('id', time_field).iterator():
+                loaded += self._schedule(kind, object_id, moment)
+        return loaded
+
+    def _resync(self):
+        """Полная пересборка: удалённые объекты уходят из очереди, горизонт сдвигается."""
+        started = timezone.now()
+        self.heap, self.jobs = [], {}
+        cutoff = time.time() - 86400
+        self.fired = {key: fire_ts for key, fire_ts in self.fired.items() if fire_ts > cutoff}
+        loaded = self._load()
+        self.loaded_until = started
+        logger.info(f"Планировщик: полная загрузка, задач {loaded}")
+
+    def _reload(self):
+        """Инкрементально: только изменённые после прошлой загрузки занятия и дедлайны."""
+        started = timezone.now()
+        # Небольшой запас назад — не теряем запись, закоммиченную во время прошлой загрузки
+        loaded = self._load(updated_after=self.loaded_until - timedelta(seconds=5))
+        self.loaded_until = started
+        if loaded:
+            logger.info(f"Планировщик: обновлено задач {loaded}")
+
+    def _fire_due(self):
+        while self.heap and self.heap[0][0] <= time.time() and not self.stop.is_set():
+            fire_ts, kind, object_id = heapq.heappop(self.heap)
+            if self.jobs.get((kind, object_id)) != fire_ts:
+                continue  # устаревшая запись: объект перенесли
+            del self.jobs[(kind, object_id)]
+            self.fired[(kind, object_id)] = fire_ts
+
+            report = SOURCES[kind][0].send_due(ids=[object_id])
+            self.state['fired'] += 1
+            self.state['sent'] += report.sent
+            if report.sent or report.failed:
+                logger.info(f"Напоминание {kind} #{object_id}: {report}")
+
+    def _sweep(self):
+        for ledger, _, _ in SOURCES.values():
+            report = ledger.send_due()
+            if report.sent or report.failed:
+                self.state['sent'] += report.sent
+                logger.info(f"Страховочный проход ({ledger.kind}): {report}")
+
+    # ===========================================
+    # Health и остановка
+    # ===========================================
+
+    def _health(self) -> tuple[int, dict]:
+        now = time.time()
+        # Главный цикл просыпается не реже reload_interval; отправка пачки может занять время
+        stalled = now - self.state['last_tick'] > max(self.reload_interval, self.sweep_interval) * 3
+        next_fire = self.heap[0][0] if self.heap else None
+        body = {
+            'status': 'stalled' if stalled else 'ok',
+            'jobs': len(self.jobs),
+            'next_fire_in': round(next_fire - now, 1) if next_fire else None,
+            'uptime': round(now - self.state['started_at']),
+            'fired': self.state['fired'],
+            'sent': self.state['sent'],
+            'errors': self.state['errors'],
+            'telegram': telegram_breaker.snapshot(),
+        }
+        return (503 if stalled else 200), body
+
+    def _start_health_server(self, port: int):
+        if not port:
+            return None
+        command = self
+
+        class HealthHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, body = command._health()
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('0.0.0.0', port), HealthHandler)
+        threading.Thread(target=server.serve_forever, name='scheduler-health', daemon=True).start()
+        return server
+
+    def _shutdown(self, signum, frame):
+        logger.info(f"Получен сигнал {signum}, останавливаем планировщик")
+        self.stop.set()
@@ -0,0 +1,70 @@
+"""
+Воркер рассылок по курсу (Broadcast), которые создаются действием «Рассылка ученикам» в админке.
+
+Отправка идёт пачками с лимитами Bot API; статус каждого получателя сохраняется,
+поэтому после перезапуска рассылка продолжается с неотправленных.
+
+Использование:
+    python manage.py send_broadcasts          # постоянный воркер
+    python manage.py send_broadcasts --once   # отправить рассылки в очереди и выйти
+"""
+import logging
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.services.broadcasts import BroadcastSender
+from core.services.health import BreakerPublisher
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Отправляет рассылки по курсам с лимитами Telegram и возобновлением после сбоя'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval', type=float, default=5.0,
+            help='Пауза (сек), когда рассылок в очереди нет',
+        )
+        parser.add_argument('--once', action='store_true', help='Отправить рассылки в очереди и выйти')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        signal.signal(signal.SIGTERM, self._shutdown)
+        signal.signal(signal.SIGINT, self._shutdown)
+
+        # Состояние breaker Bot API этого процесса — для /health/ веб-процесса
+        publisher = None if options['once'] else BreakerPublisher('send_broadcasts').start()
+
+        done = 0
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    broadcast = BroadcastSender.claim_next()
+                    if broadcast is not None:
+                        done += BroadcastSender.run(broadcast, self.stop)
+                        broadcast.refresh_from_db()
+                        self.stdout.write(
+                            f'Рассылка #{broadcast.pk}: отправлено {broadcast.sent}/{broadcast.total}, '
+                            f'ошибок {broadcast.failed} ({broadcast.get_status_display()})'
+                        )
+                        continue
+                except Exception as e:
+                    logger.exception(f"Ошибка воркера рассылок: {e}")
+
+                if options['once']:
+                    break
+                self.stop.wait(options['poll_interval'])
+        finally:
+            if publisher:
+                publisher.stop()
+
+        self.stdout.write(self.style.SUCCESS(f'Завершено рассылок: {done}'))
+
+    def _shutdown(self, signum, frame):
+        logger.info(f"Получен сигнал {signum}, останавливаем рассылку после текущей пачки")
+        self.stop.set()
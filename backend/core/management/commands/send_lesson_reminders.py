@@ -1,66 +1,37 @@
 """
 Команда для отправки напоминаний о предстоящих занятиях.
 
-Cron на сервере (каждые 5 минут):
-  */5 * * * * docker exec backend-web-1 python manage.py send_lesson_reminders >> /var/log/lesson_reminders.log 2>&1
+Отправленные напоминания фиксируются в журнале ReminderLog (уникально по занятию,
+ученику и виду), поэтому команду можно запускать с любой частотой и после простоя:
+каждый прогон отправляет только то, что ещё не отправлено. Окно — занятия,
+начинающиеся в ближайшие LESSON_REMINDER_BEFORE_MINUTES минут (или начавшиеся
+не больше LESSON_REMINDER_GRACE_MINUTES минут назад).
+
+Отправка — конкурентно через TelegramFanout с лимитами Telegram
+(глобальный token bucket, ~1 сообщение/с в чат, пауза по retry_after на 429).
+
+В проде напоминания отправляет резидентный планировщик `run_scheduler` (сервис
+`scheduler` в docker-compose) — точно в срок и без запуска Django на каждый прогон.
+Эта команда — разовый ручной прогон (например, догнать пропущенное):
+  python manage.py send_lesson_reminders
 """
 import logging
-from datetime import timedelta
 
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 
-from core.models import ScheduleEvent, Enrollment
-from core.services.telegram import TelegramNotificationService
+from core.services.reminders import LessonReminders
 
 logger = logging.getLogger(__name__)
 
-REMIND_BEFORE_MIN = 15
-REMIND_WINDOW_MIN = 5
-
 
 class Command(BaseCommand):
-    help = 'Отправляет Telegram-напоминания о занятиях, начинающихся через ~15 минут (1 раз)'
+    help = 'Отправляет Telegram-напоминания о ближайших занятиях (без дублей, по журналу ReminderLog)'
 
     def handle(self, *args, **options):
-        now = timezone.now()
-        window_start = now + timedelta(minutes=REMIND_BEFORE_MIN)
-        window_end = now + timedelta(minutes=REMIND_BEFORE_MIN + REMIND_WINDOW_MIN)
-
-        upcoming = ScheduleEvent.objects.filter(
-            scheduled_at__gte=window_start,
-            scheduled_at__lt=window_end,
-        ).select_related('course')
+        report = LessonReminders.send_due()
 
-        if not upcoming.exists():
-            self.stdout.write('Нет предстоящих занятий в окне уведомлений.')
+        if not report.sent and not report.failed:
+            self.stdout.write('Нет неотправленных напоминаний.')
             return
 
-        service = TelegramNotificationService()
-        sent = 0
-
-        for event in upcoming:
-            course = event.course
-            enrollments = Enrollment.objects.filter(
-                course=course,
-                status=Enrollment.Status.ACTIVE,
-            ).select_related('student')
-
-            for enrollment in enrollments:
-                student = enrollment.student
-                if not student.telegram_id:
-                    continue
-                ok = service.notify_lesson_reminder(
-                    telegram_id=student.telegram_id,
-                    course_name=course.name,
-                    lesson_title=event.title,
-                    zoom_url=course.zoom_url,
-                    zoom_passcode=course.zoom_passcode,
-                )
-                if ok:
-                    sent += 1
-                    logger.info(f'Напоминание → {student.email} ({course.name})')
-                else:
-                    logger.warning(f'Не удалось отправить: {student.email} tg={student.telegram_id}')
-
-        self.stdout.write(self.style.SUCCESS(f'Отправлено {sent} напоминаний.'))
+        self.stdout.write(self.style.SUCCESS(f'Напоминания: {report}'))
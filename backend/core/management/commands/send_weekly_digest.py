@@ -0,0 +1,97 @@
+"""
+Недельная сводка прогресса ученикам в Telegram: принято заданий за неделю,
+средний результат, серия дней подряд и несданные дедлайны ближайшей недели.
+
+Цифры для всех учеников считаются несколькими групповыми SQL-запросами
+(core.services.digest.WeeklyDigest), отправка — через TelegramFanout с лимитами
+Bot API. В конце печатается время и число SQL-запросов каждой фазы.
+Ученики без принятых заданий и без дедлайнов сводку не получают.
+
+Использование (раз в неделю, например в воскресенье вечером):
+    python manage.py send_weekly_digest
+    python manage.py send_weekly_digest --dry-run                 # посчитать и показать пример, не отправлять
+    python manage.py send_weekly_digest --email student@example.com
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.services.digest import WeeklyDigest
+from core.services.fanout import FanoutMessage, TelegramFanout
+from core.services.telegram import TelegramNotificationService
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """Обёртка connection.execute_wrapper: считает SQL-запросы без сохранения их текста."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Отправляет ученикам недельную сводку прогресса (групповые запросы + троттлинг отправки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Не отправлять, показать пример сообщения')
+        parser.add_argument('--email', action='append', default=[], help='Только этим ученикам (можно несколько)')
+
+    def handle(self, *args, **options):
+        self.phases = []
+        digest = WeeklyDigest(emails=options['email'] or None)
+
+        with self._phase('получатели'):
+            recipients = digest.recipients()
+        with self._phase('оценки (GROUP BY)'):
+            grade_stats = digest.grade_stats()
+        with self._phase('серии (DISTINCT дни)'):
+            streaks = digest.streaks()
+        with self._phase('дедлайны'):
+            deadlines = digest.upcoming_deadlines()
+
+        with self._phase('сообщения'):
+            messages = []
+            for recipient in recipients:
+                week, total, average = grade_stats.get(recipient.student_id, (0, 0, 0))
+                student_deadlines = deadlines.get(recipient.student_id, [])
+                if not total and not student_deadlines:
+                    continue
+                messages.append(FanoutMessage(
+                    chat_id=recipient.telegram_id,
+                    text=TelegramNotificationService.format_weekly_digest(
+                        week, average, streaks.get(recipient.student_id, 0), student_deadlines,
+                    ),
+                    key=recipient.student_id,
+                ))
+
+        self.stdout.write(f'Получателей: {len(recipients)}, сводок: {len(messages)}')
+
+        if options['dry_run']:
+            if messages:
+                self.stdout.write(f'\nПример (chat_id={messages[0].chat_id}):\n{messages[0].text}\n')
+        elif messages:
+            with self._phase('отправка'):
+                report = TelegramFanout().run(messages)
+            self.stdout.write(self.style.SUCCESS(f'Отправка: {report}'))
+            if report.failed:
+                logger.warning(f"Недельная сводка не доставлена {report.failed} ученикам")
+
+        self.stdout.write('\nФазы:')
+        for name, elapsed, queries in self.phases:
+            self.stdout.write(f'  {name:<22} {elapsed * 1000:8.1f} мс  SQL: {queries}')
+
+    @contextmanager
+    def _phase(self, name: str):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            yield
+        self.phases.append((name, time.perf_counter() - started, counter.count))
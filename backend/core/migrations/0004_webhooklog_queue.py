@@ -0,0 +1,48 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_course_zoom_fields'),
+    ]
+
+    operations = [
+        # Уже существующие логи обработаны синхронно старым view — помечаем их DONE,
+        # чтобы воркер не применил историю повторно. Для новых записей default = PENDING.
+        migrations.AddField(
+            model_name='webhooklog',
+            name='status',
+            field=models.CharField(choices=[('pending', 'В очереди'), ('done', 'Обработан'), ('failed', 'Ошибка')], default='done', max_length=20),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='webhooklog',
+            name='status',
+            field=models.CharField(choices=[('pending', 'В очереди'), ('done', 'Обработан'), ('failed', 'Ошибка')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='webhooklog',
+            name='timestamp',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Время события (unix)'),
+        ),
+        migrations.AddField(
+            model_name='webhooklog',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Попыток'),
+        ),
+        migrations.AddField(
+            model_name='webhooklog',
+            name='last_error',
+            field=models.TextField(blank=True, default='', verbose_name='Последняя ошибка'),
+        ),
+        migrations.AddField(
+            model_name='webhooklog',
+            name='handled_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Обработан в'),
+        ),
+        migrations.AddIndex(
+            model_name='webhooklog',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['id'], name='core_webhooklog_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_webhooklog_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhooklog',
+            name='partition_key',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RemoveIndex(
+            model_name='webhooklog',
+            name='core_webhooklog_pending_idx',
+        ),
+        migrations.AddIndex(
+            model_name='webhooklog',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['timestamp', 'id'], name='core_webhooklog_pending_idx'),
+        ),
+    ]
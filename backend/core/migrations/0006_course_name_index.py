@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_webhooklog_partition_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='name',
+            field=models.CharField(db_index=True, max_length=500),
+        ),
+    ]
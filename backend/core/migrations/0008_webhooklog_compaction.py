@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_outgoingnotification'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='webhooklog',
+            name='payload',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhooklog',
+            name='payload_compressed',
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='webhooklog',
+            name='processed_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_webhooklog_compaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('lesson', 'Занятие')], default='lesson', max_length=20)),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='core.scheduleevent')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='core.student')),
+            ],
+            options={
+                'verbose_name': 'Отправленное напоминание',
+                'verbose_name_plural': 'Отправленные напоминания',
+                'ordering': ['-sent_at'],
+                'constraints': [models.UniqueConstraint(fields=('event', 'student', 'kind'), name='core_reminderlog_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_reminderlog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduleevent',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='deadline',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RemoveConstraint(
+            model_name='reminderlog',
+            name='core_reminderlog_unique',
+        ),
+        migrations.AlterField(
+            model_name='reminderlog',
+            name='event',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='core.scheduleevent'),
+        ),
+        migrations.AddField(
+            model_name='reminderlog',
+            name='deadline',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='core.deadline'),
+        ),
+        migrations.AlterField(
+            model_name='reminderlog',
+            name='kind',
+            field=models.CharField(choices=[('lesson', 'Занятие'), ('deadline', 'Дедлайн')], default='lesson', max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='reminderlog',
+            constraint=models.UniqueConstraint(condition=models.Q(('event__isnull', False)), fields=('event', 'student', 'kind'), name='core_reminderlog_event_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='reminderlog',
+            constraint=models.UniqueConstraint(condition=models.Q(('deadline__isnull', False)), fields=('deadline', 'student', 'kind'), name='core_reminderlog_deadline_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='reminderlog',
+            constraint=models.CheckConstraint(check=models.Q(('event__isnull', False), ('deadline__isnull', False), _connector='OR'), name='core_reminderlog_has_target'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_scheduler'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outgoingnotification',
+            name='kind',
+            field=models.CharField(choices=[('message', 'Сообщение'), ('grade', 'Оценка')], default='message', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='outgoingnotification',
+            name='payload',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='outgoingnotification',
+            name='status',
+            field=models.CharField(choices=[('pending', 'В очереди'), ('sending', 'Отправляется'), ('sent', 'Отправлено'), ('failed', 'Ошибка')], default='pending', max_length=20),
+        ),
+        migrations.RemoveIndex(
+            model_name='outgoingnotification',
+            name='core_notification_due_idx',
+        ),
+        migrations.AddIndex(
+            model_name='outgoingnotification',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'sending'])), fields=['next_attempt_at', 'id'], name='core_notification_due_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_broadcast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSnapshot',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='core.student')),
+                ('course_ids', models.JSONField(default=list)),
+                ('accepted_total', models.PositiveIntegerField(default=0)),
+                ('average_percent', models.PositiveSmallIntegerField(default=0)),
+                ('recent_grades', models.JSONField(default=list)),
+                ('done_deadline_keys', models.JSONField(default=list)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Срез ученика',
+                'verbose_name_plural': 'Срезы учеников',
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseSnapshot',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='core.course')),
+                ('name', models.CharField(max_length=500)),
+                ('schedule', models.JSONField(default=list)),
+                ('deadlines', models.JSONField(default=list)),
+                ('valid_until', models.DateTimeField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Срез курса',
+                'verbose_name_plural': 'Срезы курсов',
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='data_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='data_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_cachegeneration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerStatus',
+            fields=[
+                ('name', models.CharField(max_length=150, primary_key=True, serialize=False, verbose_name='Воркер')),
+                ('telegram', models.JSONField(default=dict, verbose_name='Telegram breaker')),
+                ('updated_at', models.DateTimeField(verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Состояние воркера',
+                'verbose_name_plural': 'Состояния воркеров',
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+def drop_snapshots(apps, schema_editor):
+    # Записи recent_grades получили id задания: старые срезы пересобираются при первом чтении
+    apps.get_model('core', 'StudentSnapshot').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_workerstatus'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentsnapshot',
+            name='percent_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='studentsnapshot',
+            name='percent_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(drop_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_snapshot_percent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastrecipient',
+            name='last_error',
+            field=models.TextField(blank=True, default='', verbose_name='Ошибка'),
+        ),
+    ]
@@ -1,10 +1,47 @@
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
 from django.utils import timezone
 from datetime import timedelta
-import re
+import json
+import time
+import zlib
 
+from .grading import extract_grade
 
-class Student(models.Model):
+
+def next_data_version() -> int:
+    """Новая версия данных — время в микросекундах, поэтому она больше любой выданной раньше."""
+    return time.time_ns() // 1000
+
+
+class DataVersionMixin(models.Model):
+    """
+    Версия данных для ETag в API (core.views): меняется при любой записи, влияющей на ответы.
+
+    save() проставляет новую версию сам; записи в обход save() (bulk/raw SQL в вебхуках,
+    сигналы на связанные модели) вызывают bump_data_version.
+    """
+
+    data_version = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        self.data_version = next_data_version()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'data_version'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def bump_data_version(cls, *pks: int):
+        cls.objects.filter(pk__in=pks).update(
+            data_version=Greatest(F('data_version') + 1, Value(next_data_version())),
+        )
+
+
+class Student(DataVersionMixin):
     """Ученик онлайн-школы."""
 
     email = models.EmailField(unique=True, db_index=True)
@@ -81,10 +118,11 @@ class Student(models.Model):
         }
 
 
-class Course(models.Model):
+class Course(DataVersionMixin):
     """Курс в ZenClass."""
 
-    name = models.CharField(max_length=500)
+    # Индекс: вебхук ищет курс по имени, если тот был создан импортом с синтетическим UUID
+    name = models.CharField(max_length=500, db_index=True)
     zenclass_id = models.UUIDField(unique=True, db_index=True)
     students = models.ManyToManyField(
         Student,
@@ -221,25 +259,10 @@ class Grade(models.Model):
     @staticmethod
     def parse_score_from_comment(comment: str) -> int | None:
         """
-        Извлекает оценку из комментария учителя.
-        Ищет первую цифру или паттерн вида "5/5", "Оценка: 5".
+        Извлекает оценку из комментария учителя ("5/5", "Оценка: 5", "Балл 4", первое число).
+        Правила — в core.grading.
         """
-        if not comment:
-            return None
-
-        comment = comment.strip()
-
-        # Паттерн "X/Y" — берём X
-        match = re.search(r'(\d+)\s*/\s*\d+', comment)
-        if match:
-            return int(match.group(1))
-
-        # Паттерн "Оценка: X" или просто цифра в начале
-        match = re.search(r'(\d+)', comment)
-        if match:
-            return int(match.group(1))
-
-        return None
+        return extract_grade(comment).score
 
 
 class ScheduleEvent(models.Model):
@@ -250,6 +273,8 @@ class ScheduleEvent(models.Model):
     scheduled_at = models.DateTimeField(db_index=True)
     duration_minutes = models.PositiveIntegerField(default=90, verbose_name='Длительность (мин)')
     created_at = models.DateTimeField(auto_now_add=True)
+    # По нему run_scheduler подхватывает изменения без полной перезагрузки
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = 'Занятие в расписании'
@@ -276,6 +301,7 @@ class Deadline(models.Model):
     due_date = models.DateTimeField(db_index=True)
     submitted = models.BooleanField(default=False, verbose_name='Сдано')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = 'Дедлайн'
@@ -322,17 +348,329 @@ class CourseWebhookSecret(models.Model):
 
 
 class WebhookLog(models.Model):
-    """Лог обработанных вебхуков (для идемпотентности)."""
+    """
+    Лог вебхуков: идемпотентность + очередь на обработку.
+
+    View только проверяет подпись и создаёт запись со статусом PENDING,
+    события применяет воркер `manage.py process_webhooks`.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'В очереди'
+        DONE = 'done', 'Обработан'
+        FAILED = 'failed', 'Ошибка'
 
     webhook_id = models.CharField(max_length=64, unique=True, db_index=True)
     event_name = models.CharField(max_length=100)
-    payload = models.JSONField()
-    processed_at = models.DateTimeField(auto_now_add=True)
+    # Горячие записи хранят payload как JSON; `compact_webhook_log` переносит старые
+    # обработанные в payload_compressed (zlib) или удаляет, оставляя ключ идемпотентности
+    payload = models.JSONField(null=True, blank=True)
+    payload_compressed = models.BinaryField(null=True, blank=True, editable=False)
+    timestamp = models.BigIntegerField(null=True, blank=True, verbose_name='Время события (unix)')
+    # crc32(email ученика): события одного ученика попадают в одну партицию воркера
+    partition_key = models.IntegerField(default=0)
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')
+    last_error = models.TextField(blank=True, default='', verbose_name='Последняя ошибка')
+    processed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    handled_at = models.DateTimeField(null=True, blank=True, verbose_name='Обработан в')
 
     class Meta:
         verbose_name = 'Лог вебхука'
         verbose_name_plural = 'Логи вебхуков'
         ordering = ['-processed_at']
+        indexes = [
+            # Частичный индекс: воркер и проверка глубины очереди смотрят только на PENDING
+            models.Index(
+                fields=['timestamp', 'id'],
+                name='core_webhooklog_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.event_name} - {self.webhook_id}"
+
+    def get_payload(self) -> dict | None:
+        """Payload с учётом компактизации: JSON или распакованная zlib-копия."""
+        if self.payload is not None:
+            return self.payload
+        if self.payload_compressed:
+            return json.loads(zlib.decompress(bytes(self.payload_compressed)))
+        return None
+
+
+class CacheGeneration(models.Model):
+    """
+    Поколение внутрипроцессного кэша (например, identity map вебхуков).
+
+    Процесс, изменивший данные, увеличивает value; остальные процессы периодически
+    сверяют поколение и сбрасывают свой кэш, если оно сменилось.
+    """
+
+    IDENTITY_MAP = 'identity_map'
+
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Поколение кэша'
+        verbose_name_plural = 'Поколения кэшей'
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+    @classmethod
+    def bump(cls, name: str):
+        if not cls.objects.filter(name=name).update(value=F('value') + 1):
+            cls.objects.bulk_create([cls(name=name, value=1)], ignore_conflicts=True)
+
+    @classmethod
+    def current(cls, name: str) -> int:
+        return cls.objects.filter(name=name).values_list('value', flat=True).first() or 0
+
+
+class WorkerStatus(models.Model):
+    """
+    Последнее состояние circuit breaker Bot API в процессе воркера.
+
+    Breaker живёт в памяти процесса, поэтому воркеры (dispatch_notifications,
+    send_broadcasts, run_scheduler) периодически публикуют его сюда, а `/health/`
+    веб-процесса читает свежие записи.
+    """
+
+    name = models.CharField('Воркер', max_length=150, primary_key=True)
+    telegram = models.JSONField('Telegram breaker', default=dict)
+    updated_at = models.DateTimeField('Обновлено')
+
+    class Meta:
+        verbose_name = 'Состояние воркера'
+        verbose_name_plural = 'Состояния воркеров'
+
+    def __str__(self):
+        return f"{self.name}: {self.telegram.get('state')}"
+
+
+# chat_id синтетических учеников бенчмарков. Telegram выдаёт id не длиннее 52 бит, поэтому
+# диапазон не пересекается с настоящими: воркеры (outbox, напоминания) его пропускают,
+# а бенчмарк разбирает только его
+SYNTHETIC_TELEGRAM_IDS = (2 ** 53, 2 ** 53 + 10_000_000)
+
+
+class OutgoingNotification(models.Model):
+    """
+    Исходящее Telegram-уведомление (transactional outbox).
+
+    Пишется в той же транзакции, что и изменение данных (например, оценка),
+    поэтому уведомление уходит только если изменение закоммичено.
+    Отправляет воркер `manage.py dispatch_notifications` с ретраями и экспоненциальной паузой.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'В очереди'
+        SENDING = 'sending', 'Отправляется'  # взято воркером до next_attempt_at (аренда)
+        SENT = 'sent', 'Отправлено'
+        FAILED = 'failed', 'Ошибка'
+
+    class Kind(models.TextChoices):
+        MESSAGE = 'message', 'Сообщение'
+        GRADE = 'grade', 'Оценка'  # склеиваются в одну сводку на ученика
+
+    telegram_id = models.BigIntegerField()
+    text = models.TextField()
+    kind = models.CharField(max_length=20, choices=Kind.choices, default=Kind.MESSAGE)
+    # Данные для сводки (для GRADE: course_name, task_name, score, max_score)
+    payload = models.JSONField(null=True, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    last_error = models.TextField(blank=True, default='', verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Очередь уведомлений'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at', 'id'],
+                name='core_notification_due_idx',
+                condition=models.Q(status__in=['pending', 'sending']),
+            ),
+        ]
+
+    def __str__(self):
+        return f"tg={self.telegram_id} ({self.get_status_display()})"
+
+
+class ReminderLog(models.Model):
+    """
+    Журнал отправленных напоминаний: одна строка на (занятие или дедлайн, ученик, вид).
+
+    Уникальный ключ не даёт отправить напоминание дважды при любом расписании
+    запуска — пересекающиеся и запоздавшие прогоны просто не находят неотправленных.
+    """
+
+    class Kind(models.TextChoices):
+        LESSON = 'lesson', 'Занятие'
+        DEADLINE = 'deadline', 'Дедлайн'
+
+    event = models.ForeignKey(
+        ScheduleEvent, on_delete=models.CASCADE, related_name='reminders', null=True, blank=True,
+    )
+    deadline = models.ForeignKey(
+        Deadline, on_delete=models.CASCADE, related_name='reminders', null=True, blank=True,
+    )
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='reminders')
+    kind = models.CharField(max_length=20, choices=Kind.choices, default=Kind.LESSON)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Отправленное напоминание'
+        verbose_name_plural = 'Отправленные напоминания'
+        ordering = ['-sent_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['event', 'student', 'kind'],
+                name='core_reminderlog_event_unique',
+                condition=models.Q(event__isnull=False),
+            ),
+            models.UniqueConstraint(
+                fields=['deadline', 'student', 'kind'],
+                name='core_reminderlog_deadline_unique',
+                condition=models.Q(deadline__isnull=False),
+            ),
+            models.CheckConstraint(
+                check=models.Q(event__isnull=False) | models.Q(deadline__isnull=False),
+                name='core_reminderlog_has_target',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.student} — {self.event or self.deadline} ({self.get_kind_display()})"
+
+
+class Broadcast(models.Model):
+    """
+    Рассылка сообщения всем активным ученикам курса (создаётся действием в админке).
+
+    Отправляет воркер `manage.py send_broadcasts`: получатели фиксируются в
+    BroadcastRecipient со статусом, поэтому прерванная рассылка продолжается
+    с неотправленных.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'В очереди'
+        RUNNING = 'running', 'Отправляется'
+        DONE = 'done', 'Завершена'
+
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='broadcasts')
+    text = models.TextField(verbose_name='Текст')
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    created_by = models.CharField(max_length=150, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Пульс воркера: RUNNING-рассылку без пульса дольше аренды подхватит другой воркер
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    total = models.PositiveIntegerField(default=0, verbose_name='Получателей')
+    sent = models.PositiveIntegerField(default=0, verbose_name='Отправлено')
+    failed = models.PositiveIntegerField(default=0, verbose_name='Ошибок')
+
+    class Meta:
+        verbose_name = 'Рассылка'
+        verbose_name_plural = 'Рассылки'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.course.name}: {self.text[:40]}"
+
+
+class BroadcastRecipient(models.Model):
+    """Получатель рассылки и статус отправки ему."""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'В очереди'
+        SENT = 'sent', 'Отправлено'
+        FAILED = 'failed', 'Ошибка'
+
+    broadcast = models.ForeignKey(Broadcast, on_delete=models.CASCADE, related_name='recipients')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='broadcasts')
+    telegram_id = models.BigIntegerField()
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='', verbose_name='Ошибка')
+
+    class Meta:
+        verbose_name = 'Получатель рассылки'
+        verbose_name_plural = 'Получатели рассылок'
+        constraints = [
+            models.UniqueConstraint(fields=['broadcast', 'student'], name='core_broadcastrecipient_unique'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['broadcast', 'id'],
+                name='core_broadcast_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.student} ({self.get_status_display()})"
+
+
+class StudentSnapshot(models.Model):
+    """
+    Компактный срез данных ученика для ответов бота (/grades, /deadlines).
+
+    Обновляется при обработке вебхука с оценкой (инкрементально), подпиской и при правке
+    в админке (core.services.snapshots) — бот читает одну строку вместо выборки всех оценок.
+    """
+
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    course_ids = models.JSONField(default=list)  # активные подписки
+    accepted_total = models.PositiveIntegerField(default=0)
+    average_percent = models.PositiveSmallIntegerField(default=0)
+    # Сумма и число процентов оценок с баллом — для пересчёта среднего без выборки всех оценок
+    percent_sum = models.FloatField(default=0)
+    percent_count = models.PositiveIntegerField(default=0)
+    # Последние проверенные: [курс, задание, балл, максимум, checked_at ISO, id задания]
+    recent_grades = models.JSONField(default=list)
+    # Даты из названий принятых заданий ("<course_id>:2 марта") — дедлайн с такой датой считается сданным
+    done_deadline_keys = models.JSONField(default=list)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Срез ученика'
+        verbose_name_plural = 'Срезы учеников'
+
+    def __str__(self):
+        return f"Срез {self.student_id}"
+
+
+class CourseSnapshot(models.Model):
+    """Ближайшие занятия и дедлайны курса для ответов бота (/schedule, /deadlines)."""
+
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    name = models.CharField(max_length=500)
+    schedule = models.JSONField(default=list)   # [scheduled_at ISO, название]
+    deadlines = models.JSONField(default=list)  # [due_date ISO, название, сдано]
+    # Списки обрезаны: после этого момента в них может не хватать событий — срез пересчитывается
+    valid_until = models.DateTimeField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Срез курса'
+        verbose_name_plural = 'Срезы курсов'
+
+    def __str__(self):
+        return f"Срез {self.name}"
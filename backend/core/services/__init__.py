@@ -1,8 +1,20 @@
 from .telegram import TelegramAuthService, TelegramNotificationService
 from .google_sheets import GoogleSheetsService
+from .notifications import NotificationOutbox
+from .fanout import FanoutMessage, TelegramFanout
+from .reminders import DeadlineReminders, LessonReminders
+from .broadcasts import BroadcastSender
+from .snapshots import SnapshotService
 
 __all__ = [
     'TelegramAuthService',
     'TelegramNotificationService',
     'GoogleSheetsService',
+    'NotificationOutbox',
+    'FanoutMessage',
+    'TelegramFanout',
+    'LessonReminders',
+    'DeadlineReminders',
+    'BroadcastSender',
+    'SnapshotService',
 ]
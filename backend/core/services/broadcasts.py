@@ -0,0 +1,140 @@
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.models import Broadcast, BroadcastRecipient, Enrollment
+from .fanout import FanoutMessage, TelegramFanout
+from .telegram import telegram_breaker
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastSender:
+    """
+    Отправка рассылок по курсу (воркер `manage.py send_broadcasts`).
+
+    Рассылку берёт один воркер (SKIP LOCKED + пульс heartbeat_at). Получатели —
+    активные подписки с привязанным Telegram — выгружаются потоком (.iterator())
+    в BroadcastRecipient; вставка идемпотентна, поэтому её можно повторить после сбоя.
+    Затем неотправленные получатели уходят пачками через TelegramFanout
+    (лимиты Bot API), статус каждого фиксируется после пачки. Прерванная рассылка
+    продолжается с неотправленных; повторно может уйти не больше одной пачки.
+    """
+
+    CHUNK_SIZE = 200
+
+    @staticmethod
+    def claim_next() -> Broadcast | None:
+        """Берёт рассылку в очереди или брошенную упавшим воркером."""
+        now = timezone.now()
+        stale = now - timedelta(seconds=settings.BROADCAST_LEASE_SECONDS)
+        with transaction.atomic():
+            broadcast = (
+                Broadcast.objects
+                .select_for_update(skip_locked=True)
+                .filter(
+                    Q(status=Broadcast.Status.PENDING)
+                    | Q(status=Broadcast.Status.RUNNING, heartbeat_at__lt=stale)
+                )
+                .order_by('created_at', 'id')
+                .first()
+            )
+            if broadcast is None:
+                return None
+            broadcast.status = Broadcast.Status.RUNNING
+            broadcast.started_at = broadcast.started_at or now
+            broadcast.heartbeat_at = now
+            broadcast.save(update_fields=['status', 'started_at', 'heartbeat_at'])
+        return broadcast
+
+    @classmethod
+    def collect_recipients(cls, broadcast: Broadcast) -> int:
+        """Выгружает получателей (повторный вызов не создаёт дублей). Возвращает их число."""
+        enrollments = (
+            Enrollment.objects
+            .filter(course_id=broadcast.course_id, status=Enrollment.Status.ACTIVE, student__telegram_id__isnull=False)
+            .values_list('student_id', 'student__telegram_id')
+            .iterator(chunk_size=cls.CHUNK_SIZE * 5)
+        )
+        chunk = []
+        for student_id, telegram_id in enrollments:
+            chunk.append(BroadcastRecipient(broadcast=broadcast, student_id=student_id, telegram_id=telegram_id))
+            if len(chunk) >= cls.CHUNK_SIZE * 5:
+                BroadcastRecipient.objects.bulk_create(chunk, ignore_conflicts=True)
+                chunk = []
+        if chunk:
+            BroadcastRecipient.objects.bulk_create(chunk, ignore_conflicts=True)
+
+        total = broadcast.recipients.count()
+        Broadcast.objects.filter(pk=broadcast.pk).update(total=total)
+        return total
+
+    @classmethod
+    def run(cls, broadcast: Broadcast, stop: threading.Event | None = None) -> bool:
+        """
+        Отправляет рассылку до конца. False — остановлено по stop: рассылка
+        возвращается в очередь и продолжится с неотправленных.
+        """
+        stop = stop or threading.Event()
+        total = cls.collect_recipients(broadcast)
+        logger.info(f"Рассылка #{broadcast.pk} ({broadcast.course_id}): получателей {total}")
+
+        fanout = TelegramFanout()
+        while not stop.is_set():
+            pending = list(
+                broadcast.recipients
+                .filter(status=BroadcastRecipient.Status.PENDING)
+                .order_by('id')
+                .values_list('id', 'telegram_id')[:cls.CHUNK_SIZE]
+            )
+            if not pending:
+                Broadcast.objects.filter(pk=broadcast.pk).update(
+                    status=Broadcast.Status.DONE, finished_at=timezone.now(), heartbeat_at=timezone.now(),
+                )
+                return True
+
+            report = fanout.run([
+                FanoutMessage(chat_id=telegram_id, text=broadcast.text, parse_mode=None, key=recipient_id)
+                for recipient_id, telegram_id in pending
+            ])
+
+            # Не ушедшие из-за разомкнутого breaker остаются в очереди; остальные ошибки
+            # (403 «бот заблокирован», 400 и т.п.) окончательные — не повторяем их каждый прогон
+            deferred = set(report.deferred_keys)
+            failed_keys = [key for key in report.failed_keys if key not in deferred]
+
+            now = timezone.now()
+            with transaction.atomic():
+                if report.sent_keys:
+                    BroadcastRecipient.objects.filter(pk__in=report.sent_keys).update(
+                        status=BroadcastRecipient.Status.SENT, sent_at=now,
+                    )
+                by_error = defaultdict(list)
+                for key in failed_keys:
+                    by_error[report.errors.get(key, '')].append(key)
+                for error, keys in by_error.items():
+                    BroadcastRecipient.objects.filter(pk__in=keys).update(
+                        status=BroadcastRecipient.Status.FAILED, last_error=error,
+                    )
+                Broadcast.objects.filter(pk=broadcast.pk).update(
+                    sent=F('sent') + len(report.sent_keys),
+                    failed=F('failed') + len(failed_keys),
+                    heartbeat_at=now,
+                )
+
+            if deferred or telegram_breaker.is_open():
+                # Пробный вызов мог уже закрыть breaker — не крутим цикл без паузы
+                pause = max(telegram_breaker.retry_in(), 1.0)
+                logger.warning(
+                    f"Рассылка #{broadcast.pk}: Bot API недоступен, в очереди {len(deferred)}, пауза {pause:.0f} с"
+                )
+                stop.wait(pause)
+
+        Broadcast.objects.filter(pk=broadcast.pk).update(status=Broadcast.Status.PENDING)
+        return False
@@ -0,0 +1,136 @@
+"""
+Недельная сводка прогресса для всех учеников — несколькими групповыми запросами.
+
+Student.get_streak / get_total_stats считают по одному ученику с перебором оценок
+в Python; для рассылки всем это тысячи запросов. Здесь каждая величина — один
+GROUP BY по всем получателям, streak — один проход по отсортированным
+(ученик, день) из SELECT DISTINCT.
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import NamedTuple
+
+from django.db.models import Avg, Count, Exists, FloatField, OuterRef, Q, Value
+from django.db.models.functions import Cast, Least, TruncDate
+from django.utils import timezone
+
+from core.models import Deadline, Enrollment, Grade, Student
+
+
+class DigestRecipient(NamedTuple):
+    student_id: int
+    name: str
+    telegram_id: int
+
+
+class WeeklyDigest:
+    """
+    Расчёт сводки. Каждый метод — один-два запроса на всех получателей
+    (получатели подставляются подзапросом, а не списком id):
+
+        digest = WeeklyDigest()
+        recipients = digest.recipients()
+        grades = digest.grade_stats()
+        streaks = digest.streaks()
+        deadlines = digest.upcoming_deadlines()
+    """
+
+    # Streak считаем по дням не дальше этого окна (длиннее серий на практике нет)
+    STREAK_LOOKBACK_DAYS = 366
+
+    def __init__(self, now: datetime | None = None, emails: list[str] | None = None):
+        self.now = now or timezone.now()
+        self.week_start = self.now - timedelta(days=7)
+        self.week_end = self.now + timedelta(days=7)
+        # Ученики с привязанным Telegram и хотя бы одной активной подпиской
+        self.students = Student.objects.filter(telegram_id__isnull=False).filter(
+            Exists(Enrollment.objects.filter(student=OuterRef('pk'), status=Enrollment.Status.ACTIVE))
+        )
+        if emails:
+            self.students = self.students.filter(email__in=emails)
+
+    def recipients(self) -> list[DigestRecipient]:
+        return [DigestRecipient(*row) for row in self.students.order_by('id').values_list('id', 'name', 'telegram_id')]
+
+    def grade_stats(self) -> dict[int, tuple[int, int, int]]:
+        """student_id → (принято за неделю, принято всего, средний процент) — как get_total_stats."""
+        percent = Least(
+            Cast('value', FloatField()) * 100 / Cast('task__max_score', FloatField()),
+            Value(100.0),
+        )
+        rows = (
+            Grade.objects
+            .filter(student_id__in=self.students.values('id'), status=Grade.Status.ACCEPTED)
+            .values('student_id')
+            .annotate(
+                week=Count('id', filter=Q(checked_at__gte=self.week_start)),
+                total=Count('id'),
+                average=Avg(percent, filter=Q(value__isnull=False, task__max_score__gt=0)),
+            )
+            .values_list('student_id', 'week', 'total', 'average')
+        )
+        return {
+            student_id: (week, total, round(average) if average is not None else 0)
+            for student_id, week, total, average in rows
+        }
+
+    def streaks(self) -> dict[int, int]:
+        """
+        student_id → streak: дни подряд с принятыми заданиями, считая от сегодня
+        (или от вчера, если сегодня ещё ничего). Дни — в UTC, как в Student.get_streak.
+        """
+        rows = (
+            Grade.objects
+            .filter(
+                student_id__in=self.students.values('id'),
+                status=Grade.Status.ACCEPTED,
+                checked_at__gte=self.now - timedelta(days=self.STREAK_LOOKBACK_DAYS),
+            )
+            .annotate(day=TruncDate('checked_at', tzinfo=dt_timezone.utc))
+            .values_list('student_id', 'day')
+            .distinct()
+            .order_by('student_id', '-day')
+        )
+        today = self.now.astimezone(dt_timezone.utc).date()
+        streaks: dict[int, int] = {}
+        current_id, expected, streak = None, None, 0
+        for student_id, day in rows:
+            if isinstance(day, str):  # SQLite отдаёт дату строкой
+                day = date.fromisoformat(day)
+            if student_id != current_id:
+                if current_id is not None:
+                    streaks[current_id] = streak
+                current_id, streak = student_id, 0
+                # Если сегодня нет оценки, серия может идти со вчера
+                expected = today if day >= today else today - timedelta(days=1)
+            if day == expected:
+                streak += 1
+                expected -= timedelta(days=1)
+        if current_id is not None:
+            streaks[current_id] = streak
+        return streaks
+
+    def upcoming_deadlines(self) -> dict[int, list[tuple]]:
+        """student_id → несданные дедлайны ближайшей недели по активным курсам ученика."""
+        deadlines_by_course: dict[int, list[tuple]] = {}
+        rows = (
+            Deadline.objects
+            .filter(due_date__gte=self.now, due_date__lt=self.week_end, submitted=False)
+            .order_by('due_date')
+            .values_list('course_id', 'course__name', 'title', 'due_date')
+        )
+        for course_id, course_name, title, due_date in rows:
+            deadlines_by_course.setdefault(course_id, []).append((course_name, title, due_date))
+        if not deadlines_by_course:
+            return {}
+
+        result: dict[int, list[tuple]] = {}
+        enrollments = Enrollment.objects.filter(
+            student_id__in=self.students.values('id'),
+            course_id__in=list(deadlines_by_course),
+            status=Enrollment.Status.ACTIVE,
+        ).values_list('student_id', 'course_id')
+        for student_id, course_id in enrollments:
+            result.setdefault(student_id, []).extend(deadlines_by_course[course_id])
+        for items in result.values():
+            items.sort(key=lambda item: item[2])
+        return result
@@ -0,0 +1,156 @@
+"""
+Массовая отправка сообщений в Telegram с соблюдением лимитов Bot API.
+
+Telegram разрешает боту ~30 сообщений/с суммарно и ~1 сообщение/с в один чат;
+при превышении отвечает 429 с parameters.retry_after. TelegramFanout отправляет
+пачку сообщений конкурентно (asyncio поверх общего AsyncClient), а скорость
+ограничивает token bucket (глобально) и расписание по chat_id (для каждого чата).
+На 429 весь поток ставится на паузу retry_after и сообщение отправляется снова.
+Если разомкнут circuit breaker Bot API, оставшиеся сообщения сразу считаются неотправленными
+(deferred_keys — их стоит повторить позже, в отличие от отказов Telegram вроде 403).
+"""
+import asyncio
+import time
+from typing import Any, NamedTuple
+
+from django.conf import settings
+
+from .telegram import TelegramNotificationService, close_async_http_client
+
+
+class FanoutMessage(NamedTuple):
+    chat_id: int
+    text: str
+    parse_mode: str | None = 'HTML'
+    reply_markup: dict | None = None
+    key: Any = None  # произвольный идентификатор вызывающего кода (попадёт в sent_keys/failed_keys)
+
+
+class FanoutReport:
+    """Итоги рассылки."""
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.elapsed = 0.0
+        self.sent_keys = []
+        self.failed_keys = []
+        # Подмножество failed_keys: не отправлены из-за разомкнутого breaker (вызова не было)
+        self.deferred_keys = []
+        # key → текст последней ошибки
+        self.errors = {}
+
+    @property
+    def throughput(self) -> float:
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f'отправлено {self.sent}, ошибок {self.failed}, 429 {self.rate_limited}, '
+            f'{self.elapsed:.1f} с ({self.throughput:.1f} сообщ/с)'
+        )
+
+
+class TokenBucket:
+    """Token bucket для asyncio: rate токенов в секунду, не больше capacity про запас."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float):
+        """Останавливает выдачу токенов (Telegram ответил 429) и обнуляет запас."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if self._paused_until > now:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class TelegramFanout:
+    """
+    Конкурентная отправка пачки сообщений с лимитами Telegram.
+
+    Использование:
+        report = TelegramFanout().run([FanoutMessage(chat_id, text), ...])
+    """
+
+    def __init__(self, rate: float | None = None, per_chat_interval: float | None = None,
+                 concurrency: int | None = None, max_retries: int = 3):
+        self.rate = rate or settings.TELEGRAM_RATE_LIMIT
+        self.per_chat_interval = (
+            settings.TELEGRAM_PER_CHAT_INTERVAL if per_chat_interval is None else per_chat_interval
+        )
+        self.concurrency = concurrency or settings.TELEGRAM_FANOUT_CONCURRENCY
+        self.max_retries = max_retries
+        self.service = TelegramNotificationService()
+
+    def run(self, messages: list[FanoutMessage]) -> FanoutReport:
+        """Синхронная обёртка для management-команд."""
+        return asyncio.run(self._run(messages))
+
+    async def _run(self, messages: list[FanoutMessage]) -> FanoutReport:
+        try:
+            return await self.send_all(messages)
+        finally:
+            await close_async_http_client()
+
+    async def send_all(self, messages: list[FanoutMessage]) -> FanoutReport:
+        report = FanoutReport()
+        self._bucket = TokenBucket(self.rate)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._chat_next_at: dict[int, float] = {}
+
+        started = time.monotonic()
+        await asyncio.gather(*(self._send_one(message, report) for message in messages))
+        report.elapsed = time.monotonic() - started
+        return report
+
+    async def _wait_for_chat(self, chat_id: int):
+        """Не чаще одного сообщения в per_chat_interval в один чат: резервируем слот и ждём его."""
+        now = time.monotonic()
+        slot = max(now, self._chat_next_at.get(chat_id, 0.0))
+        self._chat_next_at[chat_id] = slot + self.per_chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _send_one(self, message: FanoutMessage, report: FanoutReport):
+        await self._wait_for_chat(message.chat_id)
+        async with self._semaphore:
+            for _ in range(self.max_retries + 1):
+                await self._bucket.acquire()
+                result = await self.service.deliver(
+                    message.chat_id, message.text, message.parse_mode, message.reply_markup,
+                )
+                if result.ok:
+                    report.sent += 1
+                    report.sent_keys.append(message.key)
+                    return
+                if result.circuit_open or result.retry_after is None:
+                    # Bot API недоступен — не ждём, вызывающий код повторит позже
+                    break
+                report.rate_limited += 1
+                self._bucket.pause(result.retry_after)
+
+        report.failed += 1
+        report.failed_keys.append(message.key)
+        report.errors[message.key] = result.error
+        if result.circuit_open:
+            report.deferred_keys.append(message.key)
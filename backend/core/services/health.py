@@ -0,0 +1,109 @@
+"""
+Состояние circuit breaker Bot API для `/health/`.
+
+Breaker — объект в памяти процесса, а в Telegram ходят воркеры, поэтому веб-процесс
+собственный breaker показывать не может: воркеры публикуют снимок в WorkerStatus,
+`/health/` сводит свежие записи.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from core.models import WorkerStatus
+from .telegram import CircuitBreaker, telegram_breaker
+
+logger = logging.getLogger(__name__)
+
+# Чем хуже состояние, тем выше: сводное состояние — худшее среди воркеров
+STATE_SEVERITY = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+
+class BreakerPublisher:
+    """
+    Фоновый поток воркера: раз в interval секунд (и сразу при смене состояния)
+    сохраняет снимок telegram_breaker в WorkerStatus.
+
+    Поток отдельный, чтобы состояние обновлялось и во время долгой пачки/рассылки.
+    """
+
+    def __init__(self, worker: str, interval: float | None = None):
+        self.name = f"{worker}@{socket.gethostname()}:{os.getpid()}"
+        self.interval = interval or settings.WORKER_STATUS_PUBLISH_SECONDS
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='breaker-publisher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает поток и удаляет запись: остановленный воркер не влияет на /health/."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        try:
+            WorkerStatus.objects.filter(name=self.name).delete()
+        except Exception as e:
+            logger.warning(f"Не удалось удалить состояние воркера {self.name}: {e}")
+
+    def publish(self) -> dict:
+        snapshot = telegram_breaker.snapshot()
+        WorkerStatus.objects.bulk_create(
+            [WorkerStatus(name=self.name, telegram=snapshot, updated_at=timezone.now())],
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=['telegram', 'updated_at'],
+        )
+        return snapshot
+
+    def _run(self):
+        published_state = None
+        next_publish = 0.0
+        try:
+            while not self._stop.is_set():
+                state = telegram_breaker.snapshot()['state']
+                now = time.monotonic()
+                if state != published_state or now >= next_publish:
+                    try:
+                        published_state = self.publish()['state']
+                        next_publish = now + self.interval
+                    except Exception as e:
+                        logger.warning(f"Не удалось сохранить состояние воркера {self.name}: {e}")
+                        connection.close()
+                        next_publish = now + self.interval
+                # Смену состояния ловим быстрее, чем полный интервал публикации
+                self._stop.wait(min(1.0, self.interval))
+        finally:
+            connection.close()
+
+
+def live_workers():
+    """
+    Записи WorkerStatus живых воркеров: не старше трёх интервалов публикации
+    (упавший воркер пропадает сам).
+    """
+    fresh_after = timezone.now() - timedelta(seconds=settings.WORKER_STATUS_PUBLISH_SECONDS * 3)
+    return WorkerStatus.objects.filter(updated_at__gte=fresh_after).order_by('name')
+
+
+def telegram_health() -> dict:
+    """
+    Сводное состояние breaker Bot API по живым воркерам для `/health/`;
+    если их нет — state 'unknown'.
+    """
+    workers = dict(live_workers().values_list('name', 'telegram'))
+    if not workers:
+        return {'state': 'unknown', 'workers': {}}
+    state = max(
+        (w.get('state') for w in workers.values()),
+        key=lambda s: STATE_SEVERITY.get(s, 0),
+    )
+    return {'state': state, 'workers': workers}
@@ -0,0 +1,193 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import SYNTHETIC_TELEGRAM_IDS, OutgoingNotification
+from .telegram import SendResult, TelegramNotificationService, telegram_breaker
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationOutbox:
+    """
+    Transactional outbox для Telegram-уведомлений.
+
+    enqueue() вызывается внутри транзакции, которая меняет данные, — уведомление
+    существует только если транзакция закоммичена. dispatch_due() вызывается
+    воркером `manage.py dispatch_notifications` и никогда — из HTTP-запроса.
+
+    Уведомления об оценках (enqueue_grade) копятся GRADE_NOTIFICATION_WINDOW_SECONDS:
+    когда подходит срок первого из них, все ожидающие оценки ученика уходят одной
+    сводкой. Буфер — сами строки outbox, поэтому перезапуск воркера ничего не теряет.
+    """
+
+    @staticmethod
+    def enqueue(telegram_id: int, text: str) -> OutgoingNotification:
+        """Ставит сообщение в очередь (в текущей транзакции)."""
+        return OutgoingNotification.objects.create(telegram_id=telegram_id, text=text)
+
+    @staticmethod
+    def enqueue_grade(telegram_id: int, course_name: str, task_name: str,
+                      score: int | None, max_score: int) -> OutgoingNotification:
+        """Ставит в очередь уведомление об оценке; отправка — не раньше, чем через окно склейки."""
+        return OutgoingNotification.objects.create(
+            telegram_id=telegram_id,
+            kind=OutgoingNotification.Kind.GRADE,
+            text=TelegramNotificationService.format_grade(course_name, task_name, score, max_score),
+            payload={
+                'course_name': course_name,
+                'task_name': task_name,
+                'score': score,
+                'max_score': max_score,
+            },
+            next_attempt_at=timezone.now() + timedelta(seconds=settings.GRADE_NOTIFICATION_WINDOW_SECONDS),
+        )
+
+    @staticmethod
+    def _claim_due(batch_size: int, telegram_ids: tuple[int, int] | None = None) -> list[list[OutgoingNotification]]:
+        """
+        Забирает пачку готовых к отправке уведомлений, сгруппированных по сообщениям.
+
+        Строки блокируются (SKIP LOCKED) только на время короткой транзакции,
+        в которой они помечаются SENDING, а next_attempt_at сдвигается на время аренды.
+        Отправка идёт уже без открытой транзакции; если воркер упадёт, аренда истечёт
+        и уведомление заберёт следующий проход.
+
+        К созревшей оценке добавляются все ещё ожидающие оценки того же ученика
+        (в том числе с неистёкшим окном) — они уходят одной сводкой.
+
+        telegram_ids — полуинтервал [от, до) chat_id: забирать только уведомления этих
+        получателей (бенчмарк не трогает очередь настоящих учеников). По умолчанию
+        пропускаются синтетические chat_id бенчмарков (SYNTHETIC_TELEGRAM_IDS).
+        """
+        now = timezone.now()
+        lease_until = now + timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS)
+        Status, Kind = OutgoingNotification.Status, OutgoingNotification.Kind
+
+        due = OutgoingNotification.objects.filter(
+            status__in=[Status.PENDING, Status.SENDING], next_attempt_at__lte=now,
+        )
+        if telegram_ids is not None:
+            due = due.filter(telegram_id__gte=telegram_ids[0], telegram_id__lt=telegram_ids[1])
+        else:
+            due = due.filter(telegram_id__lt=SYNTHETIC_TELEGRAM_IDS[0])
+
+        with transaction.atomic():
+            batch = list(
+                due
+                .select_for_update(skip_locked=True)
+                .order_by('next_attempt_at', 'id')[:batch_size]
+            )
+            grade_chats = {n.telegram_id for n in batch if n.kind == Kind.GRADE}
+            if grade_chats:
+                # Только PENDING: строки SENDING с неистёкшей арендой сейчас отправляет другой воркер
+                batch += list(
+                    OutgoingNotification.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(status=Status.PENDING, kind=Kind.GRADE, telegram_id__in=grade_chats)
+                    .exclude(pk__in=[n.pk for n in batch])
+                )
+            if batch:
+                OutgoingNotification.objects.filter(pk__in=[n.pk for n in batch]).update(
+                    status=Status.SENDING,
+                    next_attempt_at=lease_until,
+                )
+
+        groups: list[list[OutgoingNotification]] = []
+        grade_groups: dict[int, list[OutgoingNotification]] = {}
+        for notification in batch:
+            if notification.kind != Kind.GRADE:
+                groups.append([notification])
+            elif notification.telegram_id in grade_groups:
+                grade_groups[notification.telegram_id].append(notification)
+            else:
+                grade_groups[notification.telegram_id] = [notification]
+                groups.append(grade_groups[notification.telegram_id])
+        return groups
+
+    @staticmethod
+    def _backoff(attempts: int) -> timedelta:
+        """Экспоненциальная пауза: base * 2^(attempts-1), но не больше max."""
+        delay = settings.NOTIFICATION_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0))
+        return timedelta(seconds=min(delay, settings.NOTIFICATION_RETRY_MAX_SECONDS))
+
+    @staticmethod
+    def _group_text(group: list[OutgoingNotification]) -> str:
+        if len(group) == 1:
+            return group[0].text
+        group.sort(key=lambda n: n.pk)
+        return TelegramNotificationService.format_grade_digest([n.payload for n in group])
+
+    @classmethod
+    def _apply_result(cls, notification: OutgoingNotification, result: SendResult):
+        if result.circuit_open:
+            # Вызова не было — попытку не засчитываем, ждём пробного вызова breaker
+            notification.status = OutgoingNotification.Status.PENDING
+            notification.next_attempt_at = timezone.now() + timedelta(seconds=result.retry_after)
+            return
+
+        notification.attempts += 1
+
+        if result.ok:
+            notification.status = OutgoingNotification.Status.SENT
+            notification.sent_at = timezone.now()
+            notification.last_error = ''
+            return
+
+        notification.last_error = result.error or 'sendMessage не выполнен (подробности в логе)'
+        if notification.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+            notification.status = OutgoingNotification.Status.FAILED
+            logger.warning(f"Уведомление {notification.pk} не доставлено после {notification.attempts} попыток")
+            return
+
+        delay = cls._backoff(notification.attempts)
+        if result.retry_after is not None:
+            delay = max(delay, timedelta(seconds=result.retry_after))
+        notification.status = OutgoingNotification.Status.PENDING
+        notification.next_attempt_at = timezone.now() + delay
+
+    @classmethod
+    def dispatch_due(cls, batch_size: int = 50, telegram_ids: tuple[int, int] | None = None) -> tuple[int, int]:
+        """
+        Отправляет готовые уведомления. Возвращает (отправлено, не отправлено) в уведомлениях.
+        telegram_ids — только получатели из полуинтервала chat_id (см. _claim_due).
+        Пока разомкнут circuit breaker Bot API, очередь не трогается: уведомления ждут
+        пробного вызова, попытки не расходуются.
+        """
+        if telegram_breaker.is_open():
+            return 0, 0
+
+        groups = cls._claim_due(batch_size, telegram_ids)
+        if not groups:
+            return 0, 0
+
+        service = TelegramNotificationService()
+        sent = failed = 0
+
+        for index, group in enumerate(groups):
+            result = service.deliver_sync(group[0].telegram_id, cls._group_text(group))
+            if result.circuit_open:
+                # Bot API недоступен — остаток пачки возвращаем в очередь, попытки не тратим
+                deferred = [n for rest in groups[index:] for n in rest]
+                for notification in deferred:
+                    cls._apply_result(notification, result)
+                OutgoingNotification.objects.bulk_update(deferred, ['status', 'next_attempt_at'])
+                logger.warning(f"Отправка отложена на {result.retry_after:.0f} с: {result.error} (уведомлений {len(deferred)})")
+                break
+
+            if len(group) > 1:
+                logger.info(f"Сводка оценок tg={group[0].telegram_id}: {len(group)} в одном сообщении")
+            for notification in group:
+                cls._apply_result(notification, result)
+            OutgoingNotification.objects.bulk_update(
+                group, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'],
+            )
+            if result.ok:
+                sent += len(group)
+            else:
+                failed += len(group)
+
+        return sent, failed
@@ -0,0 +1,226 @@
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import SYNTHETIC_TELEGRAM_IDS, Enrollment, ReminderLog
+from .fanout import FanoutMessage, FanoutReport, TelegramFanout
+from .telegram import TelegramNotificationService
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderLedger:
+    """
+    Напоминания через журнал ReminderLog (база для занятий и дедлайнов).
+
+    Напоминание положено, если объект наступает в ближайшие `before`
+    (или наступил не больше `grace` назад — догоняем после простоя),
+    ученик активно подписан на курс и привязал Telegram.
+
+    Схема claim-then-send: одним INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING
+    занимаем в журнале строки ещё не отправленных напоминаний — параллельный прогон
+    получит пустой результат. Затем отправляем; строки неудавшихся отправок удаляем,
+    и следующий прогон попробует снова. Поэтому запускать можно с любой частотой.
+
+    Синтетические ученики бенчмарков (SYNTHETIC_TELEGRAM_IDS) в обычные прогоны не попадают.
+    """
+
+    kind: str
+    table: str          # таблица объектов напоминаний
+    target: str         # FK в ReminderLog: event / deadline
+    time_field: str     # поле времени объекта
+    extra_where = ''    # дополнительные условия на объект x
+    extra_params: dict = {}
+
+    # NOT EXISTS отсекает уже отправленные до вставки (ON CONFLICT остаётся страховкой от гонки
+    # двух прогонов) — в PostgreSQL конфликтующая вставка всё равно расходует значение sequence
+    CLAIM_SQL = """
+        INSERT INTO core_reminderlog ({target}_id, student_id, kind, sent_at)
+        SELECT x.id, en.student_id, %(kind)s, %(now)s
+        FROM {table} x
+        JOIN core_enrollment en ON en.course_id = x.course_id AND en.status = %(active)s
+        JOIN core_student s ON s.id = en.student_id
+            AND s.telegram_id >= %(telegram_min)s AND s.telegram_id < %(telegram_max)s
+        WHERE x.{time_field} >= %(window_start)s
+          AND x.{time_field} <= %(window_end)s
+          {extra_where}
+          AND NOT EXISTS (
+              SELECT 1 FROM core_reminderlog r
+              WHERE r.{target}_id = x.id AND r.student_id = en.student_id AND r.kind = %(kind)s
+          )
+        ON CONFLICT ({target}_id, student_id, kind) WHERE {target}_id IS NOT NULL DO NOTHING
+        RETURNING id
+    """
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return True
+
+    @classmethod
+    def before(cls) -> timedelta:
+        raise NotImplementedError
+
+    @classmethod
+    def grace(cls) -> timedelta:
+        raise NotImplementedError
+
+    @classmethod
+    def fire_at(cls, moment: datetime) -> datetime:
+        """Когда отправлять напоминание об объекте со временем moment."""
+        return moment - cls.before()
+
+    @classmethod
+    def claim_due(cls, now: datetime | None = None, ids: list[int] | None = None,
+                  telegram_ids: tuple[int, int] | None = None) -> list[int]:
+        """
+        Занимает в журнале неотправленные напоминания (только по объектам ids, если заданы).
+        Время объекта проверяется по текущим данным БД — перенесённое или удалённое
+        занятие просто не попадёт в выборку. Возвращает id строк ReminderLog.
+
+        telegram_ids — полуинтервал chat_id учеников (бенчмарк передаёт SYNTHETIC_TELEGRAM_IDS);
+        по умолчанию — все настоящие.
+        """
+        now = now or timezone.now()
+        telegram_min, telegram_max = telegram_ids or (0, SYNTHETIC_TELEGRAM_IDS[0])
+        params = {
+            'telegram_min': telegram_min,
+            'telegram_max': telegram_max,
+            'kind': cls.kind,
+            'now': now,
+            'active': Enrollment.Status.ACTIVE,
+            'window_start': now - cls.grace(),
+            'window_end': now + cls.before(),
+            **cls.extra_params,
+        }
+        extra_where = cls.extra_where
+        if ids is not None:
+            if not ids:
+                return []
+            placeholders = []
+            for i, object_id in enumerate(ids):
+                params[f'id{i}'] = object_id
+                placeholders.append(f'%(id{i})s')
+            extra_where += f" AND x.id IN ({', '.join(placeholders)})"
+
+        sql = cls.CLAIM_SQL.format(
+            target=cls.target, table=cls.table, time_field=cls.time_field, extra_where=extra_where,
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    @classmethod
+    def build_messages(cls, claim_ids: list[int]) -> list[FanoutMessage]:
+        raise NotImplementedError
+
+    @staticmethod
+    def release(claim_ids: list[int]):
+        """Снимает claim с неотправленных — следующий прогон попробует ещё раз."""
+        if claim_ids:
+            ReminderLog.objects.filter(pk__in=claim_ids).delete()
+
+    @classmethod
+    def send_due(cls, now: datetime | None = None, ids: list[int] | None = None,
+                 telegram_ids: tuple[int, int] | None = None) -> FanoutReport:
+        claim_ids = cls.claim_due(now, ids, telegram_ids)
+        if not claim_ids:
+            return FanoutReport()
+
+        report = TelegramFanout().run(cls.build_messages(claim_ids))
+        if report.failed_keys:
+            logger.warning(
+                f"Напоминания ({cls.kind}) не отправлены ({len(report.failed_keys)}), повторим в следующий прогон"
+            )
+            cls.release(report.failed_keys)
+        return report
+
+
+class LessonReminders(ReminderLedger):
+    """Напоминания о занятиях: за LESSON_REMINDER_BEFORE_MINUTES до начала."""
+
+    kind = ReminderLog.Kind.LESSON
+    table = 'core_scheduleevent'
+    target = 'event'
+    time_field = 'scheduled_at'
+
+    @classmethod
+    def before(cls) -> timedelta:
+        return timedelta(minutes=settings.LESSON_REMINDER_BEFORE_MINUTES)
+
+    @classmethod
+    def grace(cls) -> timedelta:
+        return timedelta(minutes=settings.LESSON_REMINDER_GRACE_MINUTES)
+
+    @classmethod
+    def build_messages(cls, claim_ids: list[int]) -> list[FanoutMessage]:
+        rows = (
+            ReminderLog.objects
+            .filter(pk__in=claim_ids)
+            .values_list(
+                'pk', 'student__telegram_id', 'event__title',
+                'event__course__name', 'event__course__zoom_url', 'event__course__zoom_passcode',
+            )
+        )
+        return [
+            FanoutMessage(
+                chat_id=telegram_id,
+                text=TelegramNotificationService.format_lesson_reminder(
+                    course_name, lesson_title, zoom_url, zoom_passcode,
+                ),
+                key=pk,
+            )
+            for pk, telegram_id, lesson_title, course_name, zoom_url, zoom_passcode in rows
+        ]
+
+
+class DeadlineReminders(ReminderLedger):
+    """
+    Напоминания о дедлайнах: за DEADLINE_REMINDER_BEFORE_HOURS до срока (если не отмечен «Сдано»).
+    По умолчанию выключены (DEADLINE_REMINDER_BEFORE_HOURS=0).
+    """
+
+    kind = ReminderLog.Kind.DEADLINE
+    table = 'core_deadline'
+    target = 'deadline'
+    time_field = 'due_date'
+    extra_where = 'AND x.submitted = %(submitted)s'
+    extra_params = {'submitted': False}
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return settings.DEADLINE_REMINDER_BEFORE_HOURS > 0
+
+    @classmethod
+    def before(cls) -> timedelta:
+        return timedelta(hours=settings.DEADLINE_REMINDER_BEFORE_HOURS)
+
+    @classmethod
+    def grace(cls) -> timedelta:
+        # Дедлайн прошёл — напоминать уже поздно
+        return timedelta(0)
+
+    @classmethod
+    def claim_due(cls, now: datetime | None = None, ids: list[int] | None = None,
+                  telegram_ids: tuple[int, int] | None = None) -> list[int]:
+        if not cls.enabled():
+            return []
+        return super().claim_due(now, ids, telegram_ids)
+
+    @classmethod
+    def build_messages(cls, claim_ids: list[int]) -> list[FanoutMessage]:
+        rows = (
+            ReminderLog.objects
+            .filter(pk__in=claim_ids)
+            .values_list('pk', 'student__telegram_id', 'deadline__title', 'deadline__course__name', 'deadline__due_date')
+        )
+        return [
+            FanoutMessage(
+                chat_id=telegram_id,
+                text=TelegramNotificationService.format_deadline_reminder(course_name, title, due_date),
+                key=pk,
+            )
+            for pk, telegram_id, title, course_name, due_date in rows
+        ]
@@ -0,0 +1,247 @@
+import logging
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import (
+    Course, CourseSnapshot, Deadline, Enrollment, Grade, ScheduleEvent, Student, StudentSnapshot,
+)
+
+logger = logging.getLogger(__name__)
+
+MONTH_NAMES = {
+    1: 'января', 2: 'февраля', 3: 'марта', 4: 'апреля',
+    5: 'мая', 6: 'июня', 7: 'июля', 8: 'августа',
+    9: 'сентября', 10: 'октября', 11: 'ноября', 12: 'декабря',
+}
+
+# Задания в ZenClass называются "ДЗ до 2 марта 23:59" — дата зашита в название
+_DATE_IN_NAME = re.compile(r'(?<![0-9])([0-9]{1,2}) (' + '|'.join(MONTH_NAMES.values()) + ')')
+
+
+def deadline_key(course_id: int, due_date: datetime) -> str:
+    """Ключ дедлайна для сверки с датами из названий принятых заданий (как в api_deadlines)."""
+    due_date = due_date.astimezone(dt_timezone.utc)
+    return f"{course_id}:{due_date.day} {MONTH_NAMES[due_date.month]}"
+
+
+def _percent(value: int | None, max_score: int | None) -> float | None:
+    """Процент оценки — как Student.get_total_stats; None — оценка без балла в среднем не участвует."""
+    if value is None or not max_score or max_score <= 0:
+        return None
+    return min(value / max_score * 100, 100)
+
+
+def _checked_at_key(entry: list) -> datetime:
+    return datetime.fromisoformat(entry[4]) if entry[4] else datetime.min.replace(tzinfo=dt_timezone.utc)
+
+
+class SnapshotService:
+    """
+    Срезы StudentSnapshot / CourseSnapshot для ответов бота.
+
+    Вебхук с оценкой обновляет срез ученика инкрементально (apply_accepted), подписка
+    и правка оценок/подписок в админке пересчитывают его целиком, курс — при изменении
+    расписания и дедлайнов (core.signals). Массовые правки в обход save()
+    (rederive_history, смена max_score задания) пересчитывают затронутых учеников.
+    Если среза ещё нет (или списки курса исчерпаны), он строится при чтении.
+    """
+
+    RECENT_GRADES = 10
+    UPCOMING_LIMIT = 20
+
+    @classmethod
+    def refresh_student(cls, student_id: int) -> StudentSnapshot:
+        """Полный пересчёт по всем принятым оценкам ученика."""
+        course_ids = list(
+            Enrollment.objects
+            .filter(student_id=student_id, status=Enrollment.Status.ACTIVE)
+            .order_by('course_id')
+            .values_list('course_id', flat=True)
+        )
+        rows = (
+            Grade.objects
+            .filter(student_id=student_id, status=Grade.Status.ACCEPTED)
+            .order_by(F('checked_at').desc(nulls_last=True), '-id')
+            .values_list(
+                'task__course_id', 'task__course__name', 'task_id', 'task__name', 'value', 'task__max_score',
+                'checked_at',
+            )
+        )
+
+        recent, done_keys = [], set()
+        total = percent_sum = percent_count = 0
+        for course_id, course_name, task_id, task_name, value, max_score, checked_at in rows:
+            total += 1
+            percent = _percent(value, max_score)
+            if percent is not None:
+                percent_sum += percent
+                percent_count += 1
+            if len(recent) < cls.RECENT_GRADES:
+                recent.append([
+                    course_name, task_name, value, max_score, checked_at.isoformat() if checked_at else None, task_id,
+                ])
+            done_keys.update(cls._done_keys(course_id, task_name))
+
+        snapshot = StudentSnapshot(
+            student_id=student_id,
+            course_ids=course_ids,
+            accepted_total=total,
+            average_percent=round(percent_sum / percent_count) if percent_count else 0,
+            percent_sum=percent_sum,
+            percent_count=percent_count,
+            recent_grades=recent,
+            done_deadline_keys=sorted(done_keys),
+        )
+        # INSERT ... ON CONFLICT DO UPDATE — один запрос, в том числе внутри транзакции вебхука
+        StudentSnapshot.objects.bulk_create(
+            [snapshot],
+            update_conflicts=True,
+            unique_fields=['student'],
+            update_fields=[
+                'course_ids', 'accepted_total', 'average_percent', 'percent_sum', 'percent_count',
+                'recent_grades', 'done_deadline_keys', 'refreshed_at',
+            ],
+        )
+        return snapshot
+
+    @classmethod
+    def refresh_students(cls, student_ids) -> int:
+        """Полный пересчёт нескольких учеников (после массовых правок в обход save())."""
+        existing = Student.objects.filter(pk__in=set(student_ids)).values_list('pk', flat=True)
+        count = 0
+        for student_id in existing.iterator():
+            cls.refresh_student(student_id)
+            count += 1
+        return count
+
+    @classmethod
+    def refresh_task_students(cls, task_ids, exclude_student_id: int | None = None) -> int:
+        """Пересчёт учеников с принятыми оценками по заданиям (например, сменился max_score)."""
+        student_ids = (
+            Grade.objects
+            .filter(task_id__in=list(task_ids), status=Grade.Status.ACCEPTED)
+            .exclude(student_id=exclude_student_id)
+            .values_list('student_id', flat=True)
+            .distinct()
+        )
+        return cls.refresh_students(student_ids)
+
+    @classmethod
+    def apply_accepted(cls, student_id: int, course_id: int, course_name: str, task_id: int, task_name: str,
+                       value: int | None, max_score: int | None, checked_at: datetime,
+                       previous: tuple[int | None, str] | None, previous_max_score: int | None) -> StudentSnapshot:
+        """
+        Инкрементальное обновление среза после принятой оценки — без выборки всех оценок ученика.
+
+        previous — (балл, статус) этой оценки до записи или None, если её не было;
+        previous_max_score — максимум задания до записи: по нему вычитается прежний процент.
+        Среза ещё нет — строится полным пересчётом.
+        """
+        snapshot = StudentSnapshot.objects.select_for_update().filter(student_id=student_id).first()
+        if snapshot is None:
+            return cls.refresh_student(student_id)
+
+        previous_value, previous_status = previous or (None, None)
+        if previous_status == Grade.Status.ACCEPTED:
+            percent = _percent(previous_value, previous_max_score)
+            if percent is not None:
+                snapshot.percent_sum -= percent
+                snapshot.percent_count -= 1
+        else:
+            snapshot.accepted_total += 1
+
+        percent = _percent(value, max_score)
+        if percent is not None:
+            snapshot.percent_sum += percent
+            snapshot.percent_count += 1
+        if snapshot.percent_count <= 0:
+            snapshot.percent_sum, snapshot.percent_count = 0, 0
+        snapshot.average_percent = round(snapshot.percent_sum / snapshot.percent_count) if snapshot.percent_count else 0
+
+        recent = [entry for entry in snapshot.recent_grades if entry[5] != task_id]
+        recent.append([course_name, task_name, value, max_score, checked_at.isoformat(), task_id])
+        recent.sort(key=_checked_at_key, reverse=True)
+        snapshot.recent_grades = recent[:cls.RECENT_GRADES]
+
+        snapshot.done_deadline_keys = sorted(
+            set(snapshot.done_deadline_keys) | cls._done_keys(course_id, task_name)
+        )
+        snapshot.save(update_fields=[
+            'accepted_total', 'average_percent', 'percent_sum', 'percent_count',
+            'recent_grades', 'done_deadline_keys', 'refreshed_at',
+        ])
+        return snapshot
+
+    @staticmethod
+    def _done_keys(course_id: int, task_name: str) -> set[str]:
+        return {f"{course_id}:{int(day)} {month}" for day, month in _DATE_IN_NAME.findall(task_name or '')}
+
+    @classmethod
+    def refresh_course(cls, course_id: int) -> CourseSnapshot | None:
+        name = Course.objects.filter(pk=course_id).values_list('name', flat=True).first()
+        if name is None:
+            return None
+
+        now = timezone.now()
+        events = list(
+            ScheduleEvent.objects
+            .filter(course_id=course_id, scheduled_at__gte=now)
+            .order_by('scheduled_at')
+            .values_list('scheduled_at', 'title')[:cls.UPCOMING_LIMIT]
+        )
+        deadlines = list(
+            Deadline.objects
+            .filter(course_id=course_id, due_date__gte=now)
+            .order_by('due_date')
+            .values_list('due_date', 'title', 'submitted')[:cls.UPCOMING_LIMIT]
+        )
+        # Обрезанный список годен до своего последнего элемента
+        valid_until = min(
+            (items[-1][0] for items in (events, deadlines) if len(items) == cls.UPCOMING_LIMIT),
+            default=None,
+        )
+
+        snapshot = CourseSnapshot(
+            course_id=course_id,
+            name=name,
+            schedule=[[moment.isoformat(), title] for moment, title in events],
+            deadlines=[[moment.isoformat(), title, submitted] for moment, title, submitted in deadlines],
+            valid_until=valid_until,
+        )
+        CourseSnapshot.objects.bulk_create(
+            [snapshot],
+            update_conflicts=True,
+            unique_fields=['course'],
+            update_fields=['name', 'schedule', 'deadlines', 'valid_until', 'refreshed_at'],
+        )
+        return snapshot
+
+    @classmethod
+    def for_telegram_id(cls, telegram_id: int) -> StudentSnapshot | None:
+        """Срез ученика по Telegram; None — Telegram не привязан ни к одному ученику."""
+        snapshot = StudentSnapshot.objects.filter(student__telegram_id=telegram_id).first()
+        if snapshot is not None:
+            return snapshot
+        student_id = Student.objects.filter(telegram_id=telegram_id).values_list('pk', flat=True).first()
+        if student_id is None:
+            return None
+        return cls.refresh_student(student_id)
+
+    @classmethod
+    def courses_for(cls, snapshot: StudentSnapshot) -> list[CourseSnapshot]:
+        """Срезы курсов ученика; отсутствующие и исчерпанные пересчитываются."""
+        now = timezone.now()
+        courses = {
+            course.pk: course
+            for course in CourseSnapshot.objects.filter(course_id__in=snapshot.course_ids)
+        }
+        for course_id in snapshot.course_ids:
+            course = courses.get(course_id)
+            if course is None or (course.valid_until and course.valid_until < now):
+                course = cls.refresh_course(course_id)
+                if course is not None:
+                    courses[course_id] = course
+        return [courses[course_id] for course_id in snapshot.course_ids if course_id in courses]
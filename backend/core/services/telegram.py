@@ -2,27 +2,160 @@ import hmac
 import hashlib
 import json
 import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import NamedTuple
 from urllib.parse import parse_qsl, unquote
 from django.conf import settings
+from django.utils import timezone
 import httpx
 
+try:
+    import h2  # noqa: F401 — httpx включает HTTP/2, только если установлен h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
+# ===========================================
+# Общий HTTP-клиент Bot API
+# ===========================================
+# Один пул keep-alive соединений на процесс вместо TCP+TLS-рукопожатия на каждое сообщение.
+# Синхронный клиент потокобезопасен; после fork (gunicorn) создаётся заново.
+# AsyncClient привязан к event loop, поэтому свой на каждый loop.
+
+_client_lock = threading.Lock()
+_sync_client: httpx.Client | None = None
+_sync_client_pid: int | None = None
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _client_options() -> dict:
+    return {
+        'http2': HTTP2_AVAILABLE,
+        'limits': httpx.Limits(
+            max_connections=settings.TELEGRAM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.TELEGRAM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=30.0,
+        ),
+        'timeout': httpx.Timeout(
+            settings.TELEGRAM_HTTP_TIMEOUT,
+            connect=settings.TELEGRAM_HTTP_CONNECT_TIMEOUT,
+        ),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """Общий синхронный клиент Bot API этого процесса."""
+    global _sync_client, _sync_client_pid
+    pid = os.getpid()
+    if _sync_client is None or _sync_client_pid != pid:
+        with _client_lock:
+            if _sync_client is None or _sync_client_pid != pid:
+                # Соединения родителя после fork не используем — просто забываем клиент
+                _sync_client = httpx.Client(**_client_options())
+                _sync_client_pid = pid
+    return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Общий AsyncClient для текущего event loop."""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**_client_options())
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_http_client():
+    """Закрывает AsyncClient текущего loop (вызывать перед завершением asyncio.run)."""
+    import asyncio
+
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
 class TelegramAuthService:
     """
     Сервис авторизации через Telegram Mini App.
 
     Проверяет initData от Telegram Web App по алгоритму:
     https://core.telegram.org/bots/webapps#validating-data-received-via-the-mini-app
+
+    Производный ключ HMAC("WebAppData", bot_token) считается один раз на процесс,
+    а уже проверенные строки initData кэшируются на TELEGRAM_INIT_DATA_CACHE_TTL
+    (но не дольше, чем initData остаётся свежей по auth_date).
     """
 
+    _secret_key: tuple[str, bytes] | None = None
+    _verified: OrderedDict = OrderedDict()
+    _verified_lock = threading.Lock()
+    VERIFIED_CACHE_SIZE = 1000
+
+    @classmethod
+    def _get_secret_key(cls, bot_token: str) -> bytes:
+        """secret_key = HMAC-SHA256(bot_token, "WebAppData"), кэш на процесс (по токену)."""
+        cached = cls._secret_key
+        if cached is None or cached[0] != bot_token:
+            cached = (bot_token, hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest())
+            cls._secret_key = cached
+        return cached[1]
+
+    @classmethod
+    def _cache_get(cls, init_data: str) -> dict | None:
+        with cls._verified_lock:
+            entry = cls._verified.get(init_data)
+            if entry is None:
+                return None
+            parsed, expires_at = entry
+            if expires_at < time.time():
+                del cls._verified[init_data]
+                return None
+            cls._verified.move_to_end(init_data)
+        return dict(parsed)
+
+    @classmethod
+    def _cache_set(cls, init_data: str, parsed: dict, expires_at: float):
+        with cls._verified_lock:
+            cls._verified[init_data] = (parsed, expires_at)
+            cls._verified.move_to_end(init_data)
+            while len(cls._verified) > cls.VERIFIED_CACHE_SIZE:
+                cls._verified.popitem(last=False)
+
     @staticmethod
-    def validate_init_data(init_data: str) -> dict | None:
+    def _auth_date_expiry(parsed: dict) -> float | None:
+        """
+        Момент, после которого initData считается устаревшей (защита от повтора
+        перехваченной строки). None — устарела уже сейчас или auth_date некорректна.
+        """
+        max_age = settings.TELEGRAM_INIT_DATA_MAX_AGE
+        if not max_age:
+            return float('inf')
+        try:
+            auth_date = int(parsed.get('auth_date', ''))
+        except ValueError:
+            return None
+        now = time.time()
+        # Небольшой допуск на расхождение часов, но не «из будущего»
+        if auth_date > now + 60 or now - auth_date > max_age:
+            return None
+        return auth_date + max_age
+
+    @classmethod
+    def validate_init_data(cls, init_data: str) -> dict | None:
         """
         Валидирует initData от Telegram.
 
-        Возвращает распарсенные данные пользователя или None если невалидно.
+        Возвращает распарсенные данные пользователя или None если невалидно или устарело.
         """
         if not init_data:
             return None
@@ -32,6 +165,10 @@ class TelegramAuthService:
             logger.warning("TELEGRAM_BOT_TOKEN не настроен")
             return None
 
+        cached = cls._cache_get(init_data)
+        if cached is not None:
+            return cached
+
         try:
             # Парсим query string
             parsed = dict(parse_qsl(init_data, keep_blank_values=True))
@@ -45,30 +182,31 @@ class TelegramAuthService:
                 f"{k}={v}" for k, v in sorted(parsed.items())
             )
 
-            # Вычисляем secret_key = HMAC-SHA256(bot_token, "WebAppData")
-            secret_key = hmac.new(
-                b"WebAppData",
-                bot_token.encode(),
-                hashlib.sha256
-            ).digest()
-
             # Вычисляем хеш данных
             calculated_hash = hmac.new(
-                secret_key,
+                cls._get_secret_key(bot_token),
                 data_check_string.encode(),
                 hashlib.sha256
             ).hexdigest()
 
-            if calculated_hash != received_hash:
+            if not hmac.compare_digest(calculated_hash, received_hash):
                 logger.warning("Невалидная подпись initData")
                 return None
 
+            expires_at = cls._auth_date_expiry(parsed)
+            if expires_at is None:
+                logger.warning(f"Устаревшая initData: auth_date={parsed.get('auth_date')}")
+                return None
+
             # Парсим user из JSON
             user_json = parsed.get('user')
             if user_json:
                 parsed['user'] = json.loads(unquote(user_json))
 
-            return parsed
+            cls._cache_set(
+                init_data, parsed, min(time.time() + settings.TELEGRAM_INIT_DATA_CACHE_TTL, expires_at),
+            )
+            return dict(parsed)
 
         except Exception as e:
             logger.error(f"Ошибка валидации initData: {e}")
@@ -90,71 +228,251 @@ class TelegramAuthService:
         }
 
 
+# ===========================================
+# Circuit breaker для Bot API
+# ===========================================
+
+class CircuitBreaker:
+    """
+    Предохранитель исходящих вызовов (общий на процесс, потокобезопасный).
+
+    CLOSED: вызовы идут; ошибка сети/5xx или ответ дольше slow_seconds — неудача.
+    После failure_threshold неудач подряд — OPEN: вызовы сразу отклоняются,
+    не занимая воркер на время таймаута. Через reset_seconds — HALF_OPEN:
+    пропускается один пробный вызов; успех закрывает цепь, неудача снова открывает.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int, slow_seconds: float, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_seconds = slow_seconds
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = 0.0
+        self._latency = None  # экспоненциальное среднее, сек
+        self._rejected = 0
+
+    def allow(self) -> bool:
+        """Можно ли сделать вызов сейчас. В HALF_OPEN разрешает только один пробный."""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and now - self._opened_at >= self.reset_seconds:
+                self._state = self.HALF_OPEN
+                self._probe_started = 0.0
+            # Пробный вызов завис дольше reset_seconds — пускаем следующий
+            if self._state == self.HALF_OPEN and (
+                not self._probe_started or now - self._probe_started >= self.reset_seconds
+            ):
+                self._probe_started = now
+                return True
+            self._rejected += 1
+            return False
+
+    def is_open(self) -> bool:
+        """Цепь разомкнута и пробовать ещё рано (allow() не вызывается, пробный вызов не тратится)."""
+        with self._lock:
+            return self._state == self.OPEN and time.monotonic() - self._opened_at < self.reset_seconds
+
+    def retry_in(self) -> float:
+        """Через сколько секунд имеет смысл повторить."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return 0.0
+            return max(self.reset_seconds - (time.monotonic() - self._opened_at), 1.0)
+
+    def record(self, ok: bool, elapsed: float):
+        """Учитывает результат вызова, разрешённого allow()."""
+        failed = not ok or elapsed > self.slow_seconds
+        with self._lock:
+            self._latency = elapsed if self._latency is None else self._latency * 0.8 + elapsed * 0.2
+            if not failed:
+                if self._state != self.CLOSED:
+                    logger.info(f"Circuit breaker {self.name}: цепь снова замкнута")
+                self._state = self.CLOSED
+                self._failures = 0
+                return
+
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self._failures >= self.failure_threshold
+            ):
+                if self._state == self.CLOSED:
+                    logger.warning(
+                        f"Circuit breaker {self.name}: {self._failures} неудач подряд, "
+                        f"вызовы приостановлены на {self.reset_seconds:.0f} с"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'state': self._state,
+                'failures': self._failures,
+                'latency_ms': round(self._latency * 1000) if self._latency is not None else None,
+                'rejected': self._rejected,
+            }
+
+
+telegram_breaker = CircuitBreaker(
+    'telegram',
+    failure_threshold=settings.TELEGRAM_BREAKER_FAILURES,
+    slow_seconds=settings.TELEGRAM_BREAKER_SLOW_SECONDS,
+    reset_seconds=settings.TELEGRAM_BREAKER_RESET_SECONDS,
+)
+
+
+class SendResult(NamedTuple):
+    """Результат вызова sendMessage."""
+    ok: bool
+    retry_after: float | None = None  # 429: Telegram просит подождать столько секунд
+    error: str = ''
+    circuit_open: bool = False  # вызов не выполнялся: Bot API недоступен, повторить позже
+
+
 class TelegramNotificationService:
     """Сервис отправки уведомлений через Telegram Bot API."""
 
     def __init__(self):
         self.bot_token = settings.TELEGRAM_BOT_TOKEN
-        self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
+        self.base_url = f"{settings.TELEGRAM_API_BASE_URL.rstrip('/')}/bot{self.bot_token}"
 
-    async def send_message(self, chat_id: int, text: str, parse_mode: str = "HTML") -> bool:
-        """Отправляет сообщение пользователю."""
+    @staticmethod
+    def _message_payload(chat_id: int, text: str, parse_mode: str | None, reply_markup: dict | None) -> dict:
+        payload = {"chat_id": chat_id, "text": text}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+        return payload
+
+    @staticmethod
+    def _result(response: httpx.Response) -> SendResult:
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.json().get('parameters', {}).get('retry_after', 1))
+            except ValueError:
+                retry_after = 1.0
+            return SendResult(False, retry_after, 'Too Many Requests')
+        if response.is_error:
+            return SendResult(False, None, f"HTTP {response.status_code}: {response.text[:200]}")
+        return SendResult(True)
+
+    @classmethod
+    def _checked(cls, response: httpx.Response, chat_id: int) -> SendResult:
+        result = cls._result(response)
+        if result.retry_after is not None:
+            logger.warning(f"Telegram 429 (chat_id={chat_id}): повторить через {result.retry_after} с")
+        elif not result.ok:
+            logger.error(f"Ошибка отправки сообщения в Telegram (chat_id={chat_id}): {result.error}")
+        return result
+
+    @staticmethod
+    def _short_circuited() -> SendResult:
+        """Вызов не выполняется: цепь разомкнута, retry_after — когда будет пробный вызов."""
+        return SendResult(False, telegram_breaker.retry_in(), 'Bot API недоступен (circuit breaker)', circuit_open=True)
+
+    async def deliver(self, chat_id: int, text: str, parse_mode: str | None = "HTML",
+                      reply_markup: dict | None = None) -> SendResult:
+        """Отправляет сообщение и возвращает подробный результат (в т.ч. retry_after при 429)."""
         if not self.bot_token:
             logger.warning("TELEGRAM_BOT_TOKEN не настроен, уведомление не отправлено")
-            return False
+            return SendResult(False, None, 'TELEGRAM_BOT_TOKEN не настроен')
+
+        if not telegram_breaker.allow():
+            return self._short_circuited()
 
+        started = time.monotonic()
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/sendMessage",
-                    json={
-                        "chat_id": chat_id,
-                        "text": text,
-                        "parse_mode": parse_mode,
-                    },
-                    timeout=10.0
-                )
-                response.raise_for_status()
-                return True
+            response = await get_async_http_client().post(
+                f"{self.base_url}/sendMessage",
+                json=self._message_payload(chat_id, text, parse_mode, reply_markup),
+            )
         except Exception as e:
+            telegram_breaker.record(False, time.monotonic() - started)
             logger.error(f"Ошибка отправки сообщения в Telegram: {e}")
-            return False
+            return SendResult(False, None, str(e) or type(e).__name__)
 
-    def send_message_sync(self, chat_id: int, text: str, parse_mode: str = "HTML") -> bool:
-        """Синхронная отправка сообщения (для использования в Django views)."""
+        # 429 и 4xx (бот заблокирован и т.п.) — ответы живого API; цепь размыкают сеть, 5xx и медленные ответы
+        telegram_breaker.record(response.status_code < 500, time.monotonic() - started)
+        return self._checked(response, chat_id)
+
+    def deliver_sync(self, chat_id: int, text: str, parse_mode: str | None = "HTML",
+                     reply_markup: dict | None = None) -> SendResult:
+        """Синхронный вариант deliver()."""
         if not self.bot_token:
             logger.warning("TELEGRAM_BOT_TOKEN не настроен, уведомление не отправлено")
-            return False
+            return SendResult(False, None, 'TELEGRAM_BOT_TOKEN не настроен')
 
+        if not telegram_breaker.allow():
+            return self._short_circuited()
+
+        started = time.monotonic()
         try:
-            with httpx.Client() as client:
-                response = client.post(
-                    f"{self.base_url}/sendMessage",
-                    json={
-                        "chat_id": chat_id,
-                        "text": text,
-                        "parse_mode": parse_mode,
-                    },
-                    timeout=10.0
-                )
-                response.raise_for_status()
-                return True
+            response = get_http_client().post(
+                f"{self.base_url}/sendMessage",
+                json=self._message_payload(chat_id, text, parse_mode, reply_markup),
+            )
         except Exception as e:
+            telegram_breaker.record(False, time.monotonic() - started)
             logger.error(f"Ошибка отправки сообщения в Telegram: {e}")
-            return False
+            return SendResult(False, None, str(e) or type(e).__name__)
+
+        # 429 и 4xx (бот заблокирован и т.п.) — ответы живого API; цепь размыкают сеть, 5xx и медленные ответы
+        telegram_breaker.record(response.status_code < 500, time.monotonic() - started)
+        return self._checked(response, chat_id)
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: str | None = "HTML",
+                           reply_markup: dict | None = None) -> bool:
+        """Отправляет сообщение пользователю."""
+        return (await self.deliver(chat_id, text, parse_mode, reply_markup)).ok
+
+    def send_message_sync(self, chat_id: int, text: str, parse_mode: str | None = "HTML",
+                          reply_markup: dict | None = None) -> bool:
+        """Синхронная отправка сообщения (для использования в Django views)."""
+        return self.deliver_sync(chat_id, text, parse_mode, reply_markup).ok
 
     def notify_lesson_reminder(self, telegram_id: int, course_name: str, lesson_title: str,
                                zoom_url: str = '', zoom_passcode: str = '') -> bool:
         """Отправляет напоминание о начале занятия."""
+        text = self.format_lesson_reminder(course_name, lesson_title, zoom_url, zoom_passcode)
+        return self.send_message_sync(telegram_id, text)
+
+    @staticmethod
+    def format_lesson_reminder(course_name: str, lesson_title: str, zoom_url: str = '', zoom_passcode: str = '') -> str:
+        """Текст напоминания о начале занятия."""
         text = f"🔔 <b>Занятие начинается!</b>\n\n📚 {course_name}\n📝 {lesson_title}"
         if zoom_url:
             text += f"\n\n<a href='{zoom_url}'>🎥 Подключиться к Zoom</a>"
         if zoom_passcode:
             text += f"\nКод доступа: <code>{zoom_passcode}</code>"
-        return self.send_message_sync(telegram_id, text)
+        return text
+
+    @staticmethod
+    def format_deadline_reminder(course_name: str, title: str, due_date) -> str:
+        """Текст напоминания о дедлайне."""
+        return (
+            f"⏰ <b>Скоро дедлайн!</b>\n\n"
+            f"📚 {course_name}\n"
+            f"📝 {title}\n"
+            f"🗓 Сдать до {timezone.localtime(due_date):%d.%m %H:%M}"
+        )
 
     def notify_grade(self, telegram_id: int, course_name: str, task_name: str, score: int | None, max_score: int) -> bool:
         """Отправляет уведомление о проверенном задании."""
+        text = self.format_grade(course_name, task_name, score, max_score)
+        return self.send_message_sync(telegram_id, text)
+
+    @staticmethod
+    def format_grade(course_name: str, task_name: str, score: int | None, max_score: int) -> str:
+        """Текст уведомления о проверенном задании."""
         if score is not None:
             text = (
                 f"✅ <b>Работа проверена!</b>\n\n"
@@ -168,5 +486,37 @@ class TelegramNotificationService:
                 f"📚 Курс: {course_name}\n"
                 f"📝 Задание: {task_name}"
             )
+        return text
 
-        return self.send_message_sync(telegram_id, text)
+    @staticmethod
+    def format_grade_digest(grades: list[dict]) -> str:
+        """Сводка о нескольких проверенных заданиях (payload из NotificationOutbox.enqueue_grade)."""
+        by_course: dict[str, list[dict]] = {}
+        for grade in grades:
+            by_course.setdefault(grade['course_name'], []).append(grade)
+
+        lines = [f"✅ <b>Проверено работ: {len(grades)}</b>"]
+        for course_name, course_grades in by_course.items():
+            lines.append(f"\n📚 {course_name}")
+            for grade in course_grades:
+                if grade['score'] is not None:
+                    lines.append(f"📝 {grade['task_name']} — <b>{grade['score']}/{grade['max_score']}</b>")
+                else:
+                    lines.append(f"📝 {grade['task_name']} — принято")
+        return "\n".join(lines)
+
+    @staticmethod
+    def format_weekly_digest(week_accepted: int, average_percent: int, streak: int, deadlines: list[tuple]) -> str:
+        """Недельная сводка (deadlines — (курс, название, срок))."""
+        lines = [
+            "📊 <b>Итоги недели</b>\n",
+            f"✅ Принято заданий за неделю: <b>{week_accepted}</b>",
+            f"🎯 Средний результат: <b>{average_percent}%</b>",
+        ]
+        if streak:
+            lines.append(f"🔥 Серия: {streak} дн. подряд")
+        if deadlines:
+            lines.append("\n⏰ <b>Дедлайны на неделе:</b>")
+            for course_name, title, due_date in deadlines:
+                lines.append(f"• {title} ({course_name}) — до {timezone.localtime(due_date):%d.%m %H:%M}")
+        return "\n".join(lines)
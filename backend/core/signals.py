@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Course, Deadline, Enrollment, Grade, ScheduleEvent, Student, Task
+from .services.snapshots import SnapshotService
+
+
+def _refresh_student(student_id: int):
+    # Оценки и подписки удаляются и каскадом вместе с учеником — тогда срез не нужен
+    if Student.objects.filter(pk=student_id).exists():
+        SnapshotService.refresh_student(student_id)
+
+
+@receiver([post_save, post_delete], sender=Grade)
+@receiver([post_save, post_delete], sender=Enrollment)
+def refresh_student_snapshot(sender, instance, **kwargs):
+    """Правка оценки или подписки через ORM (админка и т.п.) — пересчитываем срез ученика."""
+    student_id = instance.student_id
+    transaction.on_commit(lambda: _refresh_student(student_id))
+
+
+@receiver([post_save, post_delete], sender=ScheduleEvent)
+@receiver([post_save, post_delete], sender=Deadline)
+def refresh_course_snapshot(sender, instance, **kwargs):
+    """Изменилось расписание или дедлайн — пересчитываем срез курса."""
+    course_id = instance.course_id
+    transaction.on_commit(lambda: SnapshotService.refresh_course(course_id))
+
+
+@receiver(post_save, sender=Course)
+def refresh_course_name(sender, instance, created, **kwargs):
+    if not created:
+        course_id = instance.pk
+        transaction.on_commit(lambda: SnapshotService.refresh_course(course_id))
+
+
+@receiver([post_save, post_delete], sender=Grade)
+@receiver([post_save, post_delete], sender=Enrollment)
+def bump_student_version(sender, instance, **kwargs):
+    """Оценки и подписки входят в ответы API ученика — меняем его ETag."""
+    Student.bump_data_version(instance.student_id)
+
+
+@receiver([post_save, post_delete], sender=Task)
+@receiver([post_save, post_delete], sender=ScheduleEvent)
+@receiver([post_save, post_delete], sender=Deadline)
+def bump_course_version(sender, instance, **kwargs):
+    """Задания, расписание и дедлайны курса — меняем ETag всех его учеников."""
+    Course.bump_data_version(instance.course_id)
@@ -0,0 +1,607 @@
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .bot import COMMANDS
+from .grading import extract_grade
+from .grading_corpus import CORPUS, HOSTILE
+from .models import (
+    SYNTHETIC_TELEGRAM_IDS, Broadcast, BroadcastRecipient, Course, Deadline, Enrollment, Grade, OutgoingNotification, ReminderLog, ScheduleEvent,
+    Student, StudentSnapshot, Task, WorkerStatus,
+)
+from .services.broadcasts import BroadcastSender
+from .services.health import BreakerPublisher
+from .services.notifications import NotificationOutbox
+from .services.reminders import DeadlineReminders, LessonReminders
+from .services.snapshots import SnapshotService
+from .services.telegram import CircuitBreaker, SendResult
+
+
+class BootstrapQueryBudgetTests(TestCase):
+    """
+    Бюджет SQL-запросов на /api/bootstrap/.
+
+    Ответ собирается из StudentContext: сессия, ученик, подписки с курсами, принятые оценки,
+    даты оценок для streak, расписание, дедлайны — 7 запросов, плюс версия данных для ETag.
+    Число запросов не зависит от числа курсов и оценок; 304 — сессия и ETag.
+    """
+
+    def setUp(self):
+        self.student = Student.objects.create(email='student@example.com', name='Ученик', telegram_id=123)
+        self.add_courses(3, tasks_per_course=4)
+        session = self.client.session
+        session['student_id'] = self.student.id
+        session.save()
+
+    def add_courses(self, count: int, tasks_per_course: int):
+        """Курсы с подпиской, заданиями, принятыми оценками, занятиями и дедлайнами."""
+        now = timezone.now()
+        for _ in range(count):
+            course = Course.objects.create(name=f'Курс {uuid.uuid4().hex[:6]}', zenclass_id=uuid.uuid4())
+            Enrollment.objects.create(student=self.student, course=course)
+            for number in range(1, tasks_per_course + 1):
+                task = Task.objects.create(name=f'ДЗ {number}', course=course, zenclass_id=uuid.uuid4(), max_score=10)
+                Grade.objects.create(
+                    student=self.student, task=task, value=number,
+                    status=Grade.Status.ACCEPTED, checked_at=now - timedelta(days=number),
+                )
+            ScheduleEvent.objects.create(course=course, title='Занятие', scheduled_at=now + timedelta(days=1))
+            ScheduleEvent.objects.create(course=course, title='Занятие', scheduled_at=now + timedelta(days=8))
+            Deadline.objects.create(course=course, title='Дедлайн', due_date=now + timedelta(days=3))
+
+    def test_bootstrap_query_budget(self):
+        with self.assertNumQueries(8):
+            response = self.client.get('/api/bootstrap/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['courses']), 3)
+        self.assertEqual(len(data['grades']), 12)
+        self.assertEqual(len(data['schedule']), 6)
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_bootstrap_queries_do_not_grow_with_data(self):
+        self.add_courses(5, tasks_per_course=10)
+        with self.assertNumQueries(8):
+            response = self.client.get('/api/bootstrap/')
+        data = response.json()
+        self.assertEqual(len(data['courses']), 8)
+        self.assertEqual(len(data['grades']), 62)
+
+    def test_bootstrap_not_modified(self):
+        etag = self.client.get('/api/bootstrap/')['ETag']
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/bootstrap/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_bootstrap_etag_changes_on_new_grade(self):
+        etag = self.client.get('/api/bootstrap/')['ETag']
+        task = Task.objects.create(
+            name='ДЗ новое', course=Course.objects.filter(enrollments__student=self.student).first(),
+            zenclass_id=uuid.uuid4(), max_score=10,
+        )
+        Grade.objects.create(
+            student=self.student, task=task, value=7, status=Grade.Status.ACCEPTED, checked_at=timezone.now(),
+        )
+        response = self.client.get('/api/bootstrap/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class BotGradesCommandTests(TestCase):
+    """/grades отвечает из StudentSnapshot: одна-две строки БД вместо выборки оценок."""
+
+    def setUp(self):
+        self.student = Student.objects.create(email='student@example.com', name='Ученик', telegram_id=555)
+        course = Course.objects.create(name='Курс', zenclass_id=uuid.uuid4())
+        task = Task.objects.create(name='ДЗ до 2 марта', course=course, zenclass_id=uuid.uuid4(), max_score=10)
+        Grade.objects.create(
+            student=self.student, task=task, value=7, status=Grade.Status.ACCEPTED, checked_at=timezone.now(),
+        )
+
+    def grades(self, telegram_id: int):
+        return COMMANDS['grades']({'from': {'id': telegram_id}})
+
+    def test_builds_snapshot_on_first_read(self):
+        [reply] = self.grades(555)
+        self.assertIn('Принято заданий: 1', reply.text)
+        self.assertIn('Средний результат: 70%', reply.text)
+        self.assertIn('ДЗ до 2 марта — 7/10', reply.text)
+
+    def test_reads_existing_snapshot_in_one_query(self):
+        SnapshotService.refresh_student(self.student.pk)
+        with self.assertNumQueries(1):
+            [reply] = self.grades(555)
+        self.assertIn('7/10', reply.text)
+
+    def test_unknown_telegram(self):
+        [reply] = self.grades(999)
+        self.assertIn('Не нашёл тебя', reply.text)
+
+
+class RederiveHistorySnapshotTests(TransactionTestCase):
+    """
+    rederive_history пишет bulk_update в обход сигналов — срезы бота пересчитываются командой.
+
+    TransactionTestCase: команда закрывает соединение перед запуском пула процессов.
+    """
+
+    def setUp(self):
+        course = Course.objects.create(name='Курс', zenclass_id=uuid.uuid4())
+        self.task = Task.objects.create(name='ДЗ', course=course, zenclass_id=uuid.uuid4(), max_score=100)
+        self.rescored = Student.objects.create(email='rescored@example.com', name='Без балла')
+        self.other = Student.objects.create(email='other@example.com', name='С баллом')
+        now = timezone.now()
+        # Балл не разобран прежним парсером — будет пересчитан; максимум 10 по комментариям
+        Grade.objects.create(
+            student=self.rescored, task=self.task, value=None, teacher_comment='8/10',
+            status=Grade.Status.ACCEPTED, checked_at=now,
+        )
+        Grade.objects.create(
+            student=self.other, task=self.task, value=5, teacher_comment='5/10',
+            status=Grade.Status.ACCEPTED, checked_at=now,
+        )
+        SnapshotService.refresh_students([self.rescored.pk, self.other.pk])
+
+    def test_snapshots_follow_rederived_values(self):
+        self.assertEqual(StudentSnapshot.objects.get(pk=self.rescored.pk).average_percent, 0)
+        self.assertEqual(StudentSnapshot.objects.get(pk=self.other.pk).average_percent, 5)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            call_command(
+                'rederive_history', workers=1, checkpoint=os.path.join(tmp, 'state.json'), stdout=StringIO(),
+            )
+
+        self.assertEqual(Task.objects.get().max_score, 10)
+        rescored = StudentSnapshot.objects.get(pk=self.rescored.pk)
+        self.assertEqual(rescored.average_percent, 80)
+        self.assertEqual(rescored.recent_grades[0][2:4], [8, 10])
+        # Оценка не менялась, но сменился максимум задания
+        other = StudentSnapshot.objects.get(pk=self.other.pk)
+        self.assertEqual(other.average_percent, 50)
+        self.assertEqual(other.recent_grades[0][3], 10)
+
+
+class SyntheticRecipientsTests(TestCase):
+    """Уведомления и напоминания учеников бенчмарков (SYNTHETIC_TELEGRAM_IDS) не уходят обычным воркерам."""
+
+    def setUp(self):
+        self.synthetic = SYNTHETIC_TELEGRAM_IDS[0] + 1
+        self.student = Student.objects.create(email='bench@bench.invalid', name='Бенчмарк', telegram_id=self.synthetic)
+        course = Course.objects.create(name='Курс', zenclass_id=uuid.uuid4())
+        Enrollment.objects.create(student=self.student, course=course)
+        self.event = ScheduleEvent.objects.create(
+            course=course, title='Занятие', scheduled_at=timezone.now() + timedelta(minutes=5),
+        )
+
+    def test_outbox_skips_synthetic_chats(self):
+        NotificationOutbox.enqueue(self.synthetic, 'bench')
+        NotificationOutbox.enqueue(42, 'real')
+        groups = NotificationOutbox._claim_due(50)
+        self.assertEqual([group[0].telegram_id for group in groups], [42])
+
+        groups = NotificationOutbox._claim_due(50, SYNTHETIC_TELEGRAM_IDS)
+        self.assertEqual([group[0].telegram_id for group in groups], [self.synthetic])
+        self.assertFalse(OutgoingNotification.objects.filter(status=OutgoingNotification.Status.PENDING).exists())
+
+    def test_reminders_skip_synthetic_students(self):
+        self.assertEqual(LessonReminders.claim_due(), [])
+        self.assertFalse(ReminderLog.objects.exists())
+
+        claims = LessonReminders.claim_due(telegram_ids=SYNTHETIC_TELEGRAM_IDS)
+        self.assertEqual(ReminderLog.objects.get(pk__in=claims).student_id, self.student.pk)
+
+
+@override_settings(
+    GRADE_NOTIFICATION_WINDOW_SECONDS=60, NOTIFICATION_LEASE_SECONDS=120, NOTIFICATION_MAX_ATTEMPTS=3,
+    NOTIFICATION_RETRY_BASE_SECONDS=30, NOTIFICATION_RETRY_MAX_SECONDS=100,
+)
+class NotificationOutboxTests(TestCase):
+    """Склейка оценок, аренда SENDING и повторы с экспоненциальной паузой в NotificationOutbox."""
+
+    def setUp(self):
+        self.sent = []
+        self.results = []
+
+    def deliver_sync(self, service, chat_id, text, parse_mode='HTML', reply_markup=None):
+        self.sent.append((chat_id, text))
+        return self.results.pop(0) if self.results else SendResult(True)
+
+    def dispatch(self) -> tuple[int, int]:
+        deliver_sync = self.deliver_sync
+
+        def fake_deliver_sync(service, *args, **kwargs):
+            return deliver_sync(service, *args, **kwargs)
+
+        with mock.patch('core.services.notifications.TelegramNotificationService.deliver_sync', fake_deliver_sync):
+            return NotificationOutbox.dispatch_due()
+
+    @staticmethod
+    def expire(notification: OutgoingNotification):
+        OutgoingNotification.objects.filter(pk=notification.pk).update(
+            next_attempt_at=timezone.now() - timedelta(seconds=1),
+        )
+
+    def assertDueIn(self, notification: OutgoingNotification, seconds: float):
+        delay = (notification.next_attempt_at - timezone.now()).total_seconds()
+        self.assertAlmostEqual(delay, seconds, delta=5)
+
+    def test_grades_coalesced_within_window(self):
+        first = NotificationOutbox.enqueue_grade(42, 'Курс', 'ДЗ 1', 5, 10)
+        NotificationOutbox.enqueue_grade(42, 'Курс', 'ДЗ 2', None, 0)
+        NotificationOutbox.enqueue_grade(43, 'Курс', 'ДЗ 1', 7, 10)
+        NotificationOutbox.enqueue(42, 'Расписание изменилось')
+
+        # Окно склейки не истекло — уходит только обычное сообщение
+        self.assertEqual(self.dispatch(), (1, 0))
+        self.assertEqual(self.sent, [(42, 'Расписание изменилось')])
+
+        # Созрела первая оценка ученика — вторая (с неистёкшим окном) уходит с ней одной сводкой
+        self.sent.clear()
+        self.expire(first)
+        self.assertEqual(self.dispatch(), (2, 0))
+        self.assertEqual(len(self.sent), 1)
+        chat_id, text = self.sent[0]
+        self.assertEqual(chat_id, 42)
+        self.assertIn('Проверено работ: 2', text)
+        self.assertIn('ДЗ 1', text)
+        self.assertIn('ДЗ 2', text)
+
+        statuses = dict(OutgoingNotification.objects.filter(kind=OutgoingNotification.Kind.GRADE)
+                        .values_list('telegram_id', 'status').distinct())
+        self.assertEqual(statuses, {42: OutgoingNotification.Status.SENT, 43: OutgoingNotification.Status.PENDING})
+
+    def test_backoff_is_exponential_and_capped(self):
+        self.assertEqual(
+            [NotificationOutbox._backoff(attempts).total_seconds() for attempts in (1, 2, 3, 4, 10)],
+            [30, 60, 100, 100, 100],
+        )
+
+        notification = NotificationOutbox.enqueue(42, 'Текст')
+        for attempts, delay in ((1, 30), (2, 60)):
+            self.results.append(SendResult(False, error='Bad Gateway'))
+            self.expire(notification)
+            self.assertEqual(self.dispatch(), (0, 1))
+            notification.refresh_from_db()
+            self.assertEqual((notification.status, notification.attempts), (OutgoingNotification.Status.PENDING, attempts))
+            self.assertEqual(notification.last_error, 'Bad Gateway')
+            self.assertDueIn(notification, delay)
+
+    def test_expired_lease_is_claimed_again(self):
+        notification = NotificationOutbox.enqueue(42, 'Текст')
+        self.assertEqual(len(NotificationOutbox._claim_due(50)), 1)
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, OutgoingNotification.Status.SENDING)
+        self.assertDueIn(notification, 120)
+
+        # Аренда не истекла — строку отправляет другой воркер
+        self.assertEqual(NotificationOutbox._claim_due(50), [])
+
+        # Воркер упал, аренда истекла — уведомление забирает следующий проход
+        self.expire(notification)
+        self.assertEqual(self.dispatch(), (1, 0))
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), (OutgoingNotification.Status.SENT, 1))
+
+    def test_apply_result_retry_after(self):
+        notification = NotificationOutbox.enqueue(42, 'Текст')
+
+        # 429: пауза Telegram длиннее своей — ждём сколько просят
+        NotificationOutbox._apply_result(notification, SendResult(False, retry_after=90, error='Too Many Requests'))
+        self.assertEqual((notification.status, notification.attempts), (OutgoingNotification.Status.PENDING, 1))
+        self.assertDueIn(notification, 90)
+
+        # Короче своей паузы — действует экспоненциальная
+        NotificationOutbox._apply_result(notification, SendResult(False, retry_after=1, error='Too Many Requests'))
+        self.assertDueIn(notification, 60)
+
+        # Разомкнутый breaker: вызова не было, попытка не засчитывается
+        NotificationOutbox._apply_result(notification, SendResult(False, retry_after=15, circuit_open=True))
+        self.assertEqual((notification.status, notification.attempts), (OutgoingNotification.Status.PENDING, 2))
+        self.assertDueIn(notification, 15)
+
+    def test_apply_result_gives_up_after_max_attempts(self):
+        notification = NotificationOutbox.enqueue(42, 'Текст')
+        for _ in range(2):
+            NotificationOutbox._apply_result(notification, SendResult(False, error='Forbidden: bot was blocked by the user'))
+            self.assertEqual(notification.status, OutgoingNotification.Status.PENDING)
+
+        NotificationOutbox._apply_result(notification, SendResult(False, error='Forbidden: bot was blocked by the user'))
+        self.assertEqual((notification.status, notification.attempts), (OutgoingNotification.Status.FAILED, 3))
+        self.assertIn('bot was blocked', notification.last_error)
+
+        # Без текста ошибки в last_error остаётся пометка
+        notification = NotificationOutbox.enqueue(43, 'Текст')
+        NotificationOutbox._apply_result(notification, SendResult(False))
+        self.assertTrue(notification.last_error)
+
+
+@override_settings(LESSON_REMINDER_BEFORE_MINUTES=15, LESSON_REMINDER_GRACE_MINUTES=5, DEADLINE_REMINDER_BEFORE_HOURS=24)
+class ReminderLedgerTests(TestCase):
+    """Claim-then-send в ReminderLog: каждое напоминание уходит один раз, неудачная отправка повторяется."""
+
+    def setUp(self):
+        self.student = Student.objects.create(email='student@example.com', name='Ученик', telegram_id=77)
+        course = Course.objects.create(name='Курс', zenclass_id=uuid.uuid4())
+        Enrollment.objects.create(student=self.student, course=course)
+        self.event = ScheduleEvent.objects.create(
+            course=course, title='Занятие', scheduled_at=timezone.now() + timedelta(minutes=10),
+        )
+        self.deadline = Deadline.objects.create(course=course, title='Проект', due_date=timezone.now() + timedelta(hours=3))
+        self.calls = []
+        self.results = []
+
+    def send_due(self, ledger):
+        calls, results = self.calls, self.results
+
+        async def fake_deliver(service, chat_id, text, *args, **kwargs):
+            calls.append((ledger.kind, chat_id))
+            return results.pop(0) if results else SendResult(True)
+
+        with mock.patch('core.services.fanout.TelegramNotificationService.deliver', fake_deliver):
+            return ledger.send_due()
+
+    def test_repeated_runs_send_once(self):
+        for _ in range(2):
+            self.send_due(LessonReminders)
+            self.send_due(DeadlineReminders)
+
+        self.assertEqual(self.calls, [(ReminderLog.Kind.LESSON, 77), (ReminderLog.Kind.DEADLINE, 77)])
+        self.assertEqual(ReminderLog.objects.count(), 2)
+        self.assertEqual(ReminderLog.objects.get(kind=ReminderLog.Kind.LESSON).event_id, self.event.pk)
+        self.assertEqual(ReminderLog.objects.get(kind=ReminderLog.Kind.DEADLINE).deadline_id, self.deadline.pk)
+
+    def test_concurrent_claim_gets_nothing(self):
+        claims = LessonReminders.claim_due()
+        self.assertEqual(len(claims), 1)
+        # Второй прогон, пока первый ещё отправляет, — claim уже занят
+        self.assertEqual(LessonReminders.claim_due(), [])
+
+    def test_partial_unique_constraints(self):
+        ReminderLog.objects.create(event=self.event, student=self.student, kind=ReminderLog.Kind.LESSON)
+        ReminderLog.objects.create(deadline=self.deadline, student=self.student, kind=ReminderLog.Kind.DEADLINE)
+
+        # Вторая строка дедлайна (event IS NULL) не конфликтует с ограничением занятий, и наоборот
+        other = Deadline.objects.create(course=self.deadline.course, title='Эссе', due_date=self.deadline.due_date)
+        ReminderLog.objects.create(deadline=other, student=self.student, kind=ReminderLog.Kind.DEADLINE)
+
+        for duplicate in (
+            {'event': self.event, 'kind': ReminderLog.Kind.LESSON},
+            {'deadline': self.deadline, 'kind': ReminderLog.Kind.DEADLINE},
+        ):
+            with self.subTest(kind=duplicate['kind']):
+                with self.assertRaises(IntegrityError), transaction.atomic():
+                    ReminderLog.objects.create(student=self.student, **duplicate)
+
+        # Строка без занятия и дедлайна запрещена
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ReminderLog.objects.create(student=self.student, kind=ReminderLog.Kind.LESSON)
+
+    def test_failed_send_releases_claim(self):
+        self.results.append(SendResult(False, error='Bad Gateway'))
+        report = self.send_due(LessonReminders)
+        self.assertEqual(len(report.failed_keys), 1)
+        self.assertFalse(ReminderLog.objects.exists())
+
+        # Следующий прогон занимает заново и отправляет; дальше — тишина
+        self.send_due(LessonReminders)
+        self.send_due(LessonReminders)
+        self.assertEqual(self.calls, [(ReminderLog.Kind.LESSON, 77)] * 2)
+        self.assertEqual(ReminderLog.objects.filter(event=self.event).count(), 1)
+
+
+class NoWaitEvent(threading.Event):
+    """stop для BroadcastSender.run без реальных пауз на время breaker."""
+
+    def wait(self, timeout=None):
+        return self.is_set()
+
+
+class BroadcastSenderTests(TestCase):
+    """Разомкнутый breaker оставляет получателя в очереди, окончательный отказ Telegram — FAILED."""
+
+    def setUp(self):
+        course = Course.objects.create(name='Курс', zenclass_id=uuid.uuid4())
+        for telegram_id in (101, 102, 103):
+            student = Student.objects.create(
+                email=f'{telegram_id}@example.com', name=str(telegram_id), telegram_id=telegram_id,
+            )
+            Enrollment.objects.create(student=student, course=course)
+        self.broadcast = Broadcast.objects.create(course=course, text='Объявление')
+        self.calls = []
+
+    async def deliver(self, service, chat_id, text, parse_mode=None, reply_markup=None):
+        self.calls.append(chat_id)
+        if chat_id == 102:
+            return SendResult(False, error='Forbidden: bot was blocked by the user')
+        if chat_id == 103 and self.calls.count(103) == 1:
+            return SendResult(False, retry_after=30, error='Bot API недоступен', circuit_open=True)
+        return SendResult(True)
+
+    def run_broadcast(self):
+        deliver = self.deliver
+
+        async def fake_deliver(service, *args, **kwargs):
+            return await deliver(service, *args, **kwargs)
+
+        with mock.patch('core.services.fanout.TelegramNotificationService.deliver', fake_deliver):
+            return BroadcastSender.run(self.broadcast, NoWaitEvent())
+
+    def test_circuit_open_requeues_and_permanent_failure_is_final(self):
+        self.assertTrue(self.run_broadcast())
+
+        statuses = dict(self.broadcast.recipients.values_list('telegram_id', 'status'))
+        self.assertEqual(statuses, {
+            101: BroadcastRecipient.Status.SENT,
+            102: BroadcastRecipient.Status.FAILED,
+            103: BroadcastRecipient.Status.SENT,
+        })
+        blocked = self.broadcast.recipients.get(telegram_id=102)
+        self.assertIn('bot was blocked', blocked.last_error)
+        # Заблокировавшему бота не пишем повторно; отложенному breaker'ом — пишем снова
+        self.assertEqual(self.calls.count(102), 1)
+        self.assertEqual(self.calls.count(103), 2)
+
+        self.broadcast.refresh_from_db()
+        self.assertEqual((self.broadcast.status, self.broadcast.sent, self.broadcast.failed), (
+            Broadcast.Status.DONE, 2, 1,
+        ))
+
+
+class GradingCorpusTests(SimpleTestCase):
+    """Правила core.grading на корпусе комментариев и защита от ReDoS."""
+
+    # Лимит на один «тяжёлый» вход; линейный разбор укладывается в доли миллисекунды
+    HOSTILE_MAX_MS = 50
+
+    def test_corpus(self):
+        for comment, task_result, score, max_score, rule in CORPUS:
+            with self.subTest(comment=comment[:60], task_result=task_result):
+                self.assertEqual(tuple(extract_grade(comment, task_result)), (score, max_score, rule))
+
+    def test_hostile_inputs_are_fast(self):
+        for text in HOSTILE:
+            with self.subTest(length=len(text), start=text[:20]):
+                # Лучший из трёх замеров — чтобы случайная пауза машины не давала ложного срабатывания
+                took = []
+                for _ in range(3):
+                    started = time.perf_counter()
+                    extract_grade(text, text)
+                    took.append((time.perf_counter() - started) * 1000)
+                self.assertLess(min(took), self.HOSTILE_MAX_MS)
+
+
+class DeadlineRemindersSettingTests(TestCase):
+    """Напоминания о дедлайнах — новый вид сообщений: без DEADLINE_REMINDER_BEFORE_HOURS не отправляются."""
+
+    def setUp(self):
+        student = Student.objects.create(email='student@example.com', name='Ученик', telegram_id=77)
+        course = Course.objects.create(name='Курс', zenclass_id=uuid.uuid4())
+        Enrollment.objects.create(student=student, course=course)
+        Deadline.objects.create(course=course, title='Проект', due_date=timezone.now() + timedelta(hours=3))
+
+    @override_settings(DEADLINE_REMINDER_BEFORE_HOURS=0)
+    def test_disabled_when_zero(self):
+        self.assertFalse(DeadlineReminders.enabled())
+        self.assertEqual(DeadlineReminders.claim_due(), [])
+        self.assertFalse(ReminderLog.objects.exists())
+
+    @override_settings(DEADLINE_REMINDER_BEFORE_HOURS=24)
+    def test_enabled_by_setting(self):
+        self.assertEqual(len(DeadlineReminders.claim_due()), 1)
+
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """Переходы CLOSED → OPEN → HALF_OPEN → CLOSED/OPEN."""
+
+    def setUp(self):
+        self.breaker = CircuitBreaker('test', failure_threshold=3, slow_seconds=1, reset_seconds=30)
+
+    def wait_reset(self):
+        """Сдвигает момент размыкания, будто reset_seconds уже прошли."""
+        self.breaker._opened_at -= self.breaker.reset_seconds
+
+    def open(self):
+        for _ in range(self.breaker.failure_threshold):
+            self.breaker.record(False, 0.1)
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record(False, 0.1)
+        self.breaker.record(False, 0.1)
+        # Успех сбрасывает счётчик неудач подряд
+        self.breaker.record(True, 0.1)
+        self.breaker.record(False, 0.1)
+        # Медленный ответ — тоже неудача
+        self.breaker.record(True, 2)
+        self.assertEqual(self.breaker.snapshot()['state'], CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.snapshot()['state'], CircuitBreaker.OPEN)
+        self.assertTrue(self.breaker.is_open())
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.snapshot()['rejected'], 1)
+        self.assertGreater(self.breaker.retry_in(), 1)
+
+    def test_half_open_allows_single_probe(self):
+        self.open()
+        self.wait_reset()
+        self.assertFalse(self.breaker.is_open())
+
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.snapshot()['state'], CircuitBreaker.HALF_OPEN)
+        # Пока пробный вызов не завершён, остальные отклоняются
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record(True, 0.1)
+        self.assertEqual(self.breaker.snapshot(), {
+            'state': CircuitBreaker.CLOSED, 'failures': 0, 'latency_ms': 100, 'rejected': 1,
+        })
+        self.assertEqual(self.breaker.retry_in(), 0)
+
+    def test_failed_probe_reopens(self):
+        self.open()
+        self.wait_reset()
+        self.assertTrue(self.breaker.allow())
+
+        # Одной неудачи пробного вызова достаточно
+        self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.snapshot()['state'], CircuitBreaker.OPEN)
+        self.assertTrue(self.breaker.is_open())
+        self.assertFalse(self.breaker.allow())
+
+
+@override_settings(WORKER_STATUS_PUBLISH_SECONDS=10)
+class HealthCheckTests(TestCase):
+    """/health/ показывает состояние breaker, опубликованное воркерами в WorkerStatus."""
+
+    def publish(self, worker: str, breaker: CircuitBreaker) -> BreakerPublisher:
+        publisher = BreakerPublisher(worker)
+        with mock.patch('core.services.health.telegram_breaker', breaker):
+            publisher.publish()
+        return publisher
+
+    def health(self) -> dict:
+        response = self.client.get('/health/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['telegram']
+
+    def test_no_workers(self):
+        self.assertEqual(self.health(), {'state': 'unknown', 'workers': {}})
+
+    def test_reports_worst_worker_state(self):
+        closed = CircuitBreaker('telegram', failure_threshold=1, slow_seconds=5, reset_seconds=30)
+        opened = CircuitBreaker('telegram', failure_threshold=1, slow_seconds=5, reset_seconds=30)
+        opened.record(False, 0.1)
+
+        notifications = self.publish('dispatch_notifications', closed)
+        self.assertEqual(self.health()['state'], CircuitBreaker.CLOSED)
+
+        scheduler = self.publish('run_scheduler', opened)
+        telegram = self.health()
+        self.assertEqual(telegram['state'], CircuitBreaker.OPEN)
+        self.assertEqual(telegram['workers'][scheduler.name]['state'], CircuitBreaker.OPEN)
+        self.assertEqual(telegram['workers'][notifications.name]['state'], CircuitBreaker.CLOSED)
+
+        # Остановленный воркер удаляет свою запись
+        scheduler.stop()
+        self.assertEqual(self.health()['state'], CircuitBreaker.CLOSED)
+
+    def test_stale_workers_ignored(self):
+        opened = CircuitBreaker('telegram', failure_threshold=1, slow_seconds=5, reset_seconds=30)
+        opened.record(False, 0.1)
+        self.publish('dispatch_notifications', opened)
+
+        # Упавший воркер не обновлял запись дольше трёх интервалов публикации
+        WorkerStatus.objects.update(updated_at=timezone.now() - timedelta(seconds=31))
+        self.assertEqual(self.health(), {'state': 'unknown', 'workers': {}})
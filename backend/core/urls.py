@@ -23,6 +23,7 @@ urlpatterns = [
     path('schedule/', views.schedule_page, name='schedule'),
 
     # API (JSON)
+    path('api/bootstrap/', views.api_bootstrap, name='api_bootstrap'),
     path('api/me/', views.api_me, name='api_me'),
     path('api/courses/', views.api_courses, name='api_courses'),
     path('api/grades/', views.api_grades, name='api_grades'),
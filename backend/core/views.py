@@ -1,16 +1,22 @@
 import json
 import logging
 import os
-import httpx
+from collections import Counter
 from django.conf import settings
+from django.db.models import Sum
 from django.http import JsonResponse, HttpResponse
 from django.shortcuts import render, redirect
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST, require_GET
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST, require_GET
 from django.utils import timezone
+from django.utils.functional import cached_property
 from datetime import timedelta
 
 from .models import Student, Course, Enrollment, Task, Grade, ScheduleEvent, Deadline
+from .bot import handle_update
+from .services.snapshots import MONTH_NAMES
+from .services.health import telegram_health
 from .services.telegram import TelegramAuthService
 
 logger = logging.getLogger(__name__)
@@ -21,8 +27,17 @@ logger = logging.getLogger(__name__)
 # ===========================================
 
 def health_check(request):
-    """Проверка работоспособности сервера."""
-    return JsonResponse({'status': 'ok', 'timestamp': timezone.now().isoformat()})
+    """Проверка работоспособности сервера (+ состояние circuit breaker Bot API по воркерам)."""
+    try:
+        telegram = telegram_health()
+    except Exception as e:
+        logger.error(f"Не удалось прочитать состояние воркеров: {e}")
+        telegram = {'state': 'unknown', 'workers': {}}
+    return JsonResponse({
+        'status': 'ok',
+        'timestamp': timezone.now().isoformat(),
+        'telegram': telegram,
+    })
 
 
 def spa_app(request):
@@ -367,67 +382,76 @@ def history_page(request):
 # API Endpoints (JSON)
 # ===========================================
 
-@require_GET
-def api_me(request):
-    """API: данные текущего пользователя."""
-    student = _get_current_student(request)
-    if not student:
-        return JsonResponse({'error': 'Not authorized'}, status=401)
+def _data_etag(request, *args, **kwargs) -> str | None:
+    """
+    ETag для API ученика одним запросом, без загрузки самих данных.
 
-    # Calculate streak: consecutive calendar days with grade submissions
-    import datetime
-    grades_dates = list(
-        Grade.objects.filter(student=student)
-        .order_by('-created_at')
-        .values_list('created_at', flat=True)
+    Складывается из версии ученика (оценки, подписки, профиль), суммы версий его курсов
+    (расписание, дедлайны, задания — версии только растут, а смена набора курсов меняет
+    версию ученика) и текущей даты UTC, от которой зависит streak в api/me.
+    Совпал с If-None-Match — condition() отвечает 304, не вызывая view.
+    """
+    student_id = request.session.get('student_id')
+    if not student_id:
+        return None
+
+    row = (
+        Student.objects.filter(id=student_id)
+        .annotate(courses_version=Sum('enrollments__course__data_version'))
+        .values_list('data_version', 'courses_version')
+        .first()
     )
-    streak = 0
-    if grades_dates:
-        now = timezone.now()
-        last = grades_dates[0]
-        if (now - last).total_seconds() <= 86400:
-            days = {g.date() for g in grades_dates}
-            check = now.date()
-            while check in days:
-                streak += 1
-                check -= datetime.timedelta(days=1)
+    if row is None:
+        return None
+    student_version, courses_version = row
+    # id ученика — чтобы после смены аккаунта в том же браузере не получить 304 на чужой кэш
+    return f"{student_id}-{student_version}-{courses_version or 0}-{timezone.now().date():%Y%m%d}"
+
+
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_data_etag)
+def api_bootstrap(request):
+    """
+    API: всё для первого экрана SPA одним ответом — me, courses, grades, schedule, deadlines.
+
+    Вместо пяти запросов (каждый со своей загрузкой сессии, ученика и подписок)
+    ответы собираются из общего StudentContext: сессия, ученик, подписки с курсами,
+    принятые оценки, даты оценок для streak, расписание и дедлайны — 7 SQL-запросов.
+    """
+    context = StudentContext.from_request(request)
+    if not context:
+        return JsonResponse({'error': 'Not authorized'}, status=401)
 
     return JsonResponse({
-        'id': student.id,
-        'name': student.name,
-        'email': student.email,
-        'streak': streak,
+        'me': _me_payload(context),
+        'courses': _courses_payload(context),
+        'grades': _grades_payload(context),
+        'schedule': _schedule_payload(context),
+        'deadlines': _deadlines_payload(context),
     })
 
 
 @require_GET
-def api_courses(request):
-    """API: список курсов студента."""
-    student = _get_current_student(request)
-    if not student:
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_data_etag)
+def api_me(request):
+    """API: данные текущего пользователя."""
+    context = StudentContext.from_request(request)
+    if not context:
         return JsonResponse({'error': 'Not authorized'}, status=401)
+    return JsonResponse(_me_payload(context))
 
-    enrollments = Enrollment.objects.filter(student=student).select_related('course')
 
-    courses = []
-    for enrollment in enrollments:
-        course = enrollment.course
-        grades_count = Grade.objects.filter(
-            student=student,
-            task__course=course,
-            status=Grade.Status.ACCEPTED
-        ).count()
-
-        courses.append({
-            'id': course.id,
-            'name': course.name,
-            'status': enrollment.status,
-            'grades_count': grades_count,
-            'zoom_url': course.zoom_url,
-            'zoom_passcode': course.zoom_passcode,
-        })
-
-    return JsonResponse({'courses': courses})
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_data_etag)
+def api_courses(request):
+    """API: список курсов студента."""
+    context = StudentContext.from_request(request)
+    if not context:
+        return JsonResponse({'error': 'Not authorized'}, status=401)
+    return JsonResponse({'courses': _courses_payload(context)})
 
 
 def schedule_page(request):
@@ -516,115 +540,36 @@ def api_stats(request):
 
 
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_data_etag)
 def api_grades(request):
     """API: все оценки студента по всем курсам (для фронтенда)."""
-    student = _get_current_student(request)
-    if not student:
+    context = StudentContext.from_request(request)
+    if not context:
         return JsonResponse({'error': 'Not authorized'}, status=401)
-
-    task_type_map = {
-        'homework': 'HW',
-        'mock': 'MOCK',
-        'essay': 'ESSAY',
-        'project': 'PROJECT',
-        'other': 'HW',
-    }
-
-    grades = Grade.objects.filter(
-        student=student,
-        status=Grade.Status.ACCEPTED,
-    ).select_related('task', 'task__course').order_by('-checked_at')
-
-    grades_data = []
-    for grade in grades:
-        grades_data.append({
-            'id': grade.id,
-            'course_id': grade.task.course_id,
-            'type': task_type_map.get(grade.task.task_type, 'HW'),
-            'name': grade.task.name,
-            'date': grade.checked_at.date().isoformat() if grade.checked_at else None,
-            'score': grade.value,
-            'max_score': grade.task.max_score,
-            'teacher_comment': grade.teacher_comment,
-        })
-
-    return JsonResponse({'grades': grades_data})
+    return JsonResponse({'grades': _grades_payload(context)})
 
 
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_data_etag)
 def api_schedule(request):
     """API: расписание занятий по всем курсам студента."""
-    student = _get_current_student(request)
-    if not student:
+    context = StudentContext.from_request(request)
+    if not context:
         return JsonResponse({'error': 'Not authorized'}, status=401)
-
-    course_ids = list(Enrollment.objects.filter(student=student).values_list('course_id', flat=True))
-
-    events = ScheduleEvent.objects.filter(
-        course_id__in=course_ids
-    ).order_by('scheduled_at')
-
-    schedule_data = []
-    for event in events:
-        schedule_data.append({
-            'id': event.id,
-            'course_id': event.course_id,
-            'topic': event.title,
-            'starts_at': event.scheduled_at.isoformat(),
-            'duration_minutes': event.duration_minutes,
-        })
-
-    return JsonResponse({'schedule': schedule_data})
+    return JsonResponse({'schedule': _schedule_payload(context)})
 
 
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_data_etag)
 def api_deadlines(request):
     """API: дедлайны по всем курсам студента."""
-    student = _get_current_student(request)
-    if not student:
+    context = StudentContext.from_request(request)
+    if not context:
         return JsonResponse({'error': 'Not authorized'}, status=401)
-
-    course_ids = list(Enrollment.objects.filter(student=student).values_list('course_id', flat=True))
-
-    # Задания в ZenClass называются "ДЗ до 2 марта 23:59" — дата зашита в название.
-    # Если у студента есть ACCEPTED грейд за задание с этой датой — дедлайн считается сданным.
-    MONTH_NAMES = {
-        1: 'января', 2: 'февраля', 3: 'марта', 4: 'апреля',
-        5: 'мая', 6: 'июня', 7: 'июля', 8: 'августа',
-        9: 'сентября', 10: 'октября', 11: 'ноября', 12: 'декабря',
-    }
-
-    # Множество (course_id, task_name) для принятых заданий студента
-    accepted_task_names = set(
-        Grade.objects.filter(
-            student=student,
-            status=Grade.Status.ACCEPTED,
-            task__course_id__in=course_ids,
-        ).values_list('task__course_id', 'task__name')
-    )
-
-    deadlines = Deadline.objects.filter(
-        course_id__in=course_ids
-    ).order_by('due_date')
-
-    deadlines_data = []
-    for deadline in deadlines:
-        submitted = deadline.submitted
-        if not submitted:
-            date_str = f"{deadline.due_date.day} {MONTH_NAMES.get(deadline.due_date.month, '')}"
-            submitted = any(
-                cid == deadline.course_id and date_str in (name or '')
-                for cid, name in accepted_task_names
-            )
-        deadlines_data.append({
-            'id': deadline.id,
-            'course_id': deadline.course_id,
-            'title': deadline.title,
-            'due_date': deadline.due_date.isoformat(),
-            'submitted': submitted,
-        })
-
-    return JsonResponse({'deadlines': deadlines_data})
+    return JsonResponse({'deadlines': _deadlines_payload(context)})
 
 
 @csrf_exempt
@@ -699,7 +644,12 @@ def update_name(request):
 
 @csrf_exempt
 def bot_webhook(request):
-    """Telegram Bot webhook — обрабатывает входящие сообщения."""
+    """
+    Telegram Bot webhook — обрабатывает входящие сообщения.
+
+    Ответ бота возвращается в теле ответа ({"method": "sendMessage", ...}):
+    Telegram выполнит его сам, без исходящего запроса из gunicorn-воркера.
+    """
     if request.method != 'POST':
         return JsonResponse({'ok': True})
 
@@ -708,39 +658,14 @@ def bot_webhook(request):
     except json.JSONDecodeError:
         return JsonResponse({'ok': True})
 
-    message = data.get('message', {})
-    text = message.get('text', '')
-    chat_id = message.get('chat', {}).get('id')
-    first_name = message.get('from', {}).get('first_name', 'друг')
-
-    if not chat_id:
-        return JsonResponse({'ok': True})
-
-    if text.startswith('/start'):
-        welcome = (
-            f"Привет, {first_name}! 👋🏻\n\n"
-            f"Здесь ты можешь отслеживать оценки, расписание занятий и дедлайны по своим курсам.\n\n"
-            f"Открой приложение — всё уже там 👇"
-        )
-        reply_markup = {
-            "inline_keyboard": [[{
-                "text": "📚 Открыть Кружок",
-                "web_app": {"url": "https://kruzhoktrack.ru"},
-            }]]
-        }
-        bot_token = settings.TELEGRAM_BOT_TOKEN
-        if bot_token:
-            try:
-                with httpx.Client() as client:
-                    client.post(
-                        f"https://api.telegram.org/bot{bot_token}/sendMessage",
-                        json={"chat_id": chat_id, "text": welcome, "reply_markup": reply_markup},
-                        timeout=10.0,
-                    )
-            except Exception as e:
-                logger.error(f"Bot webhook send error: {e}")
+    try:
+        reply = handle_update(data)
+    except Exception as e:
+        # Ошибка обработчика не должна приводить к ретраям апдейта со стороны Telegram
+        logger.error(f"Bot webhook error: {e}")
+        reply = None
 
-    return JsonResponse({'ok': True})
+    return JsonResponse(reply or {'ok': True})
 
 
 # ===========================================
@@ -782,3 +707,150 @@ def _get_current_course(request, student) -> Course | None:
         return enrollment.course
 
     return None
+
+
+# ===========================================
+# API payloads — общие для api_* и api_bootstrap
+# ===========================================
+
+TASK_TYPE_MAP = {
+    'homework': 'HW',
+    'mock': 'MOCK',
+    'essay': 'ESSAY',
+    'project': 'PROJECT',
+    'other': 'HW',
+}
+
+
+class StudentContext:
+    """
+    Данные текущего ученика на время одного запроса. Каждый набор загружается
+    при первом обращении и переиспользуется всеми payload-функциями.
+    """
+
+    def __init__(self, student: Student):
+        self.student = student
+
+    @classmethod
+    def from_request(cls, request) -> 'StudentContext | None':
+        student = _get_current_student(request)
+        return cls(student) if student else None
+
+    @cached_property
+    def enrollments(self) -> list[Enrollment]:
+        return list(Enrollment.objects.filter(student=self.student).select_related('course'))
+
+    @cached_property
+    def course_ids(self) -> list[int]:
+        return [enrollment.course_id for enrollment in self.enrollments]
+
+    @cached_property
+    def accepted_grades(self) -> list[Grade]:
+        return list(
+            Grade.objects.filter(student=self.student, status=Grade.Status.ACCEPTED)
+            .select_related('task')
+            .order_by('-checked_at')
+        )
+
+
+def _me_payload(context: StudentContext) -> dict:
+    student = context.student
+
+    # Calculate streak: consecutive calendar days with grade submissions
+    grades_dates = list(
+        Grade.objects.filter(student=student)
+        .order_by('-created_at')
+        .values_list('created_at', flat=True)
+    )
+    streak = 0
+    if grades_dates:
+        now = timezone.now()
+        last = grades_dates[0]
+        if (now - last).total_seconds() <= 86400:
+            days = {g.date() for g in grades_dates}
+            check = now.date()
+            while check in days:
+                streak += 1
+                check -= timedelta(days=1)
+
+    return {
+        'id': student.id,
+        'name': student.name,
+        'email': student.email,
+        'streak': streak,
+    }
+
+
+def _courses_payload(context: StudentContext) -> list[dict]:
+    # Принятые оценки по курсам — из уже загруженных оценок, без запроса на курс
+    grades_count = Counter(grade.task.course_id for grade in context.accepted_grades)
+    return [
+        {
+            'id': enrollment.course.id,
+            'name': enrollment.course.name,
+            'status': enrollment.status,
+            'grades_count': grades_count[enrollment.course_id],
+            'zoom_url': enrollment.course.zoom_url,
+            'zoom_passcode': enrollment.course.zoom_passcode,
+        }
+        for enrollment in context.enrollments
+    ]
+
+
+def _grades_payload(context: StudentContext) -> list[dict]:
+    return [
+        {
+            'id': grade.id,
+            'course_id': grade.task.course_id,
+            'type': TASK_TYPE_MAP.get(grade.task.task_type, 'HW'),
+            'name': grade.task.name,
+            'date': grade.checked_at.date().isoformat() if grade.checked_at else None,
+            'score': grade.value,
+            'max_score': grade.task.max_score,
+            'teacher_comment': grade.teacher_comment,
+        }
+        for grade in context.accepted_grades
+    ]
+
+
+def _schedule_payload(context: StudentContext) -> list[dict]:
+    events = ScheduleEvent.objects.filter(course_id__in=context.course_ids).order_by('scheduled_at')
+    return [
+        {
+            'id': event.id,
+            'course_id': event.course_id,
+            'topic': event.title,
+            'starts_at': event.scheduled_at.isoformat(),
+            'duration_minutes': event.duration_minutes,
+        }
+        for event in events
+    ]
+
+
+def _deadlines_payload(context: StudentContext) -> list[dict]:
+    # Задания в ZenClass называются "ДЗ до 2 марта 23:59" — дата зашита в название.
+    # Если у студента есть ACCEPTED грейд за задание с этой датой — дедлайн считается сданным.
+    course_ids = set(context.course_ids)
+    accepted_task_names = {
+        (grade.task.course_id, grade.task.name)
+        for grade in context.accepted_grades
+        if grade.task.course_id in course_ids
+    }
+
+    deadlines_data = []
+    for deadline in Deadline.objects.filter(course_id__in=course_ids).order_by('due_date'):
+        submitted = deadline.submitted
+        if not submitted:
+            date_str = f"{deadline.due_date.day} {MONTH_NAMES.get(deadline.due_date.month, '')}"
+            submitted = any(
+                cid == deadline.course_id and date_str in (name or '')
+                for cid, name in accepted_task_names
+            )
+        deadlines_data.append({
+            'id': deadline.id,
+            'course_id': deadline.course_id,
+            'title': deadline.title,
+            'due_date': deadline.due_date.isoformat(),
+            'submitted': submitted,
+        })
+    return deadlines_data
@@ -0,0 +1,207 @@
+"""
+Внутрипроцессные кэши для обработки вебхуков.
+
+Кэш живёт в памяти каждого процесса (gunicorn-воркер, process_webhooks).
+Сигналы post_save/post_delete сбрасывают его в процессе, где произошло изменение.
+В остальных процессах устаревание ограничивает TTL (секреты) или поколение
+CacheGeneration в БД, которое воркер сверяет перед событиями (identity map).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class SecretCache:
+    """
+    Секреты вебхуков по zenclass_id курса, включая отрицательные ответы
+    (секрет не настроен) — чтобы неизвестный курс не бил в БД на каждый ретрай.
+    """
+
+    def __init__(self):
+        self._data: dict[str, tuple[str | None, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, course_id: str) -> tuple[bool, str | None]:
+        """Возвращает (найдено_в_кэше, секрет). Секрет None — закэшированное «не настроен»."""
+        entry = self._data.get(course_id)
+        if entry is None:
+            return False, None
+        secret, expires_at = entry
+        if expires_at < time.monotonic():
+            with self._lock:
+                self._data.pop(course_id, None)
+            return False, None
+        return True, secret
+
+    def set(self, course_id: str, secret: str | None):
+        expires_at = time.monotonic() + settings.WEBHOOK_SECRET_CACHE_TTL
+        with self._lock:
+            self._data[course_id] = (secret, expires_at)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+secret_cache = SecretCache()
+
+
+class LRUCache:
+    """Ограниченный по размеру LRU-кэш со счётчиками попаданий/промахов. Потокобезопасен."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Кладёт значение; возвращает вытесненную пару (key, value) или None."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                return self._data.popitem(last=False)
+        return None
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class IdentityMap:
+    """
+    Identity map ZenClass → первичные ключи: email/UUID ученика, UUID курса и задания → pk,
+    плюс известные пары (student_id, course_id) зачислений.
+
+    Наполняется лениво при обработке вебхуков, сбрасывается сигналами при save/delete моделей
+    в своём процессе и по смене поколения CacheGeneration — в остальных.
+    Ключи: ('student', email), ('course', uuid), ('task', uuid), ('enrollment', (student_id, course_id)).
+    """
+
+    def __init__(self, maxsize: int):
+        self._cache = LRUCache(maxsize)
+        # (kind, pk) → ключи кэша, чтобы инвалидировать по pk без перебора
+        self._keys_by_pk: dict[tuple[str, int], set] = {}
+        self._lock = threading.Lock()
+        # Поколение CacheGeneration, с которым сверялись последний раз, и когда
+        self._generation: int | None = None
+        self._synced_at = 0.0
+
+    def sync_due(self, interval: float) -> bool:
+        return time.monotonic() - self._synced_at >= interval
+
+    def apply_generation(self, generation: int):
+        """Сбрасывает кэш, если другой процесс сменил поколение (удалил или переименовал объекты)."""
+        with self._lock:
+            changed = self._generation is not None and generation != self._generation
+            self._generation = generation
+            self._synced_at = time.monotonic()
+        if changed:
+            self.clear()
+
+    def get(self, kind: str, key):
+        return self._cache.get((kind, key))
+
+    def set(self, kind: str, key, pk):
+        evicted = self._cache.set((kind, key), pk)
+        with self._lock:
+            self._keys_by_pk.setdefault((kind, pk), set()).add((kind, key))
+            if evicted is not None:
+                (evicted_kind, _), evicted_pk = evicted
+                keys = self._keys_by_pk.get((evicted_kind, evicted_pk))
+                if keys is not None:
+                    keys.discard(evicted[0])
+                    if not keys:
+                        del self._keys_by_pk[(evicted_kind, evicted_pk)]
+
+    def has_enrollment(self, student_id: int, course_id: int) -> bool:
+        return self.get('enrollment', (student_id, course_id)) is not None
+
+    def add_enrollment(self, student_id: int, course_id: int):
+        self.set('enrollment', (student_id, course_id), student_id)
+
+    def evict(self, kind: str, pk: int):
+        """Удаляет все ключи, указывающие на объект kind с данным pk."""
+        with self._lock:
+            keys = self._keys_by_pk.pop((kind, pk), set())
+        for key in keys:
+            self._cache.discard(key)
+
+    def evict_enrollment(self, student_id: int, course_id: int):
+        self._cache.discard(('enrollment', (student_id, course_id)))
+
+    def clear(self):
+        self._cache.clear()
+        with self._lock:
+            self._keys_by_pk.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+identity_map = IdentityMap(settings.WEBHOOK_IDENTITY_CACHE_SIZE)
+
+
+class RecentWebhookIds:
+    """
+    Последние webhook_id, уже поставленные в очередь (этим или другим процессом —
+    известно по ответу БД). Ретрай ZenClass с таким id отвечается сразу, без разбора
+    подписи и запросов к БД.
+
+    Это только ускоритель: id, которого нет в памяти, проверяется в БД (WebhookLog
+    с уникальным webhook_id остаётся источником истины). Ложных срабатываний нет —
+    в наборе лежат только id, которые БД уже подтвердила.
+    """
+
+    def __init__(self, maxsize: int):
+        self._cache = LRUCache(maxsize)
+
+    def __contains__(self, webhook_id: str) -> bool:
+        if not self._cache.maxsize:
+            return False
+        return self._cache.get(webhook_id) is not None
+
+    def add(self, webhook_id: str):
+        if self._cache.maxsize:
+            self._cache.set(webhook_id, True)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+recent_webhook_ids = RecentWebhookIds(settings.WEBHOOK_RECENT_IDS_SIZE)
@@ -0,0 +1,377 @@
+"""
+Нагрузочный бенчмарк приёма и обработки вебхуков ZenClass.
+
+Генерирует реалистичные подписанные вебхуки всех пяти событий, которые понимает
+/webhook/zenclass/ (lesson_task_accepted, lesson_task_submitted_for_review,
+product_user_subscribed, payment_accepted, access_to_course_expired).
+Task-события подписываются настоящими секретами курсов из CourseWebhookSecret,
+enrollment-события — WEBHOOK_SECRET_ENROLLMENT.
+
+Режимы:
+- по умолчанию — Django test client в этом процессе: меряем задержку приёма,
+  SQL-запросы на приём и на обработку каждого события (очередь разбирается здесь же);
+- --url http://127.0.0.1:8000/webhook/zenclass/ — запросы к живому gunicorn,
+  очередь разбирает запущенный process_webhooks (ждём, пока она опустеет).
+
+ВНИМАНИЕ: бенчмарк пишет в текущую БД (ученики bench-*@bench.invalid и задания
+«Бенчмарк: …» в курсах с секретами). Запускайте на dev/staging. По окончании
+созданные данные удаляются, если не указан --keep.
+Ученики создаются заранее с chat_id из SYNTHETIC_TELEGRAM_IDS, чтобы проверки ставили
+уведомления в outbox, как у настоящих учеников; воркер dispatch_notifications их не отправляет.
+
+Использование:
+    python manage.py bench_webhooks --events 2000 --concurrency 8 --duplicates 0.3
+    python manage.py bench_webhooks --max-queries 6          # упасть, если обработка дороже бюджета
+    python manage.py bench_webhooks --url http://127.0.0.1:8000/webhook/zenclass/
+"""
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from core.models import (
+    SYNTHETIC_TELEGRAM_IDS, Course, Enrollment, Grade, OutgoingNotification, Student, Task, WebhookLog,
+)
+from webhooks.cache import recent_webhook_ids
+from webhooks.queue import process_next, queue_depth
+
+BENCH_EMAIL_DOMAIN = 'bench.invalid'
+BENCH_ID_PREFIX = 'bench-'
+BENCH_TASK_NAMESPACE = uuid.UUID('6f1c2a52-2c1e-4f7e-9d0e-2f6b3f3b8a11')
+# Вторая половина синтетического диапазона — первая у bench_notifications
+BENCH_TELEGRAM_IDS = (SYNTHETIC_TELEGRAM_IDS[0] + 5_000_000, SYNTHETIC_TELEGRAM_IDS[1])
+
+# Доля событий каждого типа — как в реальном потоке: в основном проверки и сдачи работ
+EVENT_WEIGHTS = {
+    'lesson_task_accepted': 50,
+    'lesson_task_submitted_for_review': 35,
+    'product_user_subscribed': 6,
+    'payment_accepted': 6,
+    'access_to_course_expired': 3,
+}
+
+TASK_MAX_SCORES = [5, 10, 54, 100]
+
+COMMENTS = [
+    '{score}/{max}',
+    'Отлично! {score}/{max}',
+    'Оценка: {score}',
+    'Балл {score}. Поработай над аргументацией',
+    'Хорошая работа, но есть ошибки в датах. Итого {score} / {max}',
+    'Зачёт',
+    '',
+]
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк приёма и обработки подписанных вебхуков ZenClass'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=500, help='Уникальных событий')
+        parser.add_argument('--concurrency', type=int, default=4, help='Параллельных отправителей')
+        parser.add_argument('--duplicates', type=float, default=0.2, help='Доля повторных доставок (ретраи ZenClass)')
+        parser.add_argument('--students', type=int, default=50)
+        parser.add_argument('--tasks', type=int, default=10, help='Заданий на курс')
+        parser.add_argument('--url', default='', help='URL живого сервера; по умолчанию — Django test client')
+        parser.add_argument('--max-queries', type=float, default=0,
+                            help='Бюджет SQL-запросов на обработку события (среднее); 0 — без проверки')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Не удалять созданные бенчмарком данные')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+
+        courses = list(
+            Course.objects.filter(webhook_secret__isnull=False)
+            .values_list('zenclass_id', 'name', 'webhook_secret__secret_key')
+        )
+        if not courses:
+            raise CommandError('Нет курсов с секретом вебхука (Admin → Курсы → секрет вебхука)')
+
+        # Логи каждого вебхука искажают замер — оставляем только предупреждения
+        logging.getLogger('webhooks').setLevel(logging.WARNING)
+
+        try:
+            students = self._create_students(options['students'])
+            bodies = self._generate(courses, students, options)
+            deliveries = self._with_duplicates(bodies, options['duplicates'])
+            self.stdout.write(
+                f'Курсов: {len(courses)}, событий: {len(bodies)}, доставок с ретраями: {len(deliveries)}, '
+                f'потоков: {options["concurrency"]}, режим: {options["url"] or "test client"}'
+            )
+
+            if options['url']:
+                ingest = self._send_http(deliveries, options['url'], options['concurrency'])
+                processing = self._wait_for_worker()
+            else:
+                ingest = self._send_client(deliveries, options['concurrency'])
+                processing = self._drain_measured()
+
+            self._report(ingest, processing, options['max_queries'])
+        finally:
+            if not options['keep']:
+                self._cleanup()
+
+    # ===========================================
+    # Генерация
+    # ===========================================
+
+    def _sign(self, secret: str, webhook_id: str, timestamp: int) -> str:
+        return hashlib.sha1(f"{secret}&{webhook_id}&{timestamp}".encode()).hexdigest()
+
+    def _create_students(self, count: int) -> list[tuple[str, str]]:
+        """Ученики бенчмарка с привязанным (синтетическим) Telegram. Возвращает [(email, user_id)]."""
+        students = [
+            (f'bench-{i}@{BENCH_EMAIL_DOMAIN}', str(uuid.uuid5(BENCH_TASK_NAMESPACE, f'user-{i}')))
+            for i in range(count)
+        ]
+        Student.objects.bulk_create(
+            [
+                Student(email=email, name=f'Бенчмарк {i}', zenclass_id=user_id, telegram_id=BENCH_TELEGRAM_IDS[0] + i)
+                for i, (email, user_id) in enumerate(students)
+            ],
+            ignore_conflicts=True,
+        )
+        return students
+
+    def _generate(self, courses, students, options) -> list[dict]:
+        enrollment_secret = settings.WEBHOOK_SECRET_ENROLLMENT
+        events = list(EVENT_WEIGHTS)
+        weights = list(EVENT_WEIGHTS.values())
+        timestamp = int(time.time()) - options['events']
+        bodies = []
+
+        for n in range(options['events']):
+            course_id, course_name, secret = random.choice(courses)
+            email, user_id = random.choice(students)
+            task_no = random.randrange(options['tasks'])
+            task_id = str(uuid.uuid5(BENCH_TASK_NAMESPACE, f'{course_id}-{task_no}'))
+            event_name = random.choices(events, weights)[0]
+            timestamp += random.randint(0, 2)
+            webhook_id = f'{BENCH_ID_PREFIX}{uuid.uuid4().hex[:24]}'
+
+            payload = {
+                'user_email': email,
+                'user_id': user_id,
+                'tarif_id': None,
+                'tarif_name': 'Бенчмарк',
+            }
+            if event_name in ('product_user_subscribed', 'payment_accepted'):
+                payload.update({'product_id': str(course_id), 'product_name': course_name})
+                signing_secret = enrollment_secret
+            else:
+                payload.update({
+                    'course_id': str(course_id),
+                    'course_name': course_name,
+                    'task_id': task_id,
+                    'task_name': f'Бенчмарк: задание {task_no + 1}',
+                })
+                signing_secret = secret
+
+            if event_name == 'lesson_task_accepted':
+                # У задания один максимум, как в жизни: смена max_score пересчитывает срезы всех его учеников
+                max_score = TASK_MAX_SCORES[task_no % len(TASK_MAX_SCORES)]
+                score = random.randint(0, max_score)
+                payload['comment'] = random.choice(COMMENTS).format(score=score, max=max_score)
+                payload['task_result'] = f'{score}/{max_score}' if random.random() < 0.2 else 'ok'
+                payload['report_link'] = f'https://zenclass.ru/report/{webhook_id}'
+
+            bodies.append({
+                'id': webhook_id,
+                'event_name': event_name,
+                'timestamp': timestamp,
+                'hash': self._sign(signing_secret, webhook_id, timestamp) if signing_secret else '',
+                'payload': payload,
+            })
+
+        return bodies
+
+    def _with_duplicates(self, bodies: list[dict], ratio: float) -> list[bytes]:
+        """Повторные доставки того же тела — как ретраи ZenClass, вперемешку с новыми."""
+        deliveries = [json.dumps(body).encode() for body in bodies]
+        duplicates = [random.choice(deliveries) for _ in range(int(len(deliveries) * ratio))]
+        deliveries.extend(duplicates)
+        random.shuffle(deliveries)
+        return deliveries
+
+    # ===========================================
+    # Отправка
+    # ===========================================
+
+    def _run_parallel(self, deliveries: list[bytes], concurrency: int, send) -> dict:
+        latencies = []
+        statuses = Counter()
+        queries = []
+        lock = threading.Lock()
+
+        def worker(chunk):
+            local_latencies, local_statuses, local_queries = [], Counter(), []
+            state = {}
+            for body in chunk:
+                started = time.perf_counter()
+                status, query_count = send(state, body)
+                local_latencies.append(time.perf_counter() - started)
+                local_statuses[status] += 1
+                if query_count is not None:
+                    local_queries.append(query_count)
+            connection.close()
+            with lock:
+                latencies.extend(local_latencies)
+                statuses.update(local_statuses)
+                queries.extend(local_queries)
+
+        chunks = [deliveries[i::concurrency] for i in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, chunks))
+        elapsed = time.perf_counter() - started
+
+        return {'latencies': latencies, 'statuses': statuses, 'queries': queries, 'elapsed': elapsed}
+
+    def _send_client(self, deliveries: list[bytes], concurrency: int) -> dict:
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h not in ('*', '')), 'localhost')
+
+        def send(state, body):
+            client = state.setdefault('client', Client(HTTP_HOST=host))
+            with CaptureQueriesContext(connection) as captured:
+                response = client.post('/webhook/zenclass/', body, content_type='application/json')
+            return self._status_label(response.status_code, response.content), len(captured)
+
+        return self._run_parallel(deliveries, concurrency, send)
+
+    def _send_http(self, deliveries: list[bytes], url: str, concurrency: int) -> dict:
+        def send(state, body):
+            client = state.setdefault('client', httpx.Client(timeout=30.0))
+            try:
+                response = client.post(url, content=body, headers={'Content-Type': 'application/json'})
+            except httpx.HTTPError as e:
+                return f'error: {type(e).__name__}', None
+            return self._status_label(response.status_code, response.content), None
+
+        return self._run_parallel(deliveries, concurrency, send)
+
+    @staticmethod
+    def _status_label(status_code: int, content: bytes) -> str:
+        if status_code == 200:
+            try:
+                return json.loads(content).get('status', '200')
+            except ValueError:
+                return '200'
+        return str(status_code)
+
+    # ===========================================
+    # Обработка очереди
+    # ===========================================
+
+    def _drain_measured(self) -> dict:
+        """Разбирает очередь в этом процессе, считая SQL-запросы на каждое событие."""
+        per_event = defaultdict(list)
+        started = time.perf_counter()
+        while True:
+            log = WebhookLog.objects.filter(status=WebhookLog.Status.PENDING).order_by('timestamp', 'id').first()
+            with CaptureQueriesContext(connection) as captured:
+                handled = process_next()
+            if not handled:
+                break
+            per_event[log.event_name if log else '?'].append(len(captured))
+        return {'elapsed': time.perf_counter() - started, 'queries': per_event}
+
+    def _wait_for_worker(self, timeout: float = 600.0) -> dict:
+        """Живой сервер: ждём, пока process_webhooks разберёт очередь."""
+        started = time.perf_counter()
+        while queue_depth() and time.perf_counter() - started < timeout:
+            time.sleep(0.2)
+        return {'elapsed': time.perf_counter() - started, 'queries': {}}
+
+    # ===========================================
+    # Отчёт
+    # ===========================================
+
+    def _report(self, ingest: dict, processing: dict, max_queries: float):
+        latencies_ms = [value * 1000 for value in ingest['latencies']]
+        total = len(latencies_ms)
+        processed = WebhookLog.objects.filter(webhook_id__startswith=BENCH_ID_PREFIX)
+
+        self.stdout.write('\nПриём (/webhook/zenclass/):')
+        self.stdout.write(
+            f'  запросов: {total} за {ingest["elapsed"]:.2f} с → {total / ingest["elapsed"]:.0f} req/s'
+        )
+        self.stdout.write(
+            f'  задержка, мс: p50={percentile(latencies_ms, 50):.1f} p95={percentile(latencies_ms, 95):.1f} '
+            f'p99={percentile(latencies_ms, 99):.1f} max={max(latencies_ms, default=0):.1f}'
+        )
+        self.stdout.write(f'  ответы: {dict(ingest["statuses"])}')
+        if ingest['queries']:
+            self.stdout.write(
+                f'  SQL на запрос: среднее={sum(ingest["queries"]) / len(ingest["queries"]):.1f} '
+                f'max={max(ingest["queries"])}'
+            )
+            self.stdout.write(f'  кэш недавних webhook_id: {recent_webhook_ids.stats()}')
+
+        events_done = processed.exclude(status=WebhookLog.Status.PENDING).count()
+        self.stdout.write('\nОбработка очереди:')
+        self.stdout.write(
+            f'  событий: {events_done} за {processing["elapsed"]:.2f} с'
+            + (f' → {events_done / processing["elapsed"]:.0f} events/s' if processing['elapsed'] else '')
+        )
+
+        all_queries = []
+        for event_name, counts in sorted(processing['queries'].items()):
+            all_queries.extend(counts)
+            self.stdout.write(
+                f'  SQL на {event_name}: среднее={sum(counts) / len(counts):.1f} max={max(counts)} (n={len(counts)})'
+            )
+
+        bench_students = Student.objects.filter(email__endswith=f'@{BENCH_EMAIL_DOMAIN}')
+        self.stdout.write('\nИтоговые строки:')
+        self.stdout.write(f'  WebhookLog: {dict(Counter(processed.values_list("status", flat=True)))}')
+        self.stdout.write(f'  Student: {bench_students.count()}')
+        self.stdout.write(f'  Task: {Task.objects.filter(name__startswith="Бенчмарк:").count()}')
+        self.stdout.write(f'  Enrollment: {Enrollment.objects.filter(student__in=bench_students).count()}')
+        grades = Grade.objects.filter(student__in=bench_students)
+        self.stdout.write(f'  Grade: {dict(Counter(grades.values_list("status", flat=True)))}')
+        # Только уведомления учеников бенчмарка — в непустой БД ждут и настоящие
+        notifications = self._bench_notifications()
+        self.stdout.write(
+            f'  OutgoingNotification: {dict(Counter(notifications.values_list("status", flat=True)))}'
+        )
+
+        if max_queries and all_queries:
+            average = sum(all_queries) / len(all_queries)
+            if average > max_queries:
+                raise CommandError(f'Бюджет SQL превышен: {average:.1f} > {max_queries} запросов на событие')
+            self.stdout.write(self.style.SUCCESS(f'\nБюджет SQL соблюдён: {average:.1f} ≤ {max_queries}'))
+
+    @staticmethod
+    def _bench_notifications():
+        return OutgoingNotification.objects.filter(
+            telegram_id__gte=BENCH_TELEGRAM_IDS[0], telegram_id__lt=BENCH_TELEGRAM_IDS[1],
+        )
+
+    def _cleanup(self):
+        bench_students = Student.objects.filter(email__endswith=f'@{BENCH_EMAIL_DOMAIN}')
+        deleted_students, _ = bench_students.delete()
+        self._bench_notifications().delete()
+        Task.objects.filter(name__startswith='Бенчмарк:').delete()
+        WebhookLog.objects.filter(webhook_id__startswith=BENCH_ID_PREFIX).delete()
+        self.stdout.write(f'\nДанные бенчмарка удалены (объектов: {deleted_students}).')
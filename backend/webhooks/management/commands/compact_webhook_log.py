@@ -0,0 +1,108 @@
+"""
+Компактизация WebhookLog: горячие записи хранят payload как JSON,
+холодные (обработанные старше N дней) — только ключ идемпотентности
+и сжатую zlib-копию payload (или вообще без payload с --drop).
+
+Ключ webhook_id остаётся навсегда — повторный вебхук по-прежнему отсекается.
+Записи в статусах PENDING/FAILED не трогаем: они нужны для (повторной) обработки.
+
+Использование:
+    python manage.py compact_webhook_log                # старше WEBHOOK_LOG_HOT_DAYS дней
+    python manage.py compact_webhook_log --days 7
+    python manage.py compact_webhook_log --drop         # удалить payload без сжатой копии
+    python manage.py compact_webhook_log --dry-run
+
+Cron на сервере (раз в сутки):
+  30 4 * * * docker exec backend-web-1 python manage.py compact_webhook_log >> /var/log/compact_webhook_log.log 2>&1
+"""
+import json
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import WebhookLog
+
+
+class Command(BaseCommand):
+    help = 'Сжимает или удаляет payload у старых обработанных вебхуков, сохраняя ключи идемпотентности'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.WEBHOOK_LOG_HOT_DAYS,
+            help='Сколько дней хранить payload как JSON',
+        )
+        parser.add_argument('--drop', action='store_true', help='Удалять payload, а не сжимать')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        drop = options['drop']
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        queryset = WebhookLog.objects.filter(
+            status=WebhookLog.Status.DONE,
+            processed_at__lt=cutoff,
+        )
+        if drop:
+            # Удаляем и JSON, и ранее сжатые копии
+            queryset = queryset.filter(Q(payload__isnull=False) | Q(payload_compressed__isnull=False))
+        else:
+            queryset = queryset.filter(payload__isnull=False)
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f'[DRY RUN] К компактизации: {queryset.count()} записей старше {cutoff:%d.%m.%Y}'
+            ))
+            return
+
+        compacted = 0
+        raw_bytes = 0
+        compressed_bytes = 0
+        last_pk = 0
+
+        # Keyset-пагинация по pk: не держим в памяти больше одной пачки
+        while True:
+            batch = list(
+                queryset.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .only('pk', 'payload')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            for log in batch:
+                if log.payload is None:
+                    continue
+                raw = json.dumps(log.payload, ensure_ascii=False, separators=(',', ':')).encode()
+                raw_bytes += len(raw)
+                if drop:
+                    log.payload_compressed = None
+                else:
+                    log.payload_compressed = zlib.compress(raw, 9)
+                    compressed_bytes += len(log.payload_compressed)
+
+            batch_pks = [log.pk for log in batch]
+            with transaction.atomic():
+                if drop:
+                    WebhookLog.objects.filter(pk__in=batch_pks).update(payload_compressed=None)
+                else:
+                    WebhookLog.objects.bulk_update(batch, ['payload_compressed'])
+                # Отдельным update(): так JSONField гарантированно получает SQL NULL, а не JSON null
+                WebhookLog.objects.filter(pk__in=batch_pks).update(payload=None)
+            compacted += len(batch)
+
+        if drop:
+            summary = f'payload удалён у {compacted} записей ({raw_bytes // 1024} КБ несжатого JSON)'
+        else:
+            summary = (
+                f'сжато {compacted} записей: {raw_bytes // 1024} КБ → {compressed_bytes // 1024} КБ'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Готово: {summary}'))
@@ -0,0 +1,122 @@
+"""
+Воркер очереди вебхуков ZenClass.
+
+View /webhook/zenclass/ только проверяет подпись и кладёт событие в WebhookLog,
+эта команда применяет события (оценки, подписки, уведомления).
+
+Каждый поток обрабатывает свою партицию (partition_key % partitions): события
+одного ученика идут строго по timestamp, разные ученики — параллельно.
+
+Использование:
+    python manage.py process_webhooks                  # постоянный воркер
+    python manage.py process_webhooks --concurrency 4  # 4 потока = 4 партиции
+    python manage.py process_webhooks --once           # разобрать очередь и выйти
+
+Несколько процессов делят партиции через --partitions / --partition-offset:
+    python manage.py process_webhooks --concurrency 4 --partitions 8 --partition-offset 0
+    python manage.py process_webhooks --concurrency 4 --partitions 8 --partition-offset 4
+"""
+import logging
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from webhooks.cache import identity_map
+from webhooks.queue import process_next, queue_depth
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает очередь вебхуков ZenClass (SELECT ... FOR UPDATE SKIP LOCKED)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.WEBHOOK_WORKER_CONCURRENCY,
+            help='Количество потоков-обработчиков',
+        )
+        parser.add_argument(
+            '--partitions', type=int, default=None,
+            help='Общее число партиций на все процессы воркера (по умолчанию = concurrency)',
+        )
+        parser.add_argument(
+            '--partition-offset', type=int, default=0,
+            help='Первая партиция этого процесса; потоки берут партиции offset..offset+concurrency-1',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Пауза (сек), когда очередь пуста',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать текущую очередь и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        poll_interval = options['poll_interval']
+        once = options['once']
+        partitions = options['partitions'] or concurrency
+        offset = options['partition_offset']
+
+        if offset < 0 or offset + concurrency > partitions:
+            raise CommandError(
+                f'Партиции {offset}..{offset + concurrency - 1} вне диапазона 0..{partitions - 1}'
+            )
+
+        self.stop = threading.Event()
+        if not once:
+            signal.signal(signal.SIGTERM, self._shutdown)
+            signal.signal(signal.SIGINT, self._shutdown)
+
+        self.stdout.write(
+            f'Воркер вебхуков: потоков={concurrency}, партиции {offset}..{offset + concurrency - 1} '
+            f'из {partitions}, в очереди={queue_depth()}'
+        )
+
+        self.processed = 0
+        self.lock = threading.Lock()
+        threads = [
+            threading.Thread(
+                target=self._loop,
+                args=(partitions, offset + i, poll_interval, once),
+                name=f'webhook-worker-{offset + i}',
+            )
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.stdout.write(self.style.SUCCESS(f'Обработано событий: {self.processed}'))
+        self.stdout.write(f'Identity map: {identity_map.stats()}')
+
+    def _loop(self, partitions: int, partition: int, poll_interval: float, once: bool):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    handled = process_next(partitions, partition)
+                except Exception as e:
+                    # Ошибка БД вне обработчика события (например, соединение упало)
+                    logger.error(f"Ошибка воркера вебхуков: {e}")
+                    handled = False
+
+                if handled:
+                    with self.lock:
+                        self.processed += 1
+                    continue
+
+                if once:
+                    break
+                self.stop.wait(poll_interval)
+        finally:
+            connection.close()
+
+    def _shutdown(self, signum, frame):
+        logger.info(f"Получен сигнал {signum}, завершаем воркер вебхуков")
+        self.stop.set()
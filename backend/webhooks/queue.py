@@ -0,0 +1,153 @@
+"""
+Очередь вебхуков ZenClass поверх таблицы WebhookLog.
+
+View проверяет подпись и кладёт событие в WebhookLog со статусом PENDING,
+воркер `manage.py process_webhooks` разбирает очередь через
+SELECT ... FOR UPDATE SKIP LOCKED — параллельные воркеры не берут одно событие дважды.
+
+Порядок: события партиционированы по partition_key (crc32 email ученика).
+Каждая партиция обрабатывается одним потоком в порядке timestamp, а на время
+обработки берётся advisory-lock ученика — даже при пересекающихся настройках
+воркеров события одного ученика не применяются параллельно.
+"""
+import logging
+import traceback
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from core.models import CacheGeneration, WebhookLog
+from .cache import identity_map
+from .services import process_event
+
+logger = logging.getLogger(__name__)
+
+
+def queue_depth() -> int:
+    """Количество событий, ожидающих обработки (идёт по частичному индексу)."""
+    return WebhookLog.objects.filter(status=WebhookLog.Status.PENDING).count()
+
+
+def is_overloaded() -> bool:
+    """True, если очередь переполнена и новые вебхуки нужно отбивать 503."""
+    max_depth = settings.WEBHOOK_QUEUE_MAX_DEPTH
+    if not max_depth:
+        return False
+    return queue_depth() >= max_depth
+
+
+def _pending_queryset(partitions: int = 1, partition: int = 0):
+    queryset = WebhookLog.objects.filter(status=WebhookLog.Status.PENDING)
+    if partitions > 1:
+        queryset = queryset.alias(slot=Mod('partition_key', partitions)).filter(slot=partition)
+    return (
+        queryset
+        .select_for_update(skip_locked=True)
+        .order_by('timestamp', 'id')
+    )
+
+
+def _lock_partition_key(partition_key: int):
+    """Advisory-lock на ключ ученика до конца транзакции (только PostgreSQL)."""
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [partition_key])
+
+
+def _sync_identity_map():
+    """Сбрасывает identity map, если объекты удаляли/меняли в другом процессе (раз в WEBHOOK_IDENTITY_SYNC_SECONDS)."""
+    if identity_map.sync_due(settings.WEBHOOK_IDENTITY_SYNC_SECONDS):
+        identity_map.apply_generation(CacheGeneration.current(CacheGeneration.IDENTITY_MAP))
+
+
+def _apply_event(log: WebhookLog):
+    """
+    Применяет событие в savepoint с немедленной проверкой ограничений.
+
+    В PostgreSQL внешние ключи Django — DEFERRABLE INITIALLY DEFERRED: без
+    SET CONSTRAINTS ALL IMMEDIATE нарушение из-за устаревшего pk всплыло бы только
+    на COMMIT внешней транзакции, мимо обработки ошибки события.
+    Нарушение целостности — признак устаревшего pk в identity map: сбрасываем её
+    и повторяем событие один раз с pk из БД.
+    """
+    if log.get_payload() is None:
+        # Событие поставили в очередь заново после `compact_webhook_log --drop`
+        raise ValueError('payload удалён при компактизации, повторная обработка невозможна')
+
+    for attempt in (1, 2):
+        try:
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+                process_event(log.event_name, log.get_payload(), log.timestamp)
+            return
+        except IntegrityError:
+            identity_map.clear()
+            if attempt == 2:
+                raise
+            logger.warning(f"Вебхук {log.webhook_id}: нарушение целостности, повтор с pk из БД")
+
+
+def process_next(partitions: int = 1, partition: int = 0) -> bool:
+    """
+    Берёт самое раннее событие партиции и применяет его в отдельной транзакции.
+    Возвращает False, если свободных событий нет.
+    """
+    _sync_identity_map()
+    log_id = None
+    try:
+        with transaction.atomic():
+            log = _pending_queryset(partitions, partition).first()
+            if log is None:
+                return False
+            log_id = log.pk
+
+            _lock_partition_key(log.partition_key)
+
+            try:
+                # Savepoint: ошибка обработчика откатывает только его изменения,
+                # а статус FAILED фиксируется в той же транзакции
+                _apply_event(log)
+            except Exception as e:
+                logger.error(f"Ошибка обработки вебхука {log.webhook_id} ({log.event_name}): {e}")
+                # pk в identity map мог устареть (строку удалили в другом процессе) — перечитаем из БД
+                identity_map.clear()
+                log.status = WebhookLog.Status.FAILED
+                log.last_error = traceback.format_exc()[-2000:]
+            else:
+                log.status = WebhookLog.Status.DONE
+                log.last_error = ''
+
+            log.attempts += 1
+            log.handled_at = timezone.now()
+            log.save(update_fields=['status', 'attempts', 'last_error', 'handled_at'])
+    except Exception as e:
+        # Ошибка на COMMIT или вне savepoint: транзакция откатилась целиком. Если событие
+        # оставить PENDING, воркер будет брать его снова и заблокирует партицию — помечаем FAILED отдельно
+        identity_map.clear()
+        if log_id is None:
+            raise
+        logger.error(f"Ошибка транзакции вебхука #{log_id}: {e}")
+        WebhookLog.objects.filter(pk=log_id, status=WebhookLog.Status.PENDING).update(
+            status=WebhookLog.Status.FAILED,
+            attempts=F('attempts') + 1,
+            last_error=traceback.format_exc()[-2000:],
+            handled_at=timezone.now(),
+        )
+
+    return True
+
+
+def drain(limit: int | None = None, partitions: int = 1, partition: int = 0) -> int:
+    """Обрабатывает события, пока очередь не опустеет (или до limit). Возвращает количество."""
+    processed = 0
+    while limit is None or processed < limit:
+        if not process_next(partitions, partition):
+            break
+        processed += 1
+    return processed
@@ -1,10 +1,16 @@
 import hashlib
+import hmac
 import logging
-import re
+import zlib
 from datetime import datetime, timezone as dt_timezone
-from django.db import IntegrityError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from core.grading import extract_grade
 from core.models import Student, Course, Enrollment, Task, Grade, WebhookLog
-from core.services.telegram import TelegramNotificationService
+from core.services.notifications import NotificationOutbox
+from core.services.snapshots import SnapshotService
+from .cache import identity_map, recent_webhook_ids, secret_cache
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +27,7 @@ def _get_secret_for_event(event_name: str, payload: dict) -> str | None:
       глобальный WEBHOOK_SECRET_ENROLLMENT из .env — одна автоматизация на все курсы.
     - Task-события (lesson_task_accepted, lesson_task_submitted_for_review, access_to_course_expired):
       per-course секрет из CourseWebhookSecret в БД — каждый курс настраивается отдельно.
+      Кэшируется в памяти процесса (и отсутствие секрета тоже), сбрасывается сигналами.
     """
     from django.conf import settings
     from core.models import CourseWebhookSecret
@@ -33,14 +40,22 @@ def _get_secret_for_event(event_name: str, payload: dict) -> str | None:
         if not course_id:
             logger.warning(f"course_id отсутствует в payload для события '{event_name}'")
             return None
-        try:
-            secret_obj = CourseWebhookSecret.objects.get(course__zenclass_id=course_id)
-            return secret_obj.secret_key
-        except CourseWebhookSecret.DoesNotExist:
+        cache_key = str(course_id).lower()
+        cached, secret = secret_cache.get(cache_key)
+        if not cached:
+            secret = (
+                CourseWebhookSecret.objects
+                .filter(course__zenclass_id=course_id)
+                .values_list('secret_key', flat=True)
+                .first()
+            )
+            secret_cache.set(cache_key, secret)
+
+        if secret is None:
             logger.warning(
                 f"Секрет не настроен для курса {course_id} — добавьте через Admin → Core → Секреты вебхуков курсов"
             )
-            return None
+        return secret
 
     return None
 
@@ -62,17 +77,29 @@ def verify_webhook_signature(webhook_id: str, timestamp: int, received_hash: str
     concatenated = f"{secret}&{webhook_id}&{timestamp}"
     calculated_hash = hashlib.sha1(concatenated.encode()).hexdigest()
 
-    if calculated_hash != received_hash:
-        logger.warning(f"Невалидная подпись: expected={calculated_hash}, got={received_hash}")
+    # Сравнение за постоянное время — не даём подбирать хеш по времени ответа
+    if not hmac.compare_digest(calculated_hash.encode(), str(received_hash).encode()):
+        logger.warning(f"Невалидная подпись для вебхука {webhook_id}: got={received_hash}")
         return False
 
     return True
 
 
-def claim_webhook(webhook_id: str, event_name: str, payload: dict) -> WebhookLog | None:
+def partition_key_for(payload: dict) -> int:
+    """
+    Ключ партиции события: crc32 от email ученика (или id курса, если email нет).
+    Все события одного ученика получают один ключ и обрабатываются одним потоком воркера по порядку.
+    """
+    key = (payload.get('user_email') or '').lower().strip()
+    if not key:
+        key = str(payload.get('course_id') or payload.get('product_id') or '')
+    return zlib.crc32(key.encode()) & 0x7fffffff
+
+
+def claim_webhook(webhook_id: str, event_name: str, payload: dict, timestamp: int | None = None) -> WebhookLog | None:
     """
-    Атомарно проверяет идемпотентность и логирует вебхук.
-    Возвращает WebhookLog если вебхук новый, None если уже обработан.
+    Атомарно проверяет идемпотентность и ставит вебхук в очередь (status=PENDING).
+    Возвращает WebhookLog если вебхук новый, None если уже получен.
     Использует get_or_create + IntegrityError вместо exists() + create()
     для защиты от race condition при конкурентных запросах.
     """
@@ -82,89 +109,244 @@ def claim_webhook(webhook_id: str, event_name: str, payload: dict) -> WebhookLog
             defaults={
                 'event_name': event_name,
                 'payload': payload,
+                'timestamp': timestamp,
+                'partition_key': partition_key_for(payload),
             }
         )
     except IntegrityError:
-        # Конкурентная вставка — другой поток уже обработал
+        # Конкурентная вставка — другой поток уже поставил в очередь
+        recent_webhook_ids.add(str(webhook_id))
         return None
 
+    # И новый, и уже известный БД id запоминаем: ретраи дальше отвечаются из памяти
+    recent_webhook_ids.add(str(webhook_id))
     return log if created else None
 
 
-def get_or_create_student(user_email: str, user_id: str = None) -> Student:
-    """Получает или создаёт ученика по email."""
-    email = user_email.lower().strip()
+def process_event(event_name: str, payload: dict, timestamp: int):
+    """
+    Применяет событие ZenClass (вызывается воркером process_webhooks).
+    Возвращает результат обработчика или None, если событие не применено.
+    """
+    if event_name == 'lesson_task_accepted':
+        return process_task_accepted(payload, timestamp)
 
-    student, created = Student.objects.get_or_create(
-        email=email,
-        defaults={
-            'name': email.split('@')[0].title(),
-            'zenclass_id': user_id,
-        }
-    )
+    if event_name == 'lesson_task_submitted_for_review':
+        return process_task_submitted(payload, timestamp)
+
+    if event_name == 'product_user_subscribed':
+        return process_user_subscribed(payload)
 
-    if not created and user_id and not student.zenclass_id:
-        student.zenclass_id = user_id
-        student.save(update_fields=['zenclass_id'])
+    if event_name == 'payment_accepted':
+        return process_payment_accepted(payload)
 
-    if created:
-        logger.info(f"Создан новый студент: {email}")
+    if event_name == 'access_to_course_expired':
+        return process_access_expired(payload)
 
-    return student
+    logger.info(f"Неизвестное событие: {event_name}")
+    return None
+
+
+def _upsert_student(email: str, user_id: str = None) -> int:
+    """
+    INSERT ... ON CONFLICT (email) — один запрос и для нового, и для существующего ученика.
+    Возвращает pk. zenclass_id проставляется только если его ещё нет.
+    """
+    (student,) = Student.objects.bulk_create(
+        [Student(email=email, name=email.split('@')[0].title(), zenclass_id=user_id)],
+        update_conflicts=True,
+        unique_fields=['email'],
+        update_fields=['email'],  # no-op UPDATE, чтобы RETURNING вернул id существующей строки
+    )
+    if user_id:
+        Student.objects.filter(pk=student.pk, zenclass_id__isnull=True).update(zenclass_id=user_id)
+    return student.pk
 
 
 def get_or_create_course(course_id: str, course_name: str) -> Course:
     """
     Получает или создаёт курс.
 
-    Сначала ищет по zenclass_id (реальный ID из вебхука).
-    Если не найден — ищет по имени (мог быть создан импортом с синтетическим UUID)
-    и обновляет zenclass_id на реальный.
+    Ищет одним запросом по zenclass_id (реальный ID из вебхука) или по имени
+    (курс мог быть создан импортом с синтетическим UUID) — во втором случае
+    обновляет zenclass_id на реальный. Создание — INSERT ... ON CONFLICT,
+    параллельный воркер с тем же курсом не приводит к IntegrityError.
     """
-    try:
-        return Course.objects.get(zenclass_id=course_id)
-    except Course.DoesNotExist:
-        pass
+    candidates = list(Course.objects.filter(Q(zenclass_id=course_id) | Q(name=course_name)))
+    for course in candidates:
+        if str(course.zenclass_id) == str(course_id).lower():
+            return course
 
-    # Курс мог быть создан импортом с синтетическим zenclass_id — ищем по имени
-    try:
-        course = Course.objects.get(name=course_name)
+    if candidates:
+        course = candidates[0]
         course.zenclass_id = course_id
         course.save(update_fields=['zenclass_id'])
         logger.info(f"Обновлён zenclass_id курса '{course_name}': {course_id}")
         return course
-    except Course.DoesNotExist:
-        pass
 
-    course = Course.objects.create(zenclass_id=course_id, name=course_name)
-    logger.info(f"Создан новый курс: {course_name}")
+    (course,) = Course.objects.bulk_create(
+        [Course(zenclass_id=course_id, name=course_name)],
+        update_conflicts=True,
+        unique_fields=['zenclass_id'],
+        update_fields=['zenclass_id'],
+    )
+    logger.info(f"Курс: {course_name} (id={course.pk})")
     return course
 
 
-def get_or_create_task(task_id: str, task_name: str, course: Course) -> Task:
-    """Получает или создаёт задание."""
-    task_type = Task.detect_task_type(task_name)
-
-    task, created = Task.objects.get_or_create(
+def _upsert_task(task_id: str, task_name: str, course_pk: int, max_score: int | None = None) -> int:
+    """
+    INSERT ... ON CONFLICT (zenclass_id) для задания. Возвращает pk.
+    max_score используется только для нового задания — существующее обновляет
+    process_task_accepted после того, как оценка действительно применена.
+    """
+    task = Task(
         zenclass_id=task_id,
-        defaults={
-            'name': task_name,
-            'course': course,
-            'task_type': task_type,
-        }
+        name=task_name,
+        course_id=course_pk,
+        task_type=Task.detect_task_type(task_name),
+    )
+    if max_score is not None:
+        task.max_score = max_score
+
+    (task,) = Task.objects.bulk_create(
+        [task],
+        update_conflicts=True,
+        unique_fields=['zenclass_id'],
+        update_fields=['zenclass_id'],  # no-op UPDATE, чтобы RETURNING вернул id существующей строки
     )
+    return task.pk
 
-    if created:
-        logger.info(f"Создано новое задание: {task_name} (тип: {task_type})")
 
-    return task
+def _remember(kind: str, key, pk: int):
+    """
+    Кладёт pk в identity map после коммита транзакции:
+    откат (упавшее событие) не должен оставить в кэше pk несуществующей строки.
+    """
+    transaction.on_commit(lambda: identity_map.set(kind, key, pk))
+
+
+def resolve_student_id(user_email: str, user_id: str = None) -> int:
+    """pk ученика по email: из identity map, при промахе — upsert."""
+    email = user_email.lower().strip()
+    pk = identity_map.get('student', email)
+    if pk is None:
+        pk = _upsert_student(email, user_id)
+        _remember('student', email, pk)
+    return pk
+
+
+def resolve_course_id(course_id: str, course_name: str) -> int:
+    """pk курса по zenclass_id: из identity map, при промахе — get_or_create_course."""
+    key = str(course_id).lower()
+    pk = identity_map.get('course', key)
+    if pk is None:
+        pk = get_or_create_course(course_id, course_name).pk
+        _remember('course', key, pk)
+    return pk
+
+
+def resolve_task_id(task_id: str, task_name: str, course_pk: int, max_score: int | None = None) -> int:
+    """pk задания по zenclass_id: из identity map, при промахе — upsert."""
+    key = str(task_id).lower()
+    pk = identity_map.get('task', key)
+    if pk is None:
+        pk = _upsert_task(task_id, task_name, course_pk, max_score)
+        _remember('task', key, pk)
+    return pk
+
+
+def ensure_enrollment(student_pk: int, course_pk: int, tariff_id: str = None, tariff_name: str = '') -> bool:
+    """
+    Создаёт связь ученик-курс (ON CONFLICT DO NOTHING), если её ещё нет. Известные пары не ходят в БД.
+    Возвращает True, если пара проверялась в БД (подписка могла появиться).
+    """
+    if identity_map.has_enrollment(student_pk, course_pk):
+        return False
+
+    Enrollment.objects.bulk_create(
+        [Enrollment(student_id=student_pk, course_id=course_pk, tariff_id=tariff_id, tariff_name=tariff_name)],
+        ignore_conflicts=True,
+    )
+    transaction.on_commit(lambda: identity_map.add_enrollment(student_pk, course_pk))
+    return True
+
+
+def _upsert_accepted_grade(student_pk: int, task_pk: int, score: int | None, comment: str,
+                           report_link: str, checked_at: datetime) -> tuple[int, int | None, int] | None:
+    """
+    INSERT ... ON CONFLICT (student_id, task_id) DO UPDATE ... WHERE checked_at <= новый.
+
+    Один запрос вместо SELECT + UPDATE + проверки устаревания: более старое событие
+    не перетирает свежую проверку (тогда строк не возвращается и результат None).
+    RETURNING сразу отдаёт telegram_id ученика и max_score задания для уведомления.
+    Возвращает (grade_id, telegram_id, max_score) или None для устаревшего события.
+    """
+    grade_table = Grade._meta.db_table
+    student_table = Student._meta.db_table
+    task_table = Task._meta.db_table
+    now = timezone.now()
+
+    sql = f"""
+        INSERT INTO {grade_table}
+            (student_id, task_id, value, teacher_comment, status, report_link, checked_at, created_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (student_id, task_id) DO UPDATE SET
+            value = EXCLUDED.value,
+            teacher_comment = EXCLUDED.teacher_comment,
+            status = EXCLUDED.status,
+            report_link = EXCLUDED.report_link,
+            checked_at = EXCLUDED.checked_at,
+            updated_at = EXCLUDED.updated_at
+        WHERE {grade_table}.checked_at IS NULL OR {grade_table}.checked_at <= EXCLUDED.checked_at
+        RETURNING
+            id,
+            (SELECT telegram_id FROM {student_table} WHERE {student_table}.id = {grade_table}.student_id),
+            (SELECT max_score FROM {task_table} WHERE {task_table}.id = {grade_table}.task_id)
+    """
+    params = [
+        student_pk, task_pk, score, comment, Grade.Status.ACCEPTED.value, report_link,
+        checked_at, now, now,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+
+
+def _insert_submitted_grade(student_pk: int, task_pk: int) -> tuple[int, datetime] | None:
+    """
+    INSERT ... ON CONFLICT (student_id, task_id) DO NOTHING RETURNING id.
+
+    bulk_create(ignore_conflicts=True) не возвращает pk; здесь RETURNING отдаёт id
+    только реально вставленной строки. Возвращает (id, created_at) или None, если
+    работа уже есть (на проверке или проверена).
+    """
+    grade_table = Grade._meta.db_table
+    now = timezone.now()
+    sql = f"""
+        INSERT INTO {grade_table}
+            (student_id, task_id, value, teacher_comment, status, report_link, checked_at, created_at, updated_at)
+        VALUES (%s, %s, NULL, '', %s, '', NULL, %s, %s)
+        ON CONFLICT (student_id, task_id) DO NOTHING
+        RETURNING id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [student_pk, task_pk, Grade.Status.SUBMITTED.value, now, now])
+        row = cursor.fetchone()
+    return (row[0], now) if row else None
 
 
 def process_task_accepted(payload: dict, timestamp: int) -> Grade | None:
     """
     Обрабатывает событие lesson_task_accepted.
     Парсит оценку из комментария и сохраняет результат.
-    Отправляет уведомление в Telegram.
+    Ставит уведомление в Telegram в outbox.
+
+    Все записи — в одной транзакции через INSERT ... ON CONFLICT: для известных
+    ученика/курса/задания это 1 запрос (+2, если изменился max_score задания,
+    +1 на запись уведомления в outbox), плюс чтение прежней оценки и инкрементальное
+    обновление среза ученика для бота (3 запроса) и 1 на его версию данных (ETag API).
+    Сменился max_score — срезы остальных учеников с этим заданием пересчитываются после коммита.
     """
     user_email = payload.get('user_email')
     user_id = payload.get('user_id')
@@ -182,86 +364,90 @@ def process_task_accepted(payload: dict, timestamp: int) -> Grade | None:
         logger.warning(f"Неполные данные вебхука: email={user_email}, course={course_id}, task={task_id}")
         return None
 
-    student = get_or_create_student(user_email, user_id)
-    course = get_or_create_course(course_id, course_name)
-    task = get_or_create_task(task_id, task_name, course)
-
-    # Создаём или обновляем связь ученик-курс
-    Enrollment.objects.get_or_create(
-        student=student,
-        course=course,
-        defaults={
-            'tariff_id': tariff_id,
-            'tariff_name': tariff_name,
-        }
-    )
-
-    # Парсим оценку
-    score = None
-    max_score = task.max_score
-
-    # Для тестов с автопроверкой: "5/7"
-    if task_result and '/' in str(task_result):
-        parts = str(task_result).split('/')
-        try:
-            score = int(parts[0])
-            max_score = int(parts[1])
-            task.max_score = max_score
-            task.save(update_fields=['max_score'])
-        except (ValueError, IndexError):
-            pass
-    elif comment:
-        # Куратор пишет "44/54" — парсим оба числа и обновляем max_score задания
-        match = re.search(r'(\d+)\s*/\s*(\d+)', comment)
-        if match:
-            score = int(match.group(1))
-            max_score = int(match.group(2))
-            task.max_score = max_score
-            task.save(update_fields=['max_score'])
-        else:
-            score = Grade.parse_score_from_comment(comment)
+    # Оценка: task_result автопроверки ("5/7") или комментарий куратора ("44/54", "Оценка: 5")
+    score, max_score, rule = extract_grade(comment, task_result)
 
-    # Создаём или обновляем оценку
+    email = user_email.lower().strip()
     checked_at = datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
 
-    grade, created = Grade.objects.update_or_create(
-        student=student,
-        task=task,
-        defaults={
-            'value': score,
-            'teacher_comment': comment,
-            'status': Grade.Status.ACCEPTED,
-            'report_link': report_link,
-            'checked_at': checked_at,
-        }
-    )
+    # savepoint=False: внутри транзакции воркера не плодим SAVEPOINT/RELEASE
+    with transaction.atomic(savepoint=False):
+        student_pk = resolve_student_id(email, user_id)
+        course_pk = resolve_course_id(course_id, course_name)
+        task_pk = resolve_task_id(task_id, task_name, course_pk, max_score)
+
+        # Создаём связь ученик-курс, если её ещё нет
+        new_pair = ensure_enrollment(student_pk, course_pk, tariff_id, tariff_name)
 
-    logger.info(f"{'Создана' if created else 'Обновлена'} оценка: {student.email} - {task_name} = {score}")
-
-    # Отправляем уведомление в Telegram
-    if student.telegram_id:
-        notification_service = TelegramNotificationService()
-        ok = notification_service.notify_grade(
-            telegram_id=student.telegram_id,
-            course_name=course_name,
-            task_name=task_name,
-            score=score,
-            max_score=max_score
+        # Прежняя оценка — чтобы срез ученика обновить разницей, а не пересчётом всей истории
+        previous = (
+            Grade.objects.filter(student_id=student_pk, task_id=task_pk)
+            .values_list('value', 'status')
+            .first()
         )
-        if ok:
-            logger.info(f"Telegram-уведомление отправлено: tg_id={student.telegram_id}")
-        else:
-            logger.warning(f"Telegram-уведомление НЕ отправлено: tg_id={student.telegram_id}")
-    else:
-        logger.info(f"Telegram-уведомление пропущено (нет telegram_id): {student.email}")
+        row = _upsert_accepted_grade(student_pk, task_pk, score, comment, report_link, checked_at)
+
+        # Итоговое состояние оценки определяется временем события, а не порядком доставки:
+        # запоздавший ретрай старого события не перетирает более свежую проверку
+        if row is None:
+            logger.info(f"Пропущено устаревшее событие: {email} - {task_name} (ts={timestamp})")
+            return None
 
-    return grade
+        grade_id, telegram_id, task_max_score = row
+
+        # Куратор указал максимум ("44/54") — обновляем задание, только если оценка применена
+        if max_score is not None and task_max_score != max_score:
+            Task.objects.filter(pk=task_pk).update(max_score=max_score)
+            Course.bump_data_version(course_pk)
+            # update() идёт в обход сигналов: проценты остальных учеников по заданию устарели
+            transaction.on_commit(
+                lambda: SnapshotService.refresh_task_students([task_pk], exclude_student_id=student_pk)
+            )
+        previous_max_score = task_max_score
+        if max_score is None:
+            max_score = task_max_score
+
+        # Уведомление — в outbox в той же транзакции: уйдёт только если оценка закоммичена,
+        # отправляет воркер dispatch_notifications (webhook-путь не ждёт Telegram);
+        # оценки, проверенные подряд, придут одной сводкой
+        if telegram_id:
+            NotificationOutbox.enqueue_grade(telegram_id, course_name, task_name, score, max_score)
+
+        # Срез для команд бота (/grades, /deadlines) и версия для ETag API — в той же транзакции;
+        # новая подписка меняет список курсов — тогда срез пересчитывается целиком
+        if new_pair:
+            SnapshotService.refresh_student(student_pk)
+        else:
+            SnapshotService.apply_accepted(
+                student_pk, course_pk, course_name, task_pk, task_name, score, max_score, checked_at,
+                previous, previous_max_score,
+            )
+        Student.bump_data_version(student_pk)
+
+    logger.info(f"Сохранена оценка: {email} - {task_name} = {score} ({rule})")
+    if not telegram_id:
+        logger.info(f"Telegram-уведомление пропущено (нет telegram_id): {email}")
+
+    return Grade(
+        pk=grade_id,
+        student_id=student_pk,
+        task_id=task_pk,
+        value=score,
+        teacher_comment=comment,
+        status=Grade.Status.ACCEPTED,
+        report_link=report_link,
+        checked_at=checked_at,
+    )
 
 
 def process_task_submitted(payload: dict, timestamp: int) -> Grade | None:
     """
     Обрабатывает событие lesson_task_submitted_for_review.
-    Создаёт оценку со статусом 'На проверке'.
+    Создаёт оценку со статусом 'На проверке' (ON CONFLICT DO NOTHING —
+    уже проверенную работу не откатывает).
+
+    Возвращает сохранённую оценку (с pk) или None, если событие ничего не изменило:
+    неполные данные или работа по этому заданию уже есть (на проверке или проверена).
     """
     user_email = payload.get('user_email')
     user_id = payload.get('user_id')
@@ -275,72 +461,43 @@ def process_task_submitted(payload: dict, timestamp: int) -> Grade | None:
     if not all([user_email, course_id, task_id]):
         return None
 
-    student = get_or_create_student(user_email, user_id)
-    course = get_or_create_course(course_id, course_name)
-    task = get_or_create_task(task_id, task_name, course)
-
-    Enrollment.objects.get_or_create(
-        student=student,
-        course=course,
-        defaults={
-            'tariff_id': tariff_id,
-            'tariff_name': tariff_name,
-        }
-    )
-
-    grade, created = Grade.objects.get_or_create(
-        student=student,
-        task=task,
-        defaults={
-            'status': Grade.Status.SUBMITTED,
-        }
-    )
-
-    if created:
-        logger.info(f"Задание отправлено на проверку: {student.email} - {task_name}")
-
-    return grade
+    email = user_email.lower().strip()
 
+    with transaction.atomic(savepoint=False):
+        student_pk = resolve_student_id(email, user_id)
+        course_pk = resolve_course_id(course_id, course_name)
+        task_pk = resolve_task_id(task_id, task_name, course_pk)
 
-def process_user_subscribed(payload: dict) -> Enrollment | None:
-    """Обрабатывает подписку на курс."""
-    user_email = payload.get('user_email')
-    user_id = payload.get('user_id')
-    product_id = payload.get('product_id')
-    product_name = payload.get('product_name', 'Курс')
-    tariff_id = payload.get('tarif_id')
-    tariff_name = payload.get('tarif_name', '')
+        new_pair = ensure_enrollment(student_pk, course_pk, tariff_id, tariff_name)
 
-    if not product_id:
-        return None
+        row = _insert_submitted_grade(student_pk, task_pk)
 
-    # Создаём курс всегда, даже если email студента не пришёл
-    course = get_or_create_course(product_id, product_name)
+        # Работа на проверке в срезе не учитывается, но подписка на курс могла появиться
+        if new_pair:
+            SnapshotService.refresh_student(student_pk)
+        # streak в api/me считается по всем работам, включая отправленные на проверку
+        if new_pair or row is not None:
+            Student.bump_data_version(student_pk)
 
-    if not user_email:
-        logger.warning(f"product_user_subscribed: email отсутствует, курс создан ({course.name}), зачисление пропущено")
+    if row is None:
+        logger.info(f"Работа уже есть, статус не меняем: {email} - {task_name}")
         return None
 
-    student = get_or_create_student(user_email, user_id)
+    grade_id, created_at = row
+    logger.info(f"Задание отправлено на проверку: {email} - {task_name}")
 
-    enrollment, created = Enrollment.objects.update_or_create(
-        student=student,
-        course=course,
-        defaults={
-            'tariff_id': tariff_id,
-            'tariff_name': tariff_name,
-            'status': Enrollment.Status.ACTIVE,
-        }
+    return Grade(
+        pk=grade_id,
+        student_id=student_pk,
+        task_id=task_pk,
+        status=Grade.Status.SUBMITTED,
+        created_at=created_at,
+        updated_at=created_at,
     )
 
-    if created:
-        logger.info(f"Новая подписка: {student.email} на {course.name}")
-
-    return enrollment
-
 
-def process_payment_accepted(payload: dict) -> Enrollment | None:
-    """Обрабатывает успешную оплату."""
+def _upsert_enrollment(payload: dict, event_name: str) -> Enrollment | None:
+    """Общая часть product_user_subscribed / payment_accepted: курс + активная подписка."""
     user_email = payload.get('user_email')
     user_id = payload.get('user_id')
     product_id = payload.get('product_id')
@@ -351,27 +508,48 @@ def process_payment_accepted(payload: dict) -> Enrollment | None:
     if not product_id:
         return None
 
-    # Создаём курс всегда, даже если email студента не пришёл
-    course = get_or_create_course(product_id, product_name)
+    with transaction.atomic(savepoint=False):
+        # Создаём курс всегда, даже если email студента не пришёл
+        course_pk = resolve_course_id(product_id, product_name)
 
-    if not user_email:
-        logger.warning(f"payment_accepted: email отсутствует, курс создан ({course.name}), зачисление пропущено")
-        return None
+        if not user_email:
+            logger.warning(f"{event_name}: email отсутствует, курс создан ({product_name}), зачисление пропущено")
+            return None
+
+        student_pk = resolve_student_id(user_email, user_id)
+
+        (enrollment,) = Enrollment.objects.bulk_create(
+            [Enrollment(
+                student_id=student_pk,
+                course_id=course_pk,
+                tariff_id=tariff_id,
+                tariff_name=tariff_name,
+                status=Enrollment.Status.ACTIVE,
+            )],
+            update_conflicts=True,
+            unique_fields=['student', 'course'],
+            update_fields=['tariff_id', 'tariff_name', 'status'],
+        )
+        transaction.on_commit(lambda: identity_map.add_enrollment(student_pk, course_pk))
+        SnapshotService.refresh_student(student_pk)
+        Student.bump_data_version(student_pk)
 
-    student = get_or_create_student(user_email, user_id)
+    return enrollment
 
-    enrollment, created = Enrollment.objects.update_or_create(
-        student=student,
-        course=course,
-        defaults={
-            'tariff_id': tariff_id,
-            'tariff_name': tariff_name,
-            'status': Enrollment.Status.ACTIVE,
-        }
-    )
 
-    logger.info(f"Оплата подтверждена: {student.email} - {course.name}")
+def process_user_subscribed(payload: dict) -> Enrollment | None:
+    """Обрабатывает подписку на курс."""
+    enrollment = _upsert_enrollment(payload, 'product_user_subscribed')
+    if enrollment:
+        logger.info(f"Подписка: {payload.get('user_email')} на {payload.get('product_name', 'Курс')}")
+    return enrollment
 
+
+def process_payment_accepted(payload: dict) -> Enrollment | None:
+    """Обрабатывает успешную оплату."""
+    enrollment = _upsert_enrollment(payload, 'payment_accepted')
+    if enrollment:
+        logger.info(f"Оплата подтверждена: {payload.get('user_email')} - {payload.get('product_name', 'Курс')}")
     return enrollment
 
 
@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import CacheGeneration, Course, CourseWebhookSecret, Enrollment, Student, Task
+from .cache import identity_map, secret_cache
+
+
+@receiver([post_save, post_delete], sender=CourseWebhookSecret)
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_secret_cache(sender, **kwargs):
+    """Секрет или zenclass_id курса изменился — сбрасываем кэш секретов целиком (меняются редко)."""
+    secret_cache.clear()
+
+
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=Task)
+def invalidate_identity_map(sender, instance, **kwargs):
+    """Email/zenclass_id мог поменяться или объект удалён — забываем все ключи этого pk."""
+    identity_map.evict(sender._meta.model_name, instance.pk)
+
+
+@receiver(post_delete, sender=Enrollment)
+def invalidate_enrollment(sender, instance, **kwargs):
+    identity_map.evict_enrollment(instance.student_id, instance.course_id)
+
+
+# Поля, по которым identity map находит pk
+IDENTITY_FIELDS = {'email', 'zenclass_id'}
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Enrollment)
+def bump_identity_generation_on_delete(sender, **kwargs):
+    """Удаление (например, в админке) — воркеры process_webhooks в других процессах сбросят identity map."""
+    CacheGeneration.bump(CacheGeneration.IDENTITY_MAP)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Task)
+def bump_identity_generation_on_save(sender, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not IDENTITY_FIELDS & set(update_fields)):
+        return
+    CacheGeneration.bump(CacheGeneration.IDENTITY_MAP)
@@ -0,0 +1,321 @@
+import json
+import time
+import uuid
+from unittest import mock
+
+from django.db import DatabaseError, IntegrityError
+from django.test import TestCase, override_settings
+
+from core.models import Course, Enrollment, Grade, OutgoingNotification, Student, StudentSnapshot, Task, WebhookLog
+from core.services.snapshots import SnapshotService
+from .cache import identity_map, recent_webhook_ids
+from .queue import drain
+from .services import claim_webhook, process_event, process_task_accepted, process_task_submitted
+
+
+class WebhookQueryBudgetTests(TestCase):
+    """
+    Бюджет SQL-запросов на обработку событий оценок.
+
+    Известные ученик/курс/задание берутся из identity map (она наполняется после коммита,
+    поэтому прогрев идёт с captureOnCommitCallbacks), новые — upsert'ами.
+    В бюджет входят чтение прежней оценки и инкрементальное обновление среза ученика
+    для бота (3 запроса) и версия данных для ETag (1).
+    """
+
+    def setUp(self):
+        identity_map.clear()
+        self.course_id = uuid.uuid4()
+        self.task_id = uuid.uuid4()
+
+    def payload(self, **overrides) -> dict:
+        return {
+            'user_email': 'student@example.com',
+            'course_id': str(self.course_id),
+            'course_name': 'Курс',
+            'task_id': str(self.task_id),
+            'task_name': 'ДЗ до 2 марта',
+            'comment': 'Оценка: 5',
+            'task_result': 'ok',
+            **overrides,
+        }
+
+    def warm_up(self):
+        """Первое событие: создаёт ученика, курс, задание, подписку и наполняет identity map."""
+        with self.captureOnCommitCallbacks(execute=True):
+            process_task_accepted(self.payload(), int(time.time()))
+
+    def test_accepted_new_student_course_task(self):
+        # ученик, курс (поиск + вставка), задание, подписка, прежняя оценка, оценка,
+        # срез (новая подписка — полный пересчёт, 3), версия
+        with self.assertNumQueries(11):
+            grade = process_task_accepted(self.payload(), int(time.time()))
+        self.assertIsNotNone(grade.pk)
+        self.assertEqual(Grade.objects.get(pk=grade.pk).value, 5)
+        self.assertTrue(Enrollment.objects.filter(student__email='student@example.com').exists())
+
+    def test_accepted_known_student_course_task(self):
+        self.warm_up()
+        # прежняя оценка, оценка, срез (чтение + запись), версия
+        with self.assertNumQueries(5):
+            process_task_accepted(self.payload(comment='Оценка: 4'), int(time.time()) + 1)
+        self.assertEqual(Grade.objects.get().value, 4)
+
+    def test_accepted_known_with_telegram_enqueues_notification(self):
+        self.warm_up()
+        Student.objects.update(telegram_id=123)
+        # + запись уведомления в outbox
+        with self.assertNumQueries(6):
+            process_task_accepted(self.payload(), int(time.time()) + 1)
+        self.assertEqual(OutgoingNotification.objects.filter(telegram_id=123).count(), 1)
+
+    def test_accepted_new_task_of_known_course(self):
+        self.warm_up()
+        self.task_id = uuid.uuid4()
+        # + вставка задания
+        with self.assertNumQueries(6):
+            process_task_accepted(self.payload(), int(time.time()))
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_accepted_stale_event_is_skipped(self):
+        self.warm_up()
+        # Более старое событие не перетирает проверку: прежняя оценка и попытка upsert
+        with self.assertNumQueries(2):
+            self.assertIsNone(process_task_accepted(self.payload(comment='Оценка: 1'), int(time.time()) - 3600))
+        self.assertEqual(Grade.objects.get().value, 5)
+
+    def test_submitted_returns_persisted_grade(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            grade = process_task_submitted(self.payload(), int(time.time()))
+        self.assertEqual(Grade.objects.get(pk=grade.pk).status, Grade.Status.SUBMITTED)
+        self.assertEqual(Course.objects.count(), 1)
+
+        # Повтор: работа уже есть — ничего не меняется, возвращается None
+        with self.assertNumQueries(1):
+            self.assertIsNone(process_task_submitted(self.payload(), int(time.time())))
+
+    def test_submitted_does_not_downgrade_accepted(self):
+        self.warm_up()
+        self.assertIsNone(process_task_submitted(self.payload(), int(time.time())))
+        self.assertEqual(Grade.objects.get().status, Grade.Status.ACCEPTED)
+
+
+class SnapshotAfterWebhookTests(TestCase):
+    """Срез ученика для бота после lesson_task_accepted совпадает с полным пересчётом."""
+
+    def setUp(self):
+        identity_map.clear()
+        self.course_id = uuid.uuid4()
+        self.now = int(time.time())
+
+    def accept(self, email: str, task_id: uuid.UUID, comment: str, offset: int = 0, task_name: str = 'ДЗ до 2 марта'):
+        payload = {
+            'user_email': email,
+            'course_id': str(self.course_id),
+            'course_name': 'Курс',
+            'task_id': str(task_id),
+            'task_name': task_name,
+            'comment': comment,
+            'task_result': 'ok',
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            return process_task_accepted(payload, self.now + offset)
+
+    @staticmethod
+    def contents(student_id: int) -> tuple:
+        snapshot = StudentSnapshot.objects.get(student_id=student_id)
+        return (
+            snapshot.accepted_total, snapshot.average_percent, snapshot.percent_count,
+            round(snapshot.percent_sum, 6), snapshot.recent_grades, snapshot.done_deadline_keys,
+        )
+
+    def assertMatchesFullRefresh(self, student_id: int):
+        incremental = self.contents(student_id)
+        SnapshotService.refresh_student(student_id)
+        self.assertEqual(incremental, self.contents(student_id))
+
+    def test_accepted_grades_update_snapshot(self):
+        first, second = uuid.uuid4(), uuid.uuid4()
+        grade = self.accept('student@example.com', first, '50/100')
+        self.accept('student@example.com', second, '8/10', offset=1, task_name='ДЗ до 9 марта')
+
+        snapshot = StudentSnapshot.objects.get(student_id=grade.student_id)
+        self.assertEqual(snapshot.accepted_total, 2)
+        self.assertEqual(snapshot.average_percent, 65)
+        self.assertEqual([entry[1] for entry in snapshot.recent_grades], ['ДЗ до 9 марта', 'ДЗ до 2 марта'])
+        course_pk = Course.objects.get().pk
+        self.assertEqual(snapshot.done_deadline_keys, [f'{course_pk}:2 марта', f'{course_pk}:9 марта'])
+        self.assertMatchesFullRefresh(grade.student_id)
+
+    def test_regrade_replaces_previous_grade(self):
+        task_id = uuid.uuid4()
+        grade = self.accept('student@example.com', task_id, '50/100')
+        self.accept('student@example.com', task_id, '90/100', offset=1)
+
+        snapshot = StudentSnapshot.objects.get(student_id=grade.student_id)
+        self.assertEqual(snapshot.accepted_total, 1)
+        self.assertEqual(snapshot.average_percent, 90)
+        self.assertEqual(len(snapshot.recent_grades), 1)
+        self.assertMatchesFullRefresh(grade.student_id)
+
+    def test_submitted_then_accepted_counts_once(self):
+        task_id = uuid.uuid4()
+        self.accept('student@example.com', uuid.uuid4(), '50/100')
+        payload = {
+            'user_email': 'student@example.com', 'course_id': str(self.course_id), 'course_name': 'Курс',
+            'task_id': str(task_id), 'task_name': 'ДЗ',
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            process_task_submitted(payload, self.now)
+        grade = self.accept('student@example.com', task_id, '', offset=1, task_name='ДЗ')
+
+        snapshot = StudentSnapshot.objects.get(student_id=grade.student_id)
+        self.assertEqual(snapshot.accepted_total, 2)
+        # Зачёт без балла в среднем не участвует
+        self.assertEqual(snapshot.average_percent, 50)
+        self.assertMatchesFullRefresh(grade.student_id)
+
+    def test_max_score_change_refreshes_other_students(self):
+        task_id = uuid.uuid4()
+        other = self.accept('other@example.com', task_id, 'Оценка: 27')
+        self.assertEqual(StudentSnapshot.objects.get(student_id=other.student_id).average_percent, 27)
+
+        # Куратор указал максимум 54 — задание обновлено update(), в обход сигналов
+        self.accept('student@example.com', task_id, '44/54', offset=1)
+        self.assertEqual(Task.objects.get().max_score, 54)
+
+        snapshot = StudentSnapshot.objects.get(student_id=other.student_id)
+        self.assertEqual(snapshot.average_percent, 50)
+        self.assertEqual(snapshot.recent_grades[0][3], 54)
+
+
+
+class WebhookQueueTests(TestCase):
+    """Приём вебхука view и разбор очереди воркером."""
+
+    url = '/webhook/zenclass/'
+
+    def setUp(self):
+        identity_map.clear()
+        recent_webhook_ids.clear()
+        self.course_id = uuid.uuid4()
+        self.task_id = uuid.uuid4()
+        self.now = int(time.time())
+
+    def payload(self, **overrides) -> dict:
+        return {
+            'user_email': 'student@example.com',
+            'course_id': str(self.course_id),
+            'course_name': 'Курс',
+            'task_id': str(self.task_id),
+            'task_name': 'ДЗ до 2 марта',
+            'comment': 'Оценка: 5',
+            'task_result': 'ok',
+            **overrides,
+        }
+
+    def enqueue(self, event_name: str, offset: int = 0, **overrides) -> WebhookLog:
+        return claim_webhook(uuid.uuid4().hex, event_name, self.payload(**overrides), self.now + offset)
+
+    def post(self, webhook_id: str, event_name: str = 'lesson_task_accepted'):
+        # Без hash подпись не проверяется
+        body = {'id': webhook_id, 'event_name': event_name, 'timestamp': self.now, 'payload': self.payload()}
+        return self.client.post(self.url, data=json.dumps(body), content_type='application/json')
+
+    def drain(self) -> int:
+        with self.captureOnCommitCallbacks(execute=True):
+            return drain()
+
+    def test_out_of_order_events_applied_by_timestamp(self):
+        # Принятие пришло раньше отправки на проверку, но произошло позже
+        accepted = self.enqueue('lesson_task_accepted', offset=10)
+        submitted = self.enqueue('lesson_task_submitted_for_review')
+
+        with mock.patch('webhooks.queue.process_event', wraps=process_event) as handler:
+            self.assertEqual(self.drain(), 2)
+        self.assertEqual(
+            [call.args[0] for call in handler.call_args_list],
+            ['lesson_task_submitted_for_review', 'lesson_task_accepted'],
+        )
+
+        grade = Grade.objects.get()
+        self.assertEqual(grade.status, Grade.Status.ACCEPTED)
+        self.assertEqual(grade.value, 5)
+        for log in (accepted, submitted):
+            log.refresh_from_db()
+            self.assertEqual(log.status, WebhookLog.Status.DONE)
+
+    def test_regrades_applied_by_timestamp(self):
+        self.enqueue('lesson_task_accepted', offset=20, comment='Оценка: 4')
+        self.enqueue('lesson_task_accepted', offset=10, comment='Оценка: 2')
+        self.drain()
+        self.assertEqual(Grade.objects.get().value, 4)
+
+        # Запоздавшее более старое событие после разбора очереди не перетирает оценку
+        stale = self.enqueue('lesson_task_accepted', offset=15, comment='Оценка: 3')
+        self.drain()
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, WebhookLog.Status.DONE)
+        self.assertEqual(Grade.objects.get().value, 4)
+
+    def test_integrity_error_retried_once(self):
+        log = self.enqueue('lesson_task_accepted')
+        with mock.patch('webhooks.queue.process_event', side_effect=[IntegrityError('stale pk'), None]) as handler:
+            self.drain()
+        self.assertEqual(handler.call_count, 2)
+        log.refresh_from_db()
+        self.assertEqual(log.status, WebhookLog.Status.DONE)
+        self.assertEqual(log.attempts, 1)
+
+    def test_repeated_integrity_error_marks_failed(self):
+        broken = self.enqueue('lesson_task_accepted')
+        self.enqueue('lesson_task_accepted', offset=1)
+
+        side_effect = [IntegrityError('stale pk'), IntegrityError('stale pk'), None]
+        with mock.patch('webhooks.queue.process_event', side_effect=side_effect) as handler:
+            self.assertEqual(self.drain(), 2)
+        self.assertEqual(handler.call_count, 3)
+
+        broken.refresh_from_db()
+        self.assertEqual(broken.status, WebhookLog.Status.FAILED)
+        self.assertEqual(broken.attempts, 1)
+        self.assertIn('IntegrityError', broken.last_error)
+        # Событие с ошибкой не блокирует партицию
+        self.assertEqual(WebhookLog.objects.filter(status=WebhookLog.Status.DONE).count(), 1)
+
+    def test_error_outside_savepoint_marks_failed(self):
+        log = self.enqueue('lesson_task_accepted')
+        with mock.patch('webhooks.queue._lock_partition_key', side_effect=DatabaseError('lock failed')):
+            self.drain()
+        log.refresh_from_db()
+        self.assertEqual(log.status, WebhookLog.Status.FAILED)
+        self.assertEqual(log.attempts, 1)
+        self.assertIn('lock failed', log.last_error)
+        self.assertFalse(Grade.objects.exists())
+
+    @override_settings(WEBHOOK_QUEUE_MAX_DEPTH=1, WEBHOOK_QUEUE_RETRY_AFTER=17)
+    def test_full_queue_answers_503_with_retry_after(self):
+        self.enqueue('lesson_task_accepted')
+
+        response = self.post('overflow')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '17')
+        self.assertFalse(WebhookLog.objects.filter(webhook_id='overflow').exists())
+
+        # Воркер разобрал очередь — повтор ZenClass принимается
+        self.drain()
+        response = self.post('overflow')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['queued'])
+
+    def test_recent_id_answered_without_db(self):
+        self.assertTrue(self.post('retry-me').json()['queued'])
+
+        with self.assertNumQueries(0):
+            response = self.post('retry-me')
+        self.assertEqual(response.json(), {'status': 'already_processed'})
+
+        # После перезапуска процесса кэш пуст — дубликат отсекает уникальный webhook_id
+        recent_webhook_ids.clear()
+        self.assertEqual(self.post('retry-me').json(), {'status': 'already_processed'})
+        self.assertEqual(WebhookLog.objects.filter(webhook_id='retry-me').count(), 1)
@@ -1,17 +1,12 @@
 import json
 import logging
+from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from .services import (
-    verify_webhook_signature,
-    claim_webhook,
-    process_task_accepted,
-    process_task_submitted,
-    process_user_subscribed,
-    process_payment_accepted,
-    process_access_expired,
-)
+from .services import verify_webhook_signature, claim_webhook
+from .queue import is_overloaded
+from .cache import recent_webhook_ids
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +15,7 @@ logger = logging.getLogger(__name__)
 @require_POST
 def zenclass_webhook(request):
     """
-    Обработчик вебхуков от ZenClass.
+    Приём вебхуков от ZenClass: проверка подписи и постановка в очередь.
 
     Поддерживаемые события:
     - lesson_task_accepted: задание принято
@@ -48,41 +43,32 @@ def zenclass_webhook(request):
         logger.warning("Отсутствуют обязательные поля")
         return JsonResponse({'error': 'Missing required fields'}, status=400)
 
+    # Быстрый путь для ретраев: id недавно уже поставлен в очередь — не трогаем БД.
+    # Ответ не меняет состояние, поэтому проверять подпись для него не нужно.
+    if str(webhook_id) in recent_webhook_ids:
+        logger.info(f"Вебхук уже обработан (кэш): {webhook_id}")
+        return JsonResponse({'status': 'already_processed'}, status=200)
+
     # Проверка подписи: task-события — per-course секрет из БД, enrollment — глобальный из .env
     if received_hash and not verify_webhook_signature(webhook_id, timestamp, received_hash, event_name, payload):
         return JsonResponse({'error': 'Invalid signature'}, status=403)
 
-    # Атомарная проверка идемпотентности + логирование
-    webhook_log = claim_webhook(webhook_id, event_name, payload)
+    # Backpressure: воркер не успевает — просим ZenClass повторить позже
+    if is_overloaded():
+        logger.warning(f"Очередь вебхуков переполнена, отвечаем 503: {webhook_id}")
+        response = JsonResponse({'error': 'Queue is full'}, status=503)
+        response['Retry-After'] = str(settings.WEBHOOK_QUEUE_RETRY_AFTER)
+        return response
+
+    # Атомарная проверка идемпотентности + постановка в очередь.
+    # Само событие применяет воркер `manage.py process_webhooks`.
+    webhook_log = claim_webhook(webhook_id, event_name, payload, timestamp)
     if webhook_log is None:
         logger.info(f"Вебхук уже обработан: {webhook_id}")
         return JsonResponse({'status': 'already_processed'}, status=200)
 
-    # Обработка события
-    result = None
-    processed = True
-
-    if event_name == 'lesson_task_accepted':
-        result = process_task_accepted(payload, timestamp)
-
-    elif event_name == 'lesson_task_submitted_for_review':
-        result = process_task_submitted(payload, timestamp)
-
-    elif event_name == 'product_user_subscribed':
-        result = process_user_subscribed(payload)
-
-    elif event_name == 'payment_accepted':
-        result = process_payment_accepted(payload)
-
-    elif event_name == 'access_to_course_expired':
-        result = process_access_expired(payload)
-
-    else:
-        logger.info(f"Неизвестное событие: {event_name}")
-        processed = False
-
     return JsonResponse({
         'status': 'ok',
         'event': event_name,
-        'processed': processed and result is not None
+        'queued': True,
     })